@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 
+import functools
+import inspect
 import json
+import os
+import re
+import threading
 import time
+import uuid
 
 import pandas as pd
 import numpy as np
@@ -15,10 +21,23 @@ from dash import dcc
 from dash import html
 from dash import dash_table as table
 
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 
 import base64
 
+import flask
+
+import diagnostics
+from metrics import CallbackMetrics
+import profiling
+from kdtree import KDTree
+from live import EventFeed
+from pipeline import Pipeline, Stage
+from rwlock import ReadWriteLock
+from search import SearchIndex
+from singleflight import SingleFlight
+
 def get_as_base64(player_name):
     """Return local .png image for player."""   
     try:
@@ -78,7 +97,26 @@ field_style = {
 
 field_theme = '2'
 
-matches = pd.read_json('./data/matches/43.json', encoding='utf-8').sort_values('match_id')
+# Competitions to load. WC_DATA_DIR and WC_COMPETITIONS point the app at
+# another StatsBomb-format archive, such as one written by generate_data.py.
+data_dir = os.environ.get('WC_DATA_DIR', './data')
+competition_ids = [int(c) for c in os.environ.get('WC_COMPETITIONS', '43').split(',')]
+
+world_cup_stages = ((['Group Stage'] * 47) + (['Round of 16'] * 8)
+                    + (['Quarter Final'] * 4) + (['Semi Final'] * 2)
+                    + (['Third Place Match']) + (['Final']))
+
+def read_matches(competition_id):
+    """Return the matches of a competition with their stage."""
+    df = (pd.read_json('{}/matches/{}.json'.format(data_dir, competition_id), encoding='utf-8')
+          .sort_values('match_id'))
+    if 'competition_stage' in df:
+        return df.assign(stage = df.competition_stage.apply(lambda x: x['name']))
+    return df.assign(stage = world_cup_stages)
+
+matches = (pd.concat([read_matches(competition_id) for competition_id in competition_ids],
+                     ignore_index=True, sort=False)
+           .sort_values('match_id'))
 
 match_cols = ['home','away', 'home_score','away_score',
               'match_date','display_date','match_id','referee_name',
@@ -90,9 +128,6 @@ matches =  (matches
                     home_score = matches.home_score.astype(int),
                     away_score = matches.away_score.astype(int),
                     match_id = matches.match_id.astype(int),
-                    stage = ((['Group Stage'] * 47) + (['Round of 16'] * 8)
-                            + (['Quarter Final'] * 4) + (['Semi Final'] * 2)
-                            + (['Third Place Match']) + (['Final'])),
                     description = lambda x: x['stage'] + ' : ' + x['home'] + ' vs ' + x['away'],
                     match_date = pd.to_datetime(matches.match_date),
                     display_date = lambda x: x.match_date.dt.strftime('%d %B %Y').str.strip('0'))
@@ -100,255 +135,920 @@ matches =  (matches
 
 match_info = matches.set_index('match_id').T.to_dict()
 
+default_match_id = 7584 if 7584 in match_info else int(matches.match_id.iloc[0])
+
+# Live matches. With WC_LIVE pointing at an event feed (see live.py), the
+# matches with a feed file are read from it instead of data/events, and the
+# events appended to it are added to the tables while the app runs. Every
+# worker process follows the feed on its own.
+live_path = os.environ.get('WC_LIVE')
+live_feed = EventFeed(live_path) if live_path else None
+live_match_ids = [match_id for match_id in live_feed.match_ids() if match_id in match_info] if live_feed else []
+live_interval = int(os.environ.get('WC_LIVE_INTERVAL', 5000))
+
 team_colors = {
     'home': 'rgba(255,77,77, 1)',
     'away': 'rgba(77,77,255, 1)'
 }
 
-# # First time data handling
-# # Importing match-wise events data and concatenating into master file
-
-# matches = pd.read_json('./data/matches/43.json', encoding='utf-8')
-
-# event_dfs = []
-# for match in matches.match_id.tolist():
-#     df = (pd.read_json('./data/events/{}.json'.format(match), encoding='utf-8')
-#           .assign(match_id = match))
-#     event_dfs.append(df)
-
-# events = pd.concat(event_dfs, ignore_index=True, sort=False)
-
-# keep_event_cols = ['location','minute','pass','period','play_pattern','player',
-#                      'possession','possession_team','second','shot','tactics','team',
-#                     'type','match_id','id']
-
-# (events[keep_event_cols]
-#  .assign(possession_team = lambda x: x['possession_team'].apply(lambda y: y['name']).astype('category'),
-#          play_pattern = lambda x: x['play_pattern'].apply(lambda y: y['name']).astype('category'),
-#          team = lambda x: x['team'].apply(lambda y: y['name']).astype('category'),
-#          event_type = lambda x: x['type'].apply(lambda y: y['name']).astype('category'),
-#          player_id = lambda x: x['player'].apply(lambda x: None if pd.isnull(x) else x['id']).astype('category'),
-#          player_name = lambda x: x['player'].apply(lambda x: None if pd.isnull(x) else x['name']).astype('category'))
-# .drop(['type','player'], axis=1)).to_json('./data/events/events_disk.json')
-
-# Read concatenated events file from disk
-events = (pd.read_json('./data/events/events_disk.json',  encoding='utf-8')
-                .query('minute < 120'))
-
-shots = events[events.event_type == 'Shot']
-
-shots_df = pd.DataFrame(
-    list(zip(
-        shots.player_name,
-        shots.player_id,
-        shots.team,
-        shots.period,
-        shots.minute,
-        shots.second,
-        shots.location,
-        shots.shot.apply(lambda x: x['statsbomb_xg']),
-        shots.shot.apply(lambda x: x['end_location']),
-        shots.shot.apply(lambda x: x['outcome']['name']),
-        shots.shot.apply(lambda x: x['body_part']['name']),
-        shots.shot.apply(lambda x: x['technique']['name']),
-        shots.possession,
-        shots.id,
-        shots.match_id
-    )), columns=['name','id','team','period','minute','seconds','location','xg',
-                 'end_location','outcome','body_part','technique', 'possession',
-                 'shot_id', 'match_id'])
-
-og = events[events.event_type == 'Own Goal Against']
-
-og_df = pd.DataFrame(
-    list(zip(
-        og.player_name,
-        og.player_id,
-        og.possession_team,
-        og.period,
-        og.minute,
-        og.second,
-        og.location.apply(lambda x: [120 - x[0], 80 - x[1]]),
-        [0] * og.shape[0],
-        [[120, 40]] * og.shape[0],
-        ['Goal'] * og.shape[0],
-        ['Unknown'] * og.shape[0],
-        ['Unknown'] * og.shape[0],
-        og.possession,
-        og.match_id
-    )), columns=['name','id','team','period','minute','seconds','location',
-                 'xg','end_location','outcome','body_part','technique',
-                 'possession','match_id'])
-
-shots_df = pd.concat([shots_df, og_df], ignore_index=True, sort=False)
-
-shots_df.loc[:, 'dec_time'] = shots_df.minute + shots_df.seconds/60
-shots_df = shots_df.sort_values(['match_id','period','dec_time'])
-shots_df.loc[:, 'cum_xg'] = shots_df.groupby(['match_id','team'])['xg'].cumsum()
-
-shots_df.loc[:, 'hover_text'] = (shots_df.name 
-                                + ' ('
-                                + shots_df.team
-                                + ')<br>Time: '
-                                + shots_df.minute.astype(str)
-                                + ':'
-                                + shots_df.seconds.astype(str)
-                                +'<br>xG: '
-                                + shots_df.xg.map('{:.3f}'.format)
-                                + '<br>Cum. xG: '
-                                + shots_df.cum_xg.map('{:.3f}'.format)
-                                + '<br>Outcome: '
-                                + shots_df.outcome
-                                + '<br>Body Part: '
-                                + shots_df.body_part)
-
-shots_df.loc[:, 'team_type'] = shots_df.apply(lambda row: 'home' if row['team'] == match_info[row['match_id']]['home'] else 'away', axis=1)
-shots_df.loc[:, 'shot_color'] = np.where(shots_df.outcome == 'Goal', 'black', shots_df.team_type.map(team_colors))
-
-# create passing dataframe
-passing = events[events.event_type == 'Pass']
-
-pass_dic = {'id': None,
-           'name': None}
-
-passing_df = pd.DataFrame(
-                list(zip(
-                    passing.player_name,
-                    passing.player_id,
-                    passing.period,
-                    passing.minute,
-                    passing.second,
-                    passing.location,
-                    passing.location.apply(lambda x: x[0]),
-                    passing.location.apply(lambda x: x[1]),
-                    passing.team,
-                    passing['pass'].apply(lambda x: x.get('recipient', pass_dic)['id']),
-                    passing['pass'].apply(lambda x: x.get('recipient', pass_dic)['name']),
-                    passing['pass'].apply(lambda x: x['height']['name']),
-                    passing['pass'].apply(lambda x: x['length']),
-                    passing['pass'].apply(lambda x: (x['angle'] * 180) / 3.14),
-                    passing['pass'].apply(lambda x: x.get('cross', 0)),
-                    passing['pass'].apply(lambda x: x.get('assisted_shot_id', 0)),
-                    passing['pass'].apply(lambda x: x.get('goal_assist', False)),
-                    passing.possession,
-                    passing['pass'].apply(lambda x: x.get('outcome', pass_dic)['name']),
-                    passing.match_id
-                    )), columns=['name','id','period','minute','seconds',
-                                 'location','x_pos','y_pos','team',
-                                 'receiver_id','receiver_name',
-                                 'height','length','angle','is_cross',
-                                 'is_shot_assist','is_goal_assist','possession',
-                                 'outcome', 'match_id'])
-
-# create table stats dataframe
-xg_stats = (pd.concat([
-             (passing_df
-             .query('outcome != outcome')
-             .merge(shots_df[['match_id','team','possession','xg','shot_id']],
-                    how='inner',
-                    on=['match_id','team','possession'])
-             [['match_id','name','id','team','shot_id','is_shot_assist','is_goal_assist','possession','xg']]
-             .assign(is_shot_assist = lambda x: np.where(x.is_shot_assist == 0, 0, 1),
-                     is_buildup = lambda x: np.where(x.is_shot_assist == 0, 1, 0),
-                     is_shot = 0)),
-             (shots_df[['match_id','name','id','team','possession','xg','shot_id']]
-                     .assign(is_shot = 1))]
-                     , ignore_index=True, sort=False)
-             .groupby(['match_id','id','name','team','possession','shot_id'], as_index=False)
-             [['xg','is_shot_assist','is_goal_assist','is_buildup','is_shot']].max()
-             .assign(xg_contribution = lambda x: x.xg,
-                     xg_buildup = lambda x: x.xg * x.is_buildup,
-                     xg_assist = lambda x: x.xg * x.is_shot_assist,
-                     xg_shot= lambda x: x.xg * x.is_shot)
-             .groupby(['match_id','id','name','team'])
-             [['xg_contribution','xg_buildup','xg_assist','xg_shot']]
-             .sum())
+# Data pipeline
+# Every stage is a function of the tables it derives from, so that stages can
+# be timed and rebuilt on their own (see benchmark.py). The module-level
+# tables below are the ones used by the app.
+
+keep_event_cols = ['location','minute','pass','carry','period','play_pattern','player',
+                   'possession','possession_team','second','shot','substitution','tactics','team',
+                   'type','match_id','id']
+
+def flatten_events(df, match_id):
+    """Return the flattened events_disk.json form of raw events of a match."""
+    df = (df
+          .assign(match_id = match_id)
+          .reindex(columns=keep_event_cols))
+
+    return (df
+            .assign(possession_team = lambda x: x['possession_team'].apply(lambda y: y['name']),
+                    play_pattern = lambda x: x['play_pattern'].apply(lambda y: y['name']),
+                    team = lambda x: x['team'].apply(lambda y: y['name']),
+                    event_type = lambda x: x['type'].apply(lambda y: y['name']),
+                    player_id = lambda x: x['player'].apply(lambda x: np.nan if pd.isnull(x) else x['id']).astype(float),
+                    player_name = lambda x: x['player'].apply(lambda x: None if pd.isnull(x) else x['name']))
+            .drop(['type','player'], axis=1))
+
+def parse_match_events(match_id, data_dir=data_dir):
+    """Return flattened events for one match, in the events_disk.json schema."""
+    return flatten_events(pd.read_json('{}/events/{}.json'.format(data_dir, match_id), encoding='utf-8'),
+                          match_id)
+
+def parse_events(match_ids, data_dir=data_dir):
+    """Return flattened events for all matches."""
+    return pd.concat([parse_match_events(match_id, data_dir) for match_id in match_ids],
+                     ignore_index=True, sort=False)
+
+def load_events(match_ids):
+    """Read the concatenated events file from disk, parsing any match it lacks.
+
+    The file is written back with the parsed matches added, so the next
+    start reads them too.
+    """
+    disk_path = '{}/events/events_disk.json'.format(data_dir)
+    events = pd.read_json(disk_path,  encoding='utf-8') if os.path.exists(disk_path) else None
+    # A file written before a column was added to keep_event_cols is stale.
+    if events is None or not set(keep_event_cols) - {'type','player'} <= set(events.columns):
+        events = parse_events(match_ids)
+        write_events_file(events, disk_path)
+    else:
+        missing = sorted(set(match_ids) - set(events.match_id))
+        if missing:
+            events = pd.concat([events, parse_events(missing)], ignore_index=True, sort=False)
+            write_events_file(events, disk_path)
+    return events[events.match_id.isin(match_ids)].query('minute < 120')
+
+def write_events_file(events, disk_path):
+    """Replace the events file with events, leaving it as it was if writing fails."""
+    tmp_path = '{}.{}.tmp'.format(disk_path, os.getpid())
+    try:
+        events.to_json(tmp_path)
+        os.replace(tmp_path, disk_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_live_events():
+    """Return the flattened events appended to the live matches' feed since the last read."""
+    return {match_id: flatten_events(pd.DataFrame(raw_events), match_id).query('minute < 120')
+            for match_id, raw_events in live_feed.read().items() if match_id in live_match_ids}
+
+def build_shots_df(events, match_info):
+    """Return one row per shot (own goals included) with cumulative xG."""
+    shots = events[events.event_type == 'Shot']
+
+    shots_df = pd.DataFrame(
+        list(zip(
+            shots.player_id,
+            shots.team,
+            shots.period,
+            shots.minute,
+            shots.second,
+            shots.location,
+            shots.shot.apply(lambda x: x['statsbomb_xg']),
+            shots.shot.apply(lambda x: x['end_location']),
+            shots.shot.apply(lambda x: x['outcome']['name']),
+            shots.shot.apply(lambda x: x['body_part']['name']),
+            shots.shot.apply(lambda x: x['technique']['name']),
+            shots.possession,
+            shots.id,
+            shots.match_id
+        )), columns=['id','team','period','minute','seconds','location','xg',
+                     'end_location','outcome','body_part','technique', 'possession',
+                     'shot_id', 'match_id'])
+
+    og = events[events.event_type == 'Own Goal Against']
+
+    og_df = pd.DataFrame(
+        list(zip(
+            og.player_id,
+            og.possession_team,
+            og.period,
+            og.minute,
+            og.second,
+            og.location.apply(lambda x: [120 - x[0], 80 - x[1]]),
+            [0] * og.shape[0],
+            [[120, 40]] * og.shape[0],
+            ['Goal'] * og.shape[0],
+            ['Unknown'] * og.shape[0],
+            ['Unknown'] * og.shape[0],
+            og.possession,
+            og.match_id
+        )), columns=['id','team','period','minute','seconds','location',
+                     'xg','end_location','outcome','body_part','technique',
+                     'possession','match_id'])
+
+    shots_df = (pd.concat([shots_df, og_df] if len(og_df) else [shots_df], ignore_index=True, sort=False)
+                .astype({'xg': float}))
+
+    shots_df.loc[:, 'dec_time'] = shots_df.minute + shots_df.seconds/60
+    shots_df = shots_df.sort_values(['match_id','period','dec_time'])
+    shots_df.loc[:, 'cum_xg'] = shots_df.groupby(['match_id','team'])['xg'].cumsum()
+
+    home = shots_df.match_id.map(lambda match_id: match_info[match_id]['home'])
+    shots_df.loc[:, 'team_type'] = np.where(shots_df.team == home, 'home', 'away')
+    shots_df.loc[:, 'shot_color'] = np.where(shots_df.outcome == 'Goal', 'black', shots_df.team_type.map(team_colors))
+
+    return shots_df.astype({'id': int})
+
+def shot_hover_text(shots_df):
+    """Return the hover text of shots, with the shooters' names looked up now."""
+    return (shots_df.id.map(players.name)
+            + ' ('
+            + shots_df.team
+            + ')<br>Time: '
+            + shots_df.minute.astype(str)
+            + ':'
+            + shots_df.seconds.astype(str)
+            +'<br>xG: '
+            + shots_df.xg.map('{:.3f}'.format)
+            + '<br>Cum. xG: '
+            + shots_df.cum_xg.map('{:.3f}'.format)
+            + '<br>Outcome: '
+            + shots_df.outcome
+            + '<br>Body Part: '
+            + shots_df.body_part)
+
+def build_passing_df(events):
+    """Return one row per pass."""
+    passing = events[events.event_type == 'Pass']
+
+    pass_dic = {'id': np.nan,
+               'name': None}
+
+    passing_df = pd.DataFrame(
+                    list(zip(
+                        passing.player_id.astype(int),
+                        passing.period,
+                        passing.minute,
+                        passing.second,
+                        passing.location,
+                        passing.location.apply(lambda x: x[0]),
+                        passing.location.apply(lambda x: x[1]),
+                        passing['pass'].apply(lambda x: x['end_location'][0]),
+                        passing['pass'].apply(lambda x: x['end_location'][1]),
+                        passing.team,
+                        passing['pass'].apply(lambda x: x.get('recipient', pass_dic)['id']),
+                        passing['pass'].apply(lambda x: x['height']['name']),
+                        passing['pass'].apply(lambda x: x['length']),
+                        passing['pass'].apply(lambda x: (x['angle'] * 180) / 3.14),
+                        passing['pass'].apply(lambda x: x.get('cross', 0)),
+                        passing['pass'].apply(lambda x: x.get('assisted_shot_id', 0)),
+                        passing['pass'].apply(lambda x: x.get('goal_assist', False)),
+                        passing.possession,
+                        passing['pass'].apply(lambda x: x.get('outcome', pass_dic)['name']),
+                        passing.match_id
+                        )), columns=['id','period','minute','seconds',
+                                     'location','x_pos','y_pos','end_x_pos','end_y_pos','team',
+                                     'receiver_id',
+                                     'height','length','angle','is_cross',
+                                     'is_shot_assist','is_goal_assist','possession',
+                                     'outcome', 'match_id'])
+
+    return passing_df
+
+def build_carries_df(events):
+    """Return one row per carry."""
+    carries = events[events.event_type == 'Carry']
+
+    carries_df = pd.DataFrame(
+                    list(zip(
+                        carries.player_id.astype(int),
+                        carries.period,
+                        carries.minute,
+                        carries.second,
+                        carries.location.apply(lambda x: x[0]),
+                        carries.location.apply(lambda x: x[1]),
+                        carries.carry.apply(lambda x: x['end_location'][0]),
+                        carries.carry.apply(lambda x: x['end_location'][1]),
+                        carries.team,
+                        carries.possession,
+                        carries.match_id
+                        )), columns=['id','period','minute','seconds',
+                                     'x_pos','y_pos','end_x_pos','end_y_pos','team',
+                                     'possession','match_id'])
+
+    return carries_df
+
+# Expected Threat (xT)
+# The pitch is split into 16 x 12 zones. The threat of a zone is the chance
+# of scoring from it, either by shooting there or by moving the ball to
+# another zone: xT = P(shot) * P(goal | shot) + P(move) * T @ xT, solved by
+# iterating from zero. Moves are passes and carries.
+
+xt_zones = (16, 12)
+
+def pitch_zone(x_pos, y_pos):
+    """Return the xT zone of pitch locations."""
+    x_zone = np.clip((np.asarray(x_pos, dtype=float) * xt_zones[0] / 120).astype(int), 0, xt_zones[0] - 1)
+    y_zone = np.clip((np.asarray(y_pos, dtype=float) * xt_zones[1] / 80).astype(int), 0, xt_zones[1] - 1)
+    return x_zone * xt_zones[1] + y_zone
+
+def build_xt_grid(passing_df, carries_df, shots_df, max_iter=100, tol=1e-6):
+    """Return the xT of every zone as a 16 x 12 array."""
+    zones = xt_zones[0] * xt_zones[1]
+    shots = shots_df[shots_df.shot_id.notnull()]
+    shot_locations = np.array(shots.location.tolist(), dtype=float).reshape(-1, 2)
+    shot_zone = pitch_zone(shot_locations[:, 0], shot_locations[:, 1])
+
+    moves = pd.concat([passing_df[['x_pos','y_pos','end_x_pos','end_y_pos','outcome']],
+                       carries_df[['x_pos','y_pos','end_x_pos','end_y_pos']]],
+                      ignore_index=True, sort=False)
+    start_zone = pitch_zone(moves.x_pos, moves.y_pos)
+    end_zone = pitch_zone(moves.end_x_pos, moves.end_y_pos)
+    completed = moves.outcome.isnull().to_numpy()
+
+    shot_count = np.bincount(shot_zone, minlength=zones)
+    goal_count = np.bincount(shot_zone, weights=(shots.outcome == 'Goal').to_numpy(), minlength=zones)
+    move_count = np.bincount(start_zone, minlength=zones)
+    actions = np.maximum(shot_count + move_count, 1)
+
+    shoot_prob = shot_count / actions
+    move_prob = move_count / actions
+    score_prob = goal_count / np.maximum(shot_count, 1)
+    transitions = (np.bincount(start_zone[completed] * zones + end_zone[completed], minlength=zones * zones)
+                   .reshape(zones, zones) / np.maximum(move_count, 1)[:, None])
+
+    xt = np.zeros(zones)
+    for _ in range(max_iter):
+        new_xt = shoot_prob * score_prob + move_prob * (transitions @ xt)
+        converged = np.abs(new_xt - xt).max() < tol
+        xt = new_xt
+        if converged:
+            break
+
+    return xt.reshape(xt_zones)
+
+def score_xt(xt_grid, moves):
+    """Return the xT added by each move; failed passes add nothing."""
+    xt = xt_grid.ravel()
+    added = xt[pitch_zone(moves.end_x_pos, moves.end_y_pos)] - xt[pitch_zone(moves.x_pos, moves.y_pos)]
+    if 'outcome' in moves:
+        added = np.where(moves.outcome.isnull(), added, 0)
+    return added
+
+def build_xt_stats(passing_df, carries_df, xt_grid):
+    """Return per-player xT added by passes and carries."""
+    keys = ['match_id','id','team']
+    passing_df = passing_df.assign(xt_added = score_xt(xt_grid, passing_df))
+    carries_df = carries_df.assign(xt_added = score_xt(xt_grid, carries_df))
+    xt_stats = (pd.concat([passing_df.groupby(keys).xt_added.sum().rename('xt_pass'),
+                           carries_df.groupby(keys).xt_added.sum().rename('xt_carry')],
+                          axis=1)
+                .fillna(0)
+                .assign(xt_added = lambda x: x.xt_pass + x.xt_carry))
+
+    return xt_stats
+
+def build_possessions(events, passing_df, shots_df):
+    """Return the possession-chain tables.
+
+    possessions has one row per (match_id, possession) with its team, the
+    positions of its events among the match's events, its time span, shots
+    and xG.
+    possession_players has one row per player taking part in a chain, with
+    their completed passes and shots and the xG of the chain's shots.
+    """
+    chain_shots = (shots_df[shots_df.shot_id.notnull()]
+                   .sort_values(['match_id','possession','period','dec_time']))
+
+    possessions = (events
+                   .assign(position = events.groupby('match_id').cumcount(),
+                           dec_time = events.minute + events.second/60)
+                   .groupby(['match_id','possession'])
+                   .agg(team = ('possession_team', 'first'),
+                        play_pattern = ('play_pattern', 'first'),
+                        period = ('period', 'first'),
+                        start = ('position', 'min'),
+                        stop = ('position', 'max'),
+                        start_time = ('dec_time', 'min'),
+                        end_time = ('dec_time', 'max'))
+                   .assign(stop = lambda x: x.stop + 1)
+                   .join(chain_shots
+                         .groupby(['match_id','possession'])
+                         .agg(shots = ('shot_id', 'count'),
+                              xg = ('xg', 'sum'),
+                              shot_id = ('shot_id', 'last'),
+                              outcome = ('outcome', 'last')))
+                   .fillna({'shots': 0, 'xg': 0})
+                   .astype({'shots': int}))
+
+    player_keys = ['match_id','possession','team','id']
+
+    possession_players = (pd.concat([
+                             (passing_df[passing_df.outcome.isnull()]
+                              .assign(passes = 1,
+                                      assist_passes = lambda x: (x.is_shot_assist != 0).astype(int),
+                                      buildup_passes = lambda x: (x.is_shot_assist == 0).astype(int))
+                              .groupby(player_keys)[['passes','assist_passes','buildup_passes']]
+                              .sum()),
+                             (chain_shots
+                              .assign(player_shots = 1)
+                              .groupby(player_keys)
+                              .agg(player_shots = ('player_shots', 'sum'),
+                                   shot_xg = ('xg', 'sum')))],
+                             axis=1)
+                          .fillna(0)
+                          .reset_index()
+                          .merge(chain_shots
+                                 .groupby(['match_id','possession','team'])
+                                 .agg(chain_shots = ('shot_id', 'count'),
+                                      chain_xg = ('xg', 'sum'))
+                                 .reset_index(),
+                                 how='left', on=['match_id','possession','team'])
+                          .fillna({'chain_shots': 0, 'chain_xg': 0})
+                          .sort_values(player_keys, ignore_index=True))
+
+    return possessions, possession_players
+
+def possession_events(events, possessions, match_id, possession):
+    """Return the events of one possession chain.
+
+    events are kept in match order (see pipeline.py), so the match's rows
+    start where its id sorts in and the chain's are a slice from there.
+    """
+    chain = possessions.loc[(match_id, possession)]
+    first = events.match_id.searchsorted(match_id)
+    return events.iloc[first + chain['start']:first + chain['stop']]
+
+def build_xg_stats(possession_players):
+    """Return per-player xG contribution, buildup, assists and shots.
+
+    Every player completing a pass in a chain that ends in shots is credited
+    with the chain's xG, shooters with their own shots' xG otherwise.
+    """
+    chains = possession_players[possession_players.chain_shots > 0]
+    xg_stats = (chains
+                .assign(xg_contribution = np.where(chains.passes > 0, chains.chain_xg, chains.shot_xg),
+                        xg_buildup = chains.chain_xg * (chains.buildup_passes > 0),
+                        xg_assist = chains.chain_xg * (chains.assist_passes > 0),
+                        xg_shot = chains.shot_xg)
+                .groupby(['match_id','id','team'])
+                [['xg_contribution','xg_buildup','xg_assist','xg_shot']]
+                .sum())
+
+    return xg_stats
 
 comp_passes = lambda x: np.sum(np.where(x.isnull(), 1, 0))
 prog_passes = lambda x: np.sum(np.where((x < 78.75) & (x > -78.75), 1, 0))
 
-pass_stats = (passing_df
-             .groupby(['match_id','id','name','team'])
-             .agg({
-                 'period': 'count',
-                 'outcome': comp_passes,
-                 'angle': prog_passes,
-                 'length': 'mean'
-             })
-             .rename(columns={
-                 'period':'num_passes',
-                 'outcome':'pass_completion_rate',
-                 'angle':'percent_progressive_passes',
-                 'length': 'average_pass_length'
-             })
-             .assign(pass_completion_rate = lambda x: x.pass_completion_rate/x.num_passes,
-                     percent_progressive_passes = lambda x: x.percent_progressive_passes/x.num_passes))
-
-disp_table = pass_stats.join(xg_stats).fillna(0).reset_index()
-
-# create location dataframe
+def build_pass_stats(passing_df):
+    """Return per-player passing stats."""
+    pass_stats = (passing_df
+                 .groupby(['match_id','id','team'])
+                 .agg({
+                     'period': 'count',
+                     'outcome': comp_passes,
+                     'angle': prog_passes,
+                     'length': 'mean'
+                 })
+                 .rename(columns={
+                     'period':'num_passes',
+                     'outcome':'pass_completion_rate',
+                     'angle':'percent_progressive_passes',
+                     'length': 'average_pass_length'
+                 })
+                 .assign(pass_completion_rate = lambda x: x.pass_completion_rate/x.num_passes,
+                         percent_progressive_passes = lambda x: x.percent_progressive_passes/x.num_passes))
+
+    return pass_stats
+
+def build_disp_table(pass_stats, xg_stats, xt_stats):
+    """Return the passing, xG and xT stats of every player in every match."""
+    return pass_stats.join(xg_stats).join(xt_stats).fillna(0).reset_index()
+
+def build_location_df(events):
+    """Return open play event locations by player."""
+    mask = (~events.play_pattern.isin(['From Free Kick', 'From Corner']))
+
+    location = events[mask & (pd.notnull(events.player_id)) & (pd.notnull(events.location))]
+
+    location_df = pd.DataFrame(
+                        list(zip(
+                            location.player_id.astype(int),
+                            location.period,
+                            location.minute,
+                            location.second,
+                            location.location,
+                            location.location.apply(lambda x: x[0]),
+                            location.location.apply(lambda x: x[1]),
+                            location.team,
+                            location.event_type,
+                            location.match_id
+                            )), columns=['id','period','minute','seconds',
+                                         'location','x_pos','y_pos','team','event','match_id'])
+
+    return location_df
+
+touch_bins = (24, 16)
+
+def touch_rows(touch_index, df):
+    """Return the touch_index row of every (match_id, id) in df, -1 if none."""
+    return (df[['match_id','id']]
+            .merge(touch_index[['match_id','id']].reset_index(), how='left', on=['match_id','id'])
+            ['index'].fillna(-1).astype(int).to_numpy())
+
+def build_touch_maps(location_df):
+    """Return binned touch counts for every (match, player).
+
+    The counts are one row of 24 x 16 bins over the 120 x 80 pitch per
+    player, indexed by a table of (match_id, team, id) -> row.
+    """
+    touch_index = (location_df[['match_id','team','id']]
+                   .drop_duplicates(['match_id','id'])
+                   .sort_values(['match_id','id'])
+                   .reset_index(drop=True))
+    touch_counts = touch_bin_counts(touch_rows(touch_index, location_df), len(touch_index), location_df)
+
+    return touch_index, touch_counts
+
+def touch_bin_counts(rows, n_rows, location_df):
+    """Return the touches of location_df binned per touch_index row."""
+    x_bin = np.clip((location_df.x_pos.to_numpy() * touch_bins[0] / 120).astype(int), 0, touch_bins[0] - 1)
+    y_bin = np.clip((location_df.y_pos.to_numpy() * touch_bins[1] / 80).astype(int), 0, touch_bins[1] - 1)
+    bins = touch_bins[0] * touch_bins[1]
+    return (np.bincount(rows * bins + x_bin * touch_bins[1] + y_bin, minlength=n_rows * bins)
+            .reshape(n_rows, bins)
+            .astype(np.uint16))
+
+def touch_map(touch_index, touch_counts, match_id, team=None, player_id=None):
+    """Return the summed 24 x 16 touch counts of a team or player in a match."""
+    mask = (touch_index.match_id == match_id).to_numpy()
+    if team is not None:
+        mask &= (touch_index.team == team).to_numpy()
+    if player_id is not None:
+        mask &= (touch_index.id == player_id).to_numpy()
+    return touch_counts[mask].sum(axis=0).reshape(touch_bins)
+
+def build_network_counts(passing_df, location_df, touch_index):
+    """Return per-minute prefix sums of the passing network of every match.
+
+    Edges are the unordered passer/receiver pairs of completed passes. Each
+    count array has one row per edge (or per touch_index player) and one
+    column per minute boundary, where column m sums minutes 0 to m - 1, so
+    the network of any window of minutes is a difference of two columns.
+    """
+    minutes = int(max(passing_df.minute.max(), location_df.minute.max())) + 1
+
+    network_edges = (pass_pairs(passing_df)[['match_id','player_1','player_2']]
+                     .drop_duplicates()
+                     .sort_values(['match_id','player_1','player_2'])
+                     .reset_index(drop=True))
+
+    network_counts = dict({'minutes': minutes},
+                          **network_prefix_sums(network_edges, touch_index, minutes, passing_df, location_df))
+
+    return network_edges, network_counts
+
+def pass_pairs(passing_df):
+    """Return the unordered passer/receiver pair of every completed pass."""
+    completed = passing_df[passing_df.receiver_id.notnull()]
+    return pd.DataFrame({'match_id': completed.match_id.to_numpy(),
+                         'player_1': np.minimum(completed.id, completed.receiver_id).to_numpy(dtype=int),
+                         'player_2': np.maximum(completed.id, completed.receiver_id).to_numpy(dtype=int),
+                         'minute': completed.minute.to_numpy(dtype=int)})
+
+def network_prefix_sums(network_edges, touch_index, minutes, passing_df, location_df):
+    """Return the per-minute prefix sums of passes and locations over the network rows."""
+
+    def prefix_sums(rows, n_rows, minute, weights=None):
+        keep = rows >= 0
+        slots = rows[keep] * (minutes + 1) + minute[keep] + 1
+        counts = np.bincount(slots, weights=None if weights is None else weights[keep],
+                             minlength=n_rows * (minutes + 1))
+        return counts.reshape(n_rows, minutes + 1).cumsum(axis=1)
+
+    pairs = pass_pairs(passing_df)
+    edge_rows = (pairs.merge(network_edges.reset_index(), how='left', on=['match_id','player_1','player_2'])
+                 ['index'].fillna(-1).astype(int).to_numpy())
+    completed = passing_df[passing_df.receiver_id.notnull()]
+    rows = touch_rows(touch_index, location_df)
+    location_minute = location_df.minute.to_numpy(dtype=int)
+    return {
+        'edges': prefix_sums(edge_rows, len(network_edges), pairs.minute.to_numpy()).astype(np.uint16),
+        'passes': prefix_sums(touch_rows(touch_index, completed), len(touch_index),
+                              completed.minute.to_numpy(dtype=int)).astype(np.uint16),
+        'touches': prefix_sums(rows, len(touch_index), location_minute).astype(np.uint16),
+        'x_sum': prefix_sums(rows, len(touch_index), location_minute, location_df.x_pos.to_numpy(dtype=float)),
+        'y_sum': prefix_sums(rows, len(touch_index), location_minute, location_df.y_pos.to_numpy(dtype=float)),
+    }
 
-mask = (~events.play_pattern.isin(['From Free Kick', 'From Corner']))
+def add_network_events(network_edges, network_counts, touch_index, touch_counts, passing_df, location_df):
+    """Add the passes and locations of new events to the network and touch maps.
+
+    Players and edges not seen before get zero rows at their place in the
+    sorted tables and the minutes are extended if needed; the counts of the
+    new events are then added to the existing prefix sums.
+    """
+    def insert_rows(table, new, keys):
+        new = (new[table.columns].drop_duplicates(keys)
+               .merge(table[keys], how='left', on=keys, indicator=True))
+        new = new[new._merge == 'left_only'].drop('_merge', axis=1)
+        merged = pd.concat([table, new], ignore_index=True).sort_values(keys, kind='stable')
+        return merged.reset_index(drop=True), merged.index.to_numpy()
+
+    def reorder(counts, order):
+        zeros = np.zeros((len(order) - len(counts),) + counts.shape[1:], dtype=counts.dtype)
+        return np.concatenate([counts, zeros])[order]
+
+    touch_index, touch_order = insert_rows(touch_index, location_df, ['match_id','id'])
+    network_edges, edge_order = insert_rows(network_edges, pass_pairs(passing_df), ['match_id','player_1','player_2'])
+    last_minute = np.max(np.concatenate([passing_df.minute.to_numpy(dtype=float),
+                                         location_df.minute.to_numpy(dtype=float)]), initial=0)
+    minutes = max(network_counts['minutes'], int(last_minute) + 1)
+
+    added = network_prefix_sums(network_edges, touch_index, minutes, passing_df, location_df)
+    counts = {'minutes': minutes}
+    for name, new_counts in added.items():
+        old = reorder(network_counts[name], edge_order if name == 'edges' else touch_order)
+        # prefix sums stay flat after the last minute they count
+        old = np.concatenate([old, np.repeat(old[:, -1:], minutes - network_counts['minutes'], axis=1)], axis=1)
+        counts[name] = (old + new_counts).astype(old.dtype)
+
+    touch_counts = (reorder(touch_counts, touch_order)
+                    + touch_bin_counts(touch_rows(touch_index, location_df), len(touch_index), location_df))
+    return network_edges, counts, touch_index, touch_counts
+
+def network_window(network_edges, network_counts, touch_index, match_id, start=None, end=None):
+    """Return player positions and pass combinations of a match between two minutes."""
+    minutes = network_counts['minutes']
+    lo = 0 if start is None else int(np.clip(np.ceil(start), 0, minutes))
+    hi = minutes if end is None else int(np.clip(np.floor(end) + 1, lo, minutes))
+
+    first, last = np.searchsorted(touch_index.match_id.to_numpy(), [match_id, match_id + 1])
+    window = {name: network_counts[name][first:last, hi].astype(float) - network_counts[name][first:last, lo]
+              for name in ['passes', 'touches', 'x_sum', 'y_sum']}
+    played = window['touches'] > 0
+    passes = np.where(window['passes'] > 0, window['passes'], np.nan)[played]
+    positions = (touch_index.iloc[first:last].loc[played, ['id','team']]
+                 .assign(x_pos = window['x_sum'][played] / window['touches'][played],
+                         y_pos = window['y_sum'][played] / window['touches'][played],
+                         pass_frac = passes / np.nanmax(passes) if (passes > 0).any() else passes)
+                 .assign(**{'pass': passes})
+                 .reset_index(drop=True))
+
+    first, last = np.searchsorted(network_edges.match_id.to_numpy(), [match_id, match_id + 1])
+    passes = network_counts['edges'][first:last, hi].astype(int) - network_counts['edges'][first:last, lo]
+    pass_combinations = (network_edges.iloc[first:last].loc[passes > 0, ['player_1','player_2']]
+                         .assign(passes = passes[passes > 0])
+                         .assign(pass_frac = lambda x: x['passes']/x['passes'].max())
+                         .reset_index(drop=True))
+
+    return positions, pass_combinations
+
+def build_lineups(events, matches):
+    """Return starting XI player ids by match and home/away."""
+    lineups_df = (events.loc[events.event_type == 'Starting XI', 
+                          ['match_id','team','tactics']]
+                  .merge(pd.melt(matches, id_vars=['match_id'], value_vars=['home','away'], 
+                                 var_name='team_type', value_name='team'),
+                         how='left', on=['match_id','team']))
+
+    lineups = (lineups_df
+               .assign(starting = lineups_df.tactics.apply(lambda x: [player['player']['id'] for player in x['lineup']]))
+               .pivot(index='match_id', columns='team_type', values='starting'))
+
+    return lineups
+
+def match_lineup(lineups, match_id):
+    """Return the starting XI ids of a match, empty until they are announced."""
+    row = lineups.reindex([match_id]).iloc[0]
+    return {side: list(row[side]) if isinstance(row.get(side), list) else [] for side in ['home','away']}
+
+def read_squads(match_ids, data_dir=data_dir):
+    """Return every player named in the data/lineups files of the matches."""
+    def read_squad(match_id):
+        with open('{}/lineups/{}.json'.format(data_dir, match_id), encoding='utf-8') as f:
+            teams = json.load(f)
+        return pd.DataFrame([{'match_id': match_id,
+                              'team': team['team_name'],
+                              'id': player['player_id'],
+                              'name': player['player_name'],
+                              'nickname': player.get('player_nickname'),
+                              'jersey_number': player['jersey_number'],
+                              'country': (player.get('country') or {}).get('name')}
+                             for team in teams for player in team['lineup']])
+
+    return pd.concat([read_squad(match_id) for match_id in match_ids], ignore_index=True)
+
+# Shorter names for players whose full name does not fit the passing network.
+display_names = {
+    'Cristiano Ronaldo dos Santos Aveiro': 'Cristiano Ronaldo',
+    'Lionel Andrés Messi Cuccittini': 'Lionel Messi',
+}
 
-location = events[mask & (pd.notnull(events.player_id)) & (pd.notnull(events.location))]
+def build_players(squads, events):
+    """Return the player dimension, one row per player id.
+
+    Every other table refers to players by id only; names are looked up here
+    when a view is rendered. Players missing from the lineups files are
+    taken from the events.
+    """
+    from_events = (events.loc[events.player_id.notnull(), ['player_id','player_name']]
+                   .rename(columns = {'player_id': 'id', 'player_name': 'name'}))
+    players = (pd.concat([squads.iloc[::-1], from_events], ignore_index=True, sort=False)
+               .drop_duplicates('id')
+               .astype({'id': int, 'jersey_number': 'Int64'})
+               .set_index('id')
+               .sort_index())
+
+    return (players
+            .assign(short_name = players.nickname.fillna(players.name.replace(display_names)))
+            .loc[:, ['name','short_name','jersey_number','country']])
+
+def event_clock(df):
+    """Return a sortable game clock in seconds that keeps periods apart."""
+    seconds = df['second'] if 'second' in df else df['seconds']
+    return df.period * 10000 + df.minute * 60 + seconds
+
+segment_gap = 60
+
+def build_segments(events, matches, lineups, players):
+    """Return the on-pitch segments of every match.
+
+    A new segment starts whenever either team makes a substitution or a
+    tactical shift. Changes less than segment_gap seconds apart, such as a
+    double substitution, start one segment. Each segment holds the player ids
+    on the pitch for the home and away team and a label naming its changes.
+    """
+    changes = (events[events.event_type.isin(['Substitution', 'Tactical Shift'])]
+               .assign(clock = event_clock)
+               .sort_values(['match_id','clock']))
+    changes = changes.assign(group = (changes.groupby('match_id').clock.diff() >= segment_gap).cumsum())
+    short_name = lambda player_id: players.short_name.get(player_id, str(player_id)).split()[-1].upper()
+
+    segments = []
+    for match_id, match in matches.set_index('match_id').iterrows():
+        teams = {match['home']: 'home', match['away']: 'away'}
+        on_pitch = match_lineup(lineups, match_id)
+        start, clock, label = 0.0, 0, 'STARTING XI'
+        for _, change in changes[changes.match_id == match_id].groupby('group', sort=True):
+            first = change.iloc[0]
+            minute = first.minute + first.second / 60
+            segments.append({'match_id': match_id, 'start': start, 'end': minute,
+                             'clock': clock, 'label': label,
+                             'home': list(on_pitch['home']), 'away': list(on_pitch['away'])})
+            described = []
+            for _, event in change.iterrows():
+                side = teams[event.team]
+                if event.event_type == 'Substitution':
+                    replacement = event.substitution['replacement']['id']
+                    on_pitch[side] = [replacement if player == event.player_id else player
+                                      for player in on_pitch[side]]
+                    described.append('{} FOR {}'.format(short_name(replacement), short_name(event.player_id)))
+                else:
+                    on_pitch[side] = [player['player']['id'] for player in event.tactics['lineup']]
+                    described.append('{} {}'.format(event.team.upper(), event.tactics['formation']))
+            start, clock, label = minute, first.clock, ', '.join(described)
+        segments.append({'match_id': match_id, 'start': start, 'end': None,
+                         'clock': clock, 'label': label,
+                         'home': list(on_pitch['home']), 'away': list(on_pitch['away'])})
+
+    segments = pd.DataFrame(segments)
+    return segments.assign(segment = segments.groupby('match_id').cumcount())
+
+def build_segment_networks(passing_df, location_df, segments):
+    """Return player positions and pass combinations of every segment."""
+    def with_segment(df):
+        return (pd.merge_asof(df.assign(clock = event_clock).sort_values('clock'),
+                              segments[['match_id','clock','segment']].sort_values('clock'),
+                              on='clock', by='match_id')
+                .drop('clock', axis=1))
+
+    completed = with_segment(passing_df[passing_df.receiver_id.notnull()])
+    passing_factor = (completed
+                      .groupby(['match_id','segment','id'])
+                      .size()
+                      .rename('pass'))
+    segment_positions = (with_segment(location_df)
+                         .groupby(['match_id','segment','id','team'])
+                         .agg({'x_pos': 'mean', 'y_pos': 'mean'})
+                         .reset_index()
+                         .join(passing_factor, on=['match_id','segment','id'])
+                         .assign(pass_frac = lambda x: x['pass'] / x.groupby(['match_id','segment'])['pass'].transform('max'))
+                         .set_index(['match_id','segment'])
+                         .sort_index())
+
+    segment_edges = (completed
+                     .assign(player_1 = np.minimum(completed.id, completed.receiver_id).astype(int),
+                             player_2 = np.maximum(completed.id, completed.receiver_id).astype(int))
+                     .groupby(['match_id','segment','player_1','player_2'])
+                     .size()
+                     .rename('passes')
+                     .reset_index()
+                     .assign(pass_frac = lambda x: x['passes'] / x.groupby(['match_id','segment'])['passes'].transform('max'))
+                     .set_index(['match_id','segment'])
+                     .sort_index())
+
+    return segment_positions, segment_edges
+
+def build_top_xg(shots_df):
+    """Return the top three players by total xG in each match."""
+    top_xg = (shots_df
+              .assign(is_goal = np.where(shots_df.outcome == 'Goal', 1, 0))
+              .groupby(['match_id','team','id'])
+              .agg({'xg': ['sum', 'count', 'max'], 'is_goal':['sum']})
+              .T.reset_index(drop=True).T
+              .rename(columns = {
+                                  0: 'total_xg',
+                                  1: 'shots',
+                                  2: 'max_xg',
+                                  3: 'goals'
+                                })
+              .reset_index()
+              .sort_values(['match_id','total_xg'], ascending=[True, False])
+              .groupby('match_id').head(3)
+              .reset_index(drop=True))
+
+    return top_xg
+
+def build_search_entries(events, matches, players):
+    """Return the searchable matches, teams and players with their match ids."""
+    teams = pd.melt(matches, id_vars=['match_id'], value_vars=['home','away'], value_name='label')
+    appearances = (events.loc[events.player_id.notnull(), ['match_id','player_id']]
+                   .drop_duplicates()
+                   .assign(label = lambda x: x.player_id.astype(int).map(players.name))
+                   .loc[:, ['match_id','label']])
+
+    return (pd.concat([matches.loc[:, ['match_id']].assign(label = matches.description, kind = 'match'),
+                       teams.loc[:, ['match_id','label']].assign(kind = 'team'),
+                       appearances.assign(kind = 'player')],
+                      ignore_index=True)
+            .merge(matches.loc[:, ['match_id','match_date']], on='match_id')
+            .sort_values('match_date')
+            .groupby(['kind','label'], sort=False)
+            .match_id.agg(list)
+            .rename('match_ids')
+            .reset_index())
+
+def build_xg_timelines(shots_df, events, matches):
+    """Return compact cumulative xG series for every (match, team).
+
+    Each row of the index table points to a slice of the minutes and cum_xg
+    arrays holding that team's step series, from 0 at kick off to the
+    match's last minute, as drawn by create_xg_plot.
+    """
+    ends = events.groupby('match_id').minute.max() + 1
+    shots = shots_df.sort_values(['match_id','team','period','dec_time'])
+    positions = shots.groupby(['match_id','team']).indices
+    dec_time, cum_xg = shots.dec_time.to_numpy(), shots.cum_xg.to_numpy()
+
+    rows, minutes, xg = [], [], []
+    start = 0
+    for match in matches.itertuples():
+        for team, opponent in [(match.home, match.away), (match.away, match.home)]:
+            shot_rows = positions.get((match.match_id, team), [])
+            team_xg = cum_xg[shot_rows]
+            minutes.append(np.concatenate([[0], dec_time[shot_rows], [ends.get(match.match_id, 0)]]))
+            xg.append(np.concatenate([[0], team_xg, [team_xg[-1] if len(team_xg) else 0]]))
+            stop = start + len(shot_rows) + 2
+            rows.append((match.match_id, team, opponent, match.stage, start, stop))
+            start = stop
+
+    xg_timelines = pd.DataFrame(rows, columns=['match_id','team','opponent','stage','start','stop'])
+    return (xg_timelines,
+            np.concatenate(minutes).astype(np.float32),
+            np.concatenate(xg).astype(np.float32))
+
+# Team radar statistics per minute, so that the radar of a zoom window is a
+# sum over its minutes. Pass length is kept as a sum over completed passes
+# and divided by their number once summed; shots are sent one by one (see
+# zoom_data).
+
+radar_event_types = ['Pressure','Dribble','Block','Foul Committed','Clearance','Foul Won','Interception','Dispossessed']
+
+def build_radar_minutes(events, passing_df):
+    """Return the additive radar statistics of every (match, team, minute)."""
+    keys = ['match_id','team','minute']
+    event_counts = (events[events.event_type.isin(radar_event_types)]
+                    .assign(event_type = lambda x: x.event_type.str.replace(' ', '_').str.lower())
+                    .groupby(keys + ['event_type'])
+                    .size()
+                    .unstack(fill_value=0))
+    pass_counts = (passing_df[passing_df.outcome.isnull()]
+                   .assign(progressive = lambda x: (x.angle < 90) & (x.angle > -90))
+                   .groupby(keys)
+                   .agg(passes = ('id', 'count'),
+                        pass_length_sum = ('length', 'sum'),
+                        progressive_passes = ('progressive', 'sum')))
+    crosses = passing_df.groupby(keys).is_cross.sum().astype(int)
+    columns = ([event_type.replace(' ', '_').lower() for event_type in radar_event_types]
+               + ['passes','pass_length_sum','progressive_passes','is_cross'])
+    return (event_counts
+            .join(pass_counts, how='outer')
+            .join(crosses, how='outer')
+            .reindex(columns=columns)
+            .fillna(0)
+            .sort_index())
+
+# Replay
+# Events with a location are kept as compact time-ordered arrays. The replay
+# clock runs the periods one after another, and the away team is flipped so
+# that both teams share one pitch with home attacking upwards. The browser
+# is sent the match in chunks of replay_chunk_seconds and keeps only the
+# chunks around its clock.
+
+replay_chunk_seconds = 300
+replay_trail_seconds = 8
+
+def build_replay_frames(events, matches):
+    """Return the replay index by match and the replay arrays."""
+    located = events[events.location.notnull()]
+    home = matches.set_index('match_id').home
+    coords = np.array(located.location.tolist(), dtype=float)[:, :2]
+    away = (located.team.to_numpy() != located.match_id.map(home).to_numpy())
+
+    frames = (pd.DataFrame({
+                    'match_id': located.match_id.to_numpy(),
+                    'period': located.period.to_numpy(),
+                    'clock': located.minute.to_numpy() * 60 + located.second.to_numpy(),
+                    'minute': located.minute.to_numpy(),
+                    'x': np.where(away, 120 - coords[:, 0], coords[:, 0]),
+                    'y': np.where(away, 80 - coords[:, 1], coords[:, 1]),
+                    'away': away,
+                    'player': located.player_id.fillna(-1).to_numpy(dtype=np.int32),
+                    'event': located.event_type.to_numpy()})
+              .rename_axis('order')
+              .sort_values(['match_id','period','clock','order'])
+              .reset_index(drop=True))
+
+    periods = frames.groupby(['match_id','period']).clock.agg(['min','max'])
+    length = periods['max'] - periods['min'] + 1
+    offset = (length.groupby('match_id').cumsum() - length - periods['min']).rename('offset')
+    frames = frames.join(offset, on=['match_id','period'])
+    t = (frames.clock + frames.offset).to_numpy()
+
+    event_codes, event_names = pd.factorize(frames.event)
+    replay_frames = {
+        't': t.astype(np.int32),
+        'minute': frames.minute.to_numpy().astype(np.uint8),
+        'x': np.clip(frames.x.round(), 0, 120).to_numpy().astype(np.uint8),
+        'y': np.clip(frames.y.round(), 0, 80).to_numpy().astype(np.uint8),
+        'away': frames.away.to_numpy().astype(np.uint8),
+        # player ids, -1 for events without a player
+        'player': frames.player.to_numpy(dtype=np.int32),
+        'event': event_codes.astype(np.int16),
+        'event_names': event_names.to_numpy(dtype=object),
+    }
 
-location_df = pd.DataFrame(
-                    list(zip(
-                        location.player_name,
-                        location.player_id,
-                        location.period,
-                        location.minute,
-                        location.second,
-                        location.location,
-                        location.location.apply(lambda x: x[0]),
-                        location.location.apply(lambda x: x[1]),
-                        location.team,
-                        location.event_type,
-                        location.match_id
-                        )), columns=['name','id','period','minute','seconds',
-                                     'location','x_pos','y_pos','team','event','match_id'])
-
-# create lineup data
-
-lineups_df = (events.loc[events.event_type == 'Starting XI', 
-                      ['match_id','team','tactics']]
-              .merge(pd.melt(matches, id_vars=['match_id'], value_vars=['home','away'], 
-                             var_name='team_type', value_name='team'),
-                     how='left', on=['match_id','team']))
-
-lineups = (lineups_df
-           .assign(starting = lineups_df.tactics.apply(lambda x: [player['player']['id'] for player in x['lineup']]))
-           .pivot(index='match_id', columns='team_type', values='starting'))
-
-# create top xg data
-
-top_xg = (shots_df
-          .assign(is_goal = np.where(shots_df.outcome == 'Goal', 1, 0))
-          .groupby(['match_id','team','name','id'])
-          .agg({'xg': ['sum', 'count', 'max'], 'is_goal':['sum']})
-          .T.reset_index(drop=True).T
-          .rename(columns = {
-                              0: 'total_xg',
-                              1: 'shots',
-                              2: 'max_xg',
-                              3: 'goals'
-                            })
-          .reset_index()
-          .sort_values(['match_id','total_xg'], ascending=[True, False])
-          .groupby('match_id').head(3)
-          .reset_index(drop=True))
-
-top_xg.loc[:, 'hover_text'] = (top_xg.name 
-                                + '<br>Total xG: '
-                                + top_xg.total_xg.map('{:.3f}'.format)
-                                + '<br>Shots: '
-                                + top_xg.shots.map('{:.0f}'.format)
-                                + '<br>Goals: '
-                                + top_xg.goals.map('{:.0f}'.format)
-                                + '<br>Max xG: '
-                                + top_xg.max_xg.map('{:.3f}'.format))
-
-# create passing angles dataframe
+    positions = np.arange(len(frames))
+    replay_index = (pd.DataFrame({'match_id': frames.match_id, 'position': positions, 't': t})
+                    .groupby('match_id')
+                    .agg(start = ('position', 'min'),
+                         stop = ('position', 'max'),
+                         end = ('t', 'max'))
+                    .assign(stop = lambda x: x.stop + 1))
+
+    return replay_index, replay_frames
+
+def replay_chunk(replay_index, replay_frames, match_id, chunk):
+    """Return the events of one replay chunk of a match, ready to send."""
+    start, stop, end = replay_index.loc[match_id, ['start','stop','end']]
+    t = replay_frames['t'][start:stop]
+    lo, hi = start + np.searchsorted(t, [chunk * replay_chunk_seconds, (chunk + 1) * replay_chunk_seconds])
+    player_ids, player_codes = np.unique(replay_frames['player'][lo:hi], return_inverse=True)
+    event_types, event_codes = np.unique(replay_frames['event'][lo:hi], return_inverse=True)
+    return {
+        'match_id': match_id,
+        'chunk': chunk,
+        'last': bool(hi >= stop),
+        'end': int(end),
+        't': replay_frames['t'][lo:hi].tolist(),
+        'minute': replay_frames['minute'][lo:hi].tolist(),
+        'x': replay_frames['x'][lo:hi].tolist(),
+        'y': replay_frames['y'][lo:hi].tolist(),
+        'away': replay_frames['away'][lo:hi].tolist(),
+        'p': player_codes.tolist(),
+        'players': players.name.reindex(player_ids).fillna('').tolist(),
+        'e': event_codes.tolist(),
+        'events': replay_frames['event_names'][event_types].tolist(),
+    }
 
 pass_color_dic = {
     1: 'rgb(152, 252, 36)',
@@ -366,22 +1066,314 @@ pass_description = {
     5: 'Very Long',
 }
 
-pass_angles = (passing_df
-              .assign(mod_angle = np.where(passing_df.angle < 0, 360 + passing_df.angle, passing_df.angle))
-              .assign(pass_sector = lambda x: pd.cut(x.mod_angle, 
-                                                    bins = np.linspace(11.25, 348.75, 16),
-                                                    labels = list(range(1, 16))))
-              .assign(pass_sector = lambda x: x.pass_sector.astype('float'))
-              .fillna({'pass_sector': 0})  
-              .groupby(['match_id', 'team', 'id', 'name', 'pass_sector'])
-              .agg({'length': ['count', 'mean']})
-              .length
-              .reset_index()
-              .assign(pass_style = lambda x: pd.cut(x['mean'],
-                                                   bins = [0, 10, 20, 40, 60, 130],
-                                                   labels = [1, 2, 3, 4, 5]),
-                      pass_color = lambda x: x['pass_style'].map(pass_color_dic),
-                      hover_text = lambda x: x['pass_style'].map(pass_description)))
+def build_pass_angles(passing_df):
+    """Return pass counts and mean length by player and angle sector."""
+    pass_angles = (passing_df
+                  .assign(mod_angle = np.where(passing_df.angle < 0, 360 + passing_df.angle, passing_df.angle))
+                  .assign(pass_sector = lambda x: pd.cut(x.mod_angle, 
+                                                        bins = np.linspace(11.25, 348.75, 16),
+                                                        labels = list(range(1, 16))))
+                  .assign(pass_sector = lambda x: x.pass_sector.astype('float'))
+                  .fillna({'pass_sector': 0})  
+                  .groupby(['match_id', 'team', 'id', 'pass_sector'])
+                  .agg({'length': ['count', 'mean']})
+                  .length
+                  .reset_index()
+                  .pipe(with_pass_style))
+
+    return pass_angles
+
+def with_pass_style(pass_angles):
+    """Add the pass length style, color and description of every sector."""
+    return pass_angles.assign(pass_style = lambda x: pd.cut(x['mean'],
+                                                           bins = [0, 10, 20, 40, 60, 130],
+                                                           labels = [1, 2, 3, 4, 5]),
+                              pass_color = lambda x: x['pass_style'].map(pass_color_dic),
+                              hover_text = lambda x: x['pass_style'].map(pass_description))
+
+# Per-player aggregates over every loaded match. They hold only additive
+# quantities (counts and sums), so the stats of newly loaded matches are
+# added to them without going back over the passes of earlier matches, and a
+# match whose stats change has its old stats taken out and the new ones added.
+
+def aggregate_player_stats(pass_angles, disp_table):
+    """Return additive per-player sector and stat totals for some matches."""
+    player_sectors = (pass_angles
+                      .assign(length_sum = pass_angles['count'] * pass_angles['mean'])
+                      .groupby(['id', 'team', 'pass_sector'])
+                      [['count', 'length_sum']]
+                      .sum())
+
+    player_totals = (disp_table
+                     .assign(matches = 1,
+                             completed = disp_table.pass_completion_rate * disp_table.num_passes,
+                             progressive = disp_table.percent_progressive_passes * disp_table.num_passes,
+                             pass_length = disp_table.average_pass_length * disp_table.num_passes)
+                     .groupby(['id', 'team'])
+                     [['matches', 'num_passes', 'completed', 'progressive', 'pass_length',
+                       'xg_contribution', 'xg_buildup', 'xg_assist', 'xg_shot',
+                       'xt_pass', 'xt_carry', 'xt_added']]
+                     .sum())
+
+    return player_sectors, player_totals
+
+def update_player_aggregates(player_sectors, player_totals, pass_angles, disp_table,
+                             old_pass_angles=None, old_disp_table=None):
+    """Add the stats of newly loaded matches to the per-player aggregates.
+
+    old_pass_angles and old_disp_table are the rows the aggregates already
+    hold for any of these matches; they are taken out, so that the new rows
+    replace them rather than being counted twice.
+    """
+    added_sectors, added_totals = aggregate_player_stats(pass_angles, disp_table)
+    if player_sectors is None:
+        return added_sectors.sort_index(), added_totals.sort_index()
+
+    new_sectors = player_sectors.add(added_sectors, fill_value=0)
+    new_totals = player_totals.add(added_totals, fill_value=0)
+    if old_pass_angles is not None:
+        old_sectors, old_totals = aggregate_player_stats(old_pass_angles, old_disp_table)
+        new_sectors = new_sectors.sub(old_sectors, fill_value=0)
+        new_totals = new_totals.sub(old_totals, fill_value=0)
+        new_sectors = new_sectors[new_sectors['count'] > 0]
+        new_totals = new_totals[new_totals.matches > 0]
+    return (new_sectors.astype(player_sectors.dtypes).sort_index(),
+            new_totals.astype(player_totals.dtypes).sort_index())
+
+def player_rates(player_totals):
+    """Return per-player totals with their passing rates."""
+    return player_totals.assign(pass_completion_rate = lambda x: x.completed / x.num_passes,
+                                percent_progressive_passes = lambda x: x.progressive / x.num_passes,
+                                average_pass_length = lambda x: x.pass_length / x.num_passes)
+
+def player_aggregate_profile(player_sectors, player_totals, player_id):
+    """Return a player's pass sectors and stats over every loaded match.
+
+    Returns None for a player the aggregates do not hold, who made no pass.
+    """
+    if (player_id not in player_totals.index.get_level_values('id')
+            or player_id not in player_sectors.index.get_level_values('id')):
+        return None
+    sectors = (player_sectors.xs(player_id, level='id')
+               .groupby('pass_sector')[['count', 'length_sum']].sum()
+               .reset_index()
+               .assign(mean = lambda x: x.length_sum / x['count'])
+               .pipe(with_pass_style))
+    stats = player_rates(player_totals.xs(player_id, level='id').sum().to_frame().T).iloc[0]
+    return sectors, stats
+
+# Similar players
+# A player's style vector is their share of passes and mean pass length in
+# each of the 16 sectors together with their passing, xG and xT stats. The
+# vectors are standardised, projected onto their top principal components
+# and kept in a KD-tree, so that neighbours are found without a scan. The
+# tree's rows are also kept by player key and by player id, so that finding
+# the queried player and their other rows does not scan the index either.
+
+similarity_stats = ['num_passes','pass_completion_rate','percent_progressive_passes',
+                    'average_pass_length','xg_contribution','xg_buildup','xg_assist',
+                    'xg_shot','xt_added']
+similarity_dims = 10
+
+def build_similarity_index(sectors, stats, keys):
+    """Return the players of a style index, a KD-tree over their vectors and
+    the tree rows of every key and of every player id."""
+    shares = sectors.pivot_table(index=keys, columns='pass_sector', values='count',
+                                 aggfunc='sum', fill_value=0)
+    lengths = sectors.pivot_table(index=keys, columns='pass_sector', values='mean',
+                                  aggfunc='mean', fill_value=0)
+    features = (shares.div(shares.sum(axis=1), axis=0)
+                .join(lengths, lsuffix='_share', rsuffix='_length')
+                .join(stats.set_index(keys)[similarity_stats], how='inner'))
+
+    vectors = features.to_numpy(dtype=float)
+    vectors = (vectors - vectors.mean(axis=0)) / np.where(vectors.std(axis=0) > 0, vectors.std(axis=0), 1)
+    components = np.linalg.svd(vectors, full_matrices=False)[2][:similarity_dims]
+
+    players = features.index.to_frame(index=False)
+    key_rows = {key: row for row, key in enumerate(features.index)}
+    return players, KDTree(vectors @ components.T), key_rows, players.groupby('id').indices
+
+def find_similar_players(similarity_index, key, k=5):
+    """Return the k other players nearest in style to the player with key."""
+    players, tree, key_rows, id_rows = similarity_index
+    row = key_rows.get(key)
+    if row is None:
+        return players.iloc[[]]
+    own = set(id_rows[players.id.iat[row]])
+    _, nearest = tree.query(tree.points[row], k + len(own))
+    return players.iloc[[row for row in nearest if row not in own][:k]]
+
+leaderboard_columns = ['name','team','matches','num_passes','pass_completion_rate',
+                       'percent_progressive_passes','average_pass_length',
+                       'xg_contribution','xg_buildup','xg_assist','xg_shot','xt_added']
+
+def build_leaderboard(player_totals, players):
+    """Return per-player stats aggregated over every loaded match."""
+    leaderboard = (player_rates(player_totals)
+                   .reset_index()
+                   .join(players.name, on='id')
+                   .sort_values('xg_contribution', ascending=False, kind='stable')
+                   .reset_index(drop=True)
+                   [leaderboard_columns])
+
+    return leaderboard
+
+def build_leaderboard_order(leaderboard):
+    """Return the ascending row order of the leaderboard for every column."""
+    return {col: np.argsort(leaderboard[col].to_numpy(), kind='stable')
+            for col in leaderboard.columns}
+
+pipeline_profile = profiling.start_pipeline_profile()
+
+events = load_events(matches.match_id[~matches.match_id.isin(live_match_ids)])
+if live_feed:
+    live_events = read_live_events()
+    events = (pd.concat([events] + list(live_events.values()), ignore_index=True, sort=False)
+              .sort_values('match_id', kind='stable', ignore_index=True))
+    live_versions = {match_id: len(live_events.get(match_id, [])) for match_id in live_match_ids}
+squads = read_squads(matches.match_id)
+players = build_players(squads, events)
+
+# Tables built match by match from the events. match_tables rebuilds only
+# the rows of the matches whose events changed (see pipeline.py); the xT
+# grid is fitted on every match and kept as loaded. The module-level names
+# in match_table_names are set from match_tables.tables.
+match_tables = Pipeline([
+    Stage(['shots_df'], ['events'], lambda events: build_shots_df(events, match_info)),
+    Stage(['passing_df'], ['events'], build_passing_df),
+    Stage(['carries_df'], ['events'], build_carries_df),
+    Stage(['location_df'], ['events'], build_location_df),
+    Stage(['lineups'], ['events'], lambda events: build_lineups(events, matches)),
+    Stage(['xt_grid'], ['passing_df','carries_df','shots_df'], build_xt_grid, per_match=False),
+    Stage(['xt_stats'], ['passing_df','carries_df','xt_grid'], build_xt_stats),
+    Stage(['possessions','possession_players'], ['events','passing_df','shots_df'], build_possessions),
+    Stage(['xg_stats'], ['possession_players'], build_xg_stats),
+    Stage(['pass_stats'], ['passing_df'], build_pass_stats),
+    Stage(['disp_table'], ['pass_stats','xg_stats','xt_stats'], build_disp_table),
+    Stage(['top_xg'], ['shots_df'], build_top_xg),
+    Stage(['radar_minutes'], ['events','passing_df'], build_radar_minutes),
+    Stage(['pass_angles'], ['passing_df'], build_pass_angles),
+])
+match_table_names = ['events','shots_df','passing_df','carries_df','location_df','lineups',
+                     'xt_grid','xt_stats','possessions','possession_players','xg_stats',
+                     'pass_stats','disp_table','top_xg','radar_minutes','pass_angles']
+match_tables.build({'events': events})
+(events, shots_df, passing_df, carries_df, location_df, lineups, xt_grid, xt_stats, possessions,
+ possession_players, xg_stats, pass_stats, disp_table, top_xg, radar_minutes, pass_angles) = (
+    match_tables.tables[name] for name in match_table_names)
+
+touch_index, touch_counts = build_touch_maps(location_df)
+network_edges, network_counts = build_network_counts(passing_df, location_df, touch_index)
+segments = build_segments(events, matches, lineups, players)
+segment_positions, segment_edges = build_segment_networks(passing_df, location_df, segments)
+xg_timelines, timeline_minutes, timeline_xg = build_xg_timelines(shots_df, events, matches)
+replay_index, replay_frames = build_replay_frames(events, matches)
+search_entries = build_search_entries(events, matches, players)
+search_index = SearchIndex(search_entries.label)
+match_similarity = build_similarity_index(pass_angles, disp_table, ['match_id','id','team'])
+
+def build_aggregate_views(player_sectors, player_totals, players):
+    """Return the leaderboard, its row orders and the all-matches style index."""
+    leaderboard = build_leaderboard(player_totals, players)
+    player_per_match = player_rates(player_totals)
+    for column in ['num_passes','xg_contribution','xg_buildup','xg_assist','xg_shot','xt_added']:
+        player_per_match[column] = player_per_match[column] / player_per_match.matches
+    all_similarity = build_similarity_index(player_sectors.reset_index()
+                                            .assign(mean = lambda x: x.length_sum / x['count']),
+                                            player_per_match.reset_index(), ['id','team'])
+    return leaderboard, build_leaderboard_order(leaderboard), all_similarity
+
+def update_match_aggregates(match_ids, pass_angles, disp_table, old_pass_angles, old_disp_table, players):
+    """Return the per-player aggregates and their views with some matches' stats replaced."""
+    sectors, totals = update_player_aggregates(
+        player_sectors, player_totals,
+        pass_angles[pass_angles.match_id.isin(match_ids)],
+        disp_table[disp_table.match_id.isin(match_ids)],
+        old_pass_angles, old_disp_table)
+    return (sectors, totals) + build_aggregate_views(sectors, totals, players)
+
+player_sectors, player_totals = update_player_aggregates(None, None, pass_angles, disp_table)
+leaderboard, leaderboard_order, all_similarity = build_aggregate_views(
+    player_sectors, player_totals, players)
+
+profiling.finish_pipeline_profile(pipeline_profile, {'matches': len(matches), 'events': len(events)})
+
+# Live updates
+# Only the events appended to the feed are parsed. They are added to the
+# events of their match, whose rows match_tables then rebuilds in every
+# table downstream, and their passes and locations are added to the network
+# prefix sums. The match's old stats in the per-player aggregates are
+# replaced by its new ones. Segments, replay frames, search, xG timelines,
+# the xT grid and the per-match similarity index stay as loaded.
+#
+# An update builds all of its tables before rebinding any module-level
+# name, and then rebinds them together under the write side of
+# tables_lock. Server callbacks hold its read side while they run (see
+# below), so each one sees the tables of a single update throughout.
+# live_lock keeps pollers from building updates at the same time.
+#
+# pandas builds the hash tables of an index on its first lookup, and two
+# threads doing that first lookup at once can get wrong rows or errors, so
+# an update looks up every new table once before publishing it.
+
+live_lock = threading.Lock()
+tables_lock = ReadWriteLock()
+
+def apply_live_events(match_id, new_events):
+    """Add events appended to a live match to the tables its views use."""
+    global players, touch_index, touch_counts, network_edges, network_counts
+    global events, shots_df, passing_df, carries_df, location_df, lineups, xt_grid, xt_stats, possessions
+    global possession_players, xg_stats, pass_stats, disp_table, top_xg, radar_minutes, pass_angles
+    global player_sectors, player_totals, leaderboard, leaderboard_order, all_similarity
+
+    new_players = build_players(squads.iloc[:0], new_events)
+    new_players = pd.concat([players, new_players[~new_players.index.isin(players.index)]]).sort_index()
+
+    network = add_network_events(network_edges, network_counts, touch_index, touch_counts,
+                                 build_passing_df(new_events), build_location_df(new_events))
+
+    match_tables.append('events', new_events)
+    match_tables.update()
+    tables = match_tables.tables
+    aggregates = update_match_aggregates([match_id], tables['pass_angles'], tables['disp_table'],
+                                         pass_angles[pass_angles.match_id == match_id],
+                                         disp_table[disp_table.match_id == match_id], new_players)
+    info = live_score(match_id, tables['shots_df'])
+    build_indexes([new_players, *network, *tables.values(), *aggregates])
+
+    with tables_lock.write():
+        players = new_players
+        network_edges, network_counts, touch_index, touch_counts = network
+        (events, shots_df, passing_df, carries_df, location_df, lineups, xt_grid, xt_stats, possessions,
+         possession_players, xg_stats, pass_stats, disp_table, top_xg, radar_minutes, pass_angles) = (
+            tables[name] for name in match_table_names)
+        player_sectors, player_totals, leaderboard, leaderboard_order, all_similarity = aggregates
+        match_info[match_id] = info
+        live_versions[match_id] += len(new_events)
+
+def build_indexes(tables):
+    """Build the lookup tables of the row and column indexes of the pandas tables given."""
+    for table in tables:
+        for index in [getattr(table, 'index', None), getattr(table, 'columns', None)]:
+            if isinstance(index, pd.Index) and len(index):
+                index.get_loc(index[0])
+
+def live_score(match_id, shots_df):
+    """Return a live match's info with the score of its goals in shots_df."""
+    info = match_info[match_id]
+    goals = shots_df[(shots_df.match_id == match_id) & (shots_df.outcome == 'Goal')].team.value_counts()
+    return dict(info, home_score = int(goals.get(info['home'], 0)),
+                away_score = int(goals.get(info['away'], 0)))
+
+def poll_live_feed():
+    """Apply the events appended to the live feed since the last poll."""
+    with live_lock:
+        for match_id, new_events in read_live_events().items():
+            apply_live_events(match_id, new_events)
+
+for match_id in live_match_ids:
+    match_info[match_id] = live_score(match_id, shots_df)
 
 
 # XG PLOT
@@ -390,10 +1382,11 @@ def create_xg_plot(shots_df, events, top_xg, match_info, theme):
     """Return XG plot figure"""
     
     shots_df = shots_df.sort_values(['period','dec_time'])
+    shots_df = shots_df.assign(hover_text = shot_hover_text(shots_df))
 
     trace1 = go.Scatter(
                     x = [0] + list(shots_df[shots_df.team == match_info['home']].dec_time) + [events.minute.max() + 1],
-                    y = [0] + list(shots_df[shots_df.team == match_info['home']].cum_xg) + [list(shots_df[shots_df.team == match_info['home']].cum_xg)[-1]],
+                    y = [0] + list(shots_df[shots_df.team == match_info['home']].cum_xg) + (list(shots_df[shots_df.team == match_info['home']].cum_xg)[-1:] or [0]),
                     line = dict(color = team_colors['home'], shape='hv', width=2),
                     mode = 'lines',
                     name = match_info['home'].upper(),
@@ -403,7 +1396,7 @@ def create_xg_plot(shots_df, events, top_xg, match_info, theme):
 
     trace2 = go.Scatter(
                     x = [0] + list(shots_df[shots_df.team == match_info['away']].dec_time) + [events.minute.max() + 1],
-                    y = [0] + list(shots_df[shots_df.team == match_info['away']].cum_xg) + [list(shots_df[shots_df.team == match_info['away']].cum_xg)[-1]],
+                    y = [0] + list(shots_df[shots_df.team == match_info['away']].cum_xg) + (list(shots_df[shots_df.team == match_info['away']].cum_xg)[-1:] or [0]),
                     line = dict(color = team_colors['away'], shape='hv', width=2),
                     mode = 'lines',
                     name = match_info['away'].upper(),
@@ -412,7 +1405,7 @@ def create_xg_plot(shots_df, events, top_xg, match_info, theme):
     )
 
     #to plot top three player histogram
-    top_xg = top_xg.sort_values('total_xg', ascending=False)
+    top_xg = top_xg.sort_values('total_xg', ascending=False).assign(name = top_xg.id.map(players.name))
     trace3 = go.Bar(
                 x = top_xg.name,
                 y = top_xg.total_xg,
@@ -530,6 +1523,8 @@ def create_xg_plot(shots_df, events, top_xg, match_info, theme):
             'b': 35,
         },
         hovermode = 'closest',
+        # a redrawn plot of the same match, such as a live update, keeps its zoom
+        uirevision = match_info['description'],
         annotations = [
         # {
         #         'x': 0.5,
@@ -556,8 +1551,8 @@ def create_xg_plot(shots_df, events, top_xg, match_info, theme):
                         'color': graph_styles[theme]['titlefont']['color'],
                 },
                 'text': '{} {:.2f} - {:.2f} {}'.format(match_info['home'],
-                                                       shots_df[shots_df.team == match_info['home']].cum_xg.max(),
-                                                       shots_df[shots_df.team == match_info['away']].cum_xg.max(),
+                                                       np.nan_to_num(shots_df[shots_df.team == match_info['home']].cum_xg.max()),
+                                                       np.nan_to_num(shots_df[shots_df.team == match_info['away']].cum_xg.max()),
                                                        match_info['away']),
         },
         ]
@@ -568,12 +1563,74 @@ def create_xg_plot(shots_df, events, top_xg, match_info, theme):
 
 # plot(create_xg_plot(), 'test_plot.html', auto_open=True)
 
+# XG COMPARISON
+
+compare_colors = ['rgba(255,77,77, 1)', 'rgba(77,77,255, 1)', 'rgba(46,160,67, 1)',
+                  'rgba(240,160,30, 1)', 'rgba(150,80,200, 1)', 'rgba(30,170,190, 1)',
+                  'rgba(200,90,140, 1)', 'rgba(128,128,128, 1)']
+
+def create_xg_comparison(xg_timelines, minutes, cum_xg, theme):
+    """Return a figure overlaying the cumulative xG of the given series."""
+    data = [go.Scatter(
+                    x = minutes[row.start:row.stop].round(2),
+                    y = cum_xg[row.start:row.stop].round(3),
+                    line = dict(color = compare_colors[i % len(compare_colors)], shape='hv', width=2),
+                    mode = 'lines',
+                    name = '{} v {}'.format(row.team, row.opponent).upper(),
+                    hovertemplate = '{} v {} ({})<br>Minute: %{{x:.0f}}<br>Cum. xG: %{{y:.2f}}<extra></extra>'
+                                    .format(row.team, row.opponent, row.stage))
+            for i, row in enumerate(xg_timelines.itertuples())]
+
+    layout = go.Layout(
+            plot_bgcolor = graph_styles[theme]['bg_color'],
+            paper_bgcolor = graph_styles[theme]['bg_color'],
+            legend = {
+                'font': {
+                        'color': graph_styles[theme]['legendfont']['color']
+                    }
+                  },
+            xaxis = dict(
+                title = 'Minutes',
+                color = graph_styles[theme]['axis_color'],
+                gridcolor = graph_styles[theme]['grid_color'],
+                tickvals = np.linspace(0, 120, 9),
+            ),
+            yaxis = dict(
+                title = 'Expected Goals (xG)',
+                color = graph_styles[theme]['axis_color'],
+                gridcolor = graph_styles[theme]['grid_color'],
+            ),
+            margin = {
+                't': 10,
+                'r': 5,
+                'l': 45,
+                'b': 35,
+            },
+            hovermode = 'closest',
+            annotations = [] if len(xg_timelines) else [{
+                    'x': 0.5,
+                    'y': 0.5,
+                    'xref': 'paper',
+                    'yref': 'paper',
+                    'showarrow': False,
+                    'font': {
+                            'family': graph_styles[theme]['titlefont']['family'],
+                            'size': 20,
+                            'color': graph_styles[theme]['titlefont']['color'],
+                    },
+                    'text': 'SELECT MATCHES OR A TEAM TO COMPARE',
+            }]
+    )
+
+    return({'data': data, 'layout': layout})
+
 # Shot Plot
 
 def create_shot_scatter(shots_df, match_info, team):
     """Create shot scatter for home/away team."""
     shots_df_team = shots_df[(shots_df.team == match_info[team]) & 
                             (shots_df.location.apply(lambda x: x[0]) > 60)]
+    shots_df_team = shots_df_team.assign(hover_text = shot_hover_text(shots_df_team))
     shot_trace = go.Scatter(
                         x = shots_df_team.location.apply(lambda x: x[0]),
                         y = shots_df_team.location.apply(lambda x: x[1]),
@@ -774,14 +1831,11 @@ def create_spider_chart(events, shots_df, passing_df, match_info, theme):
 
     req_cols = ['Pressure','Dribble','Block','Foul Committed','Clearance','Foul Won','Interception','Dispossessed']
 
-    overall_stats = (events
-                    .assign(event_type = lambda x: x.event_type.astype(str))
-                    .query('event_type == @req_cols')
+    overall_stats = (events[events.event_type.isin(req_cols)]
                     .groupby(['team', 'event_type'])
-                    .agg({'event_type': 'count'})
+                    .size()
                     .unstack()
-                    ['event_type']
-                    .loc[:, :]
+                    .reindex([match_info['home'], match_info['away']])
                     .rename_axis('team'))
     
     missing_events = set(req_cols) - set(overall_stats.columns.values.tolist())
@@ -1241,6 +2295,21 @@ def create_full_field(theme):
 
 full_field = {'dark': create_full_field('dark'), 'light': create_full_field('light')}
 
+def create_replay_layout(theme):
+    """Return the pitch layout the replay frames are drawn on in the browser."""
+    return {
+        'shapes': [shape for shape in full_field[theme] if 'xref' not in shape],
+        'hovermode': 'closest',
+        'xaxis': {'range': [-5, 85], 'visible': False, 'fixedrange': True},
+        'yaxis': {'range': [-5, 125], 'visible': False, 'fixedrange': True},
+        'plot_bgcolor': graph_styles[theme]['bg_color'],
+        'paper_bgcolor': graph_styles[theme]['bg_color'],
+        'font': {'color': graph_styles[theme]['titlefont']['color'],
+                 'family': graph_styles[theme]['titlefont']['family']},
+        'showlegend': False,
+        'margin': {'l': 0, 'r': 0, 't': 30, 'b': 0},
+    }
+
 def create_map_traces(team, positions, pass_combinations, starting, match_info):
     """Create passing network map traces for team."""
     position_team = positions[positions.id.isin(starting[team])]
@@ -1251,7 +2320,7 @@ def create_map_traces(team, positions, pass_combinations, starting, match_info):
                                 name = match_info[team],
                                 mode = 'markers+text',
                                 marker = {
-                                        'size': 40 * position_team.pass_frac,
+                                        'size': 40 * position_team.pass_frac.fillna(0),
                                         'color': team_colors[team],
                                         'opacity': 1
                                     },
@@ -1261,24 +2330,20 @@ def create_map_traces(team, positions, pass_combinations, starting, match_info):
 #                                     'size': 30
                                 },
                                 textposition = 'bottom center' if team=='home' else 'top center',
-                                text = (position_team.name
-                                        .replace({
-                                            'Cristiano Ronaldo dos Santos Aveiro': 'Cristiano Ronaldo',
-                                            'Lionel Andrés Messi Cuccittini': 'Lionel Messi'
-                                            })
+                                text = (position_team.id.map(players.short_name)
                                         .apply(lambda x: x.split()[-1].upper())),
-                                customdata = position_team.name,
+                                customdata = position_team.id,
                                 hoverinfo = 'text',
                                 xaxis = 'x2' if team == 'away' else 'x',
                                 yaxis = 'y2' if team == 'away' else 'y',)
 
     comb_team = (pass_combinations[(pass_combinations.player_1.isin(starting[team])) &
                      (pass_combinations.player_2.isin(starting[team]))]
-                 .merge(position_team[['id','name','x_pos','y_pos']], left_on='player_1', right_on='id', how='left')
+                 .merge(position_team[['id','x_pos','y_pos']], left_on='player_1', right_on='id', how='left')
                  .drop('id', axis=1)
-                 .rename(columns={'name': 'player_1_name','x_pos': 'player_1_x_pos', 'y_pos': 'player_1_y_pos'})
-                 .merge(position_team[['id','name','x_pos','y_pos']], left_on='player_2', right_on='id', how='left')
-                 .rename(columns={'name': 'player_2_name','x_pos': 'player_2_x_pos', 'y_pos': 'player_2_y_pos'})
+                 .rename(columns={'x_pos': 'player_1_x_pos', 'y_pos': 'player_1_y_pos'})
+                 .merge(position_team[['id','x_pos','y_pos']], left_on='player_2', right_on='id', how='left')
+                 .rename(columns={'x_pos': 'player_2_x_pos', 'y_pos': 'player_2_y_pos'})
                  .drop('id', axis=1))
 
     line_team = []
@@ -1293,7 +2358,7 @@ def create_map_traces(team, positions, pass_combinations, starting, match_info):
                             },
                         showlegend = False,
                         opacity = row['pass_frac'] * 0.9,
-                        text = 'Number of Passes: {}'.format(row['passes']),
+                        text = 'Number of Passes: {}'.format(int(row['passes'])),
                         hoverinfo = 'text',
                         xaxis = 'x2' if team == 'away' else 'x',
                         yaxis = 'y2' if team == 'away' else 'y',
@@ -1302,35 +2367,40 @@ def create_map_traces(team, positions, pass_combinations, starting, match_info):
     
     return(line_team + [formation_team])
 
-def create_passing_network_map(passing_df, location_df, starting, match_info, theme):
-    """Create passing network map for both home and away teams."""
-    
-    passing_factor = (passing_df[passing_df.receiver_name.notnull()] 
-                     .groupby(['id'], as_index=False)
-                     .name.count()
-                     .rename(columns={'name':'pass'})
-                     .assign(pass_frac = lambda x: x['pass']/x['pass'].max()))
-
-    positions = (location_df
-                 .groupby(['id','name','team'], as_index=False)
-                 .agg({
-                     'x_pos': 'mean',
-                     'y_pos': 'mean'})
-                 .merge(passing_factor, how='left', on='id'))
-
-    positions.loc[:, 'hover_text'] = positions.name + '<br>Passes: ' + positions['pass'].map('{:.0f}'.format)
-
-    pass_combinations = (passing_df[passing_df.receiver_name.notnull()]
-                         .assign(player_1 = lambda x: x.apply(lambda y: list({y['id'], y['receiver_id']})[0], axis=1),
-                                 player_2 = lambda x: x.apply(lambda y: list({y['id'], y['receiver_id']})[1], axis=1))
-                         .groupby(['player_1','player_2'], as_index=False)
-                         .location.count()
-                         .rename(columns = {'location':'passes'})
-                         .assign(pass_frac = lambda x: x['passes']/x['passes'].max()))
+def create_touch_heatmap(team, counts):
+    """Create a touch density heatmap trace for team's half of the map."""
+    return go.Heatmap(
+                    z = counts,
+                    x0 = 80 / touch_bins[1] / 2,
+                    dx = 80 / touch_bins[1],
+                    y0 = 120 / touch_bins[0] / 2,
+                    dy = 120 / touch_bins[0],
+                    zmin = 0,
+                    colorscale = [[0, team_colors[team].replace(' 1)', ' 0)')], [1, team_colors[team]]],
+                    zsmooth = 'best',
+                    showscale = False,
+                    hoverinfo = 'skip',
+                    xaxis = 'x2' if team == 'away' else 'x',
+                    yaxis = 'y2' if team == 'away' else 'y',)
+
+def create_passing_network_map(positions, pass_combinations, starting, match_info, theme, heatmaps=None):
+    """Create passing network map for both home and away teams.
+
+    positions and pass_combinations are the player nodes and pass edges of
+    the match, as returned by network_window. With heatmaps, a dict of
+    team -> touch counts, the pass lines are replaced by the touch density of
+    each team and only the player nodes are drawn.
+    """
+
+    positions.loc[:, 'hover_text'] = positions.id.map(players.name) + '<br>Passes: ' + positions['pass'].map('{:.0f}'.format)
 
     home_traces = create_map_traces('home', positions, pass_combinations, starting, match_info)
     away_traces = create_map_traces('away', positions, pass_combinations, starting, match_info)
 
+    if heatmaps:
+        home_traces = [create_touch_heatmap('home', heatmaps['home'])] + home_traces[-1:]
+        away_traces = [create_touch_heatmap('away', heatmaps['away'])] + away_traces[-1:]
+
     data = home_traces + away_traces
 
     layout = {
@@ -1389,11 +2459,12 @@ def create_passing_network_map(passing_df, location_df, starting, match_info, th
 
 angle_dic = {i: [i*22.5, i*22.5, (i*22.5) + 22.5, (i*22.5) + 22.5] for i in range(16)}
 
-def create_player_profile(pass_angles, player_name, match_info, theme):
+def create_player_profile(pass_angles, player_id, match_info, theme):
     """Create player profile visual."""
     
 
-    player_passes = pass_angles[pass_angles.name.str.contains(player_name)]
+    player_passes = pass_angles[pass_angles.id == player_id]
+    player_name = players.name[player_id]
     
     sector_traces = []
     for index, row in player_passes.iterrows():
@@ -1497,11 +2568,337 @@ how_is_it_worked_out = (
     "the pitch during a particular phase of play. The factors taken into "
     "account when assessing the quality of a chance include:")
 
-app = dash.Dash(__name__)
+# Figure callbacks run as background jobs when diskcache is installed. The
+# renderer sends the id of a superseded job along with each new request, so a
+# session that moves on to another match terminates its pending figure work
+# instead of leaving it queued in front of live requests. Each request gets a
+# job key of its own: by default the key depends only on the arguments, and
+# sessions asking for the same figure would share one result, which the first
+# poll to read it deletes. The poll that reads a result gives it a minute
+# to live, but jobs store results without an expiry, so a result that is
+# never read (its session left first) stays until the cache is culled. The
+# cache is capped at job_cache_size bytes, past which the oldest results
+# are evicted, and every job_cache_sweep seconds a request removes the read
+# results whose minute is up. The singleflight counts are kept in a cache
+# of their own, out of reach of that eviction.
+job_cache_size = 256 * 2**20
+job_cache_sweep = 60
+
+try:
+    import diskcache
+    job_cache = diskcache.Cache('./cache', size_limit=job_cache_size)
+    flight_counters = diskcache.Cache('./cache/counters')
+    background_callback_manager = dash.DiskcacheManager(job_cache,
+                                                        cache_by=[lambda: uuid.uuid4().hex],
+                                                        expire=60)
+except ImportError:
+    job_cache = flight_counters = background_callback_manager = None
+
+figure_callback_options = ({'background': True, 'interval': 250}
+                           if background_callback_manager else {})
+
+app = dash.Dash(__name__, background_callback_manager=background_callback_manager)
 server = app.server
 
+if job_cache is not None:
+    job_cache_swept = time.time()
+
+    @server.before_request
+    def expire_job_results():
+        global job_cache_swept
+        if time.time() - job_cache_swept >= job_cache_sweep:
+            job_cache_swept = time.time()
+            job_cache.expire()
+
 app.title = 'WC 2018 MATCH EXPLORER'
 
+# Identical figure requests that arrive together (e.g. the default match on
+# match day) share one computation. Background jobs each run in a process of
+# their own, where threads have nothing to share, so with a background
+# manager workers on the same host coordinate through file locks in
+# WC_SINGLEFLIGHT_DIR, by default ./cache/singleflight, and count their
+# results in flight_counters. Without one, setting WC_SINGLEFLIGHT_DIR does
+# the same for the workers of a multi-process server.
+flight_dir = os.environ.get('WC_SINGLEFLIGHT_DIR', './cache/singleflight' if job_cache else None)
+figure_flight = SingleFlight(flight_dir, counters=flight_counters)
+
+def coalesced(func):
+    """Share one in-flight computation between identical concurrent calls."""
+    @functools.wraps(func)
+    def wrapper(*args):
+        key = (func.__name__, json.dumps(args, sort_keys=True, default=str))
+        return figure_flight.do(key, lambda: func(*args))
+    return wrapper
+
+# Static pre-render mode. With WC_STATIC_VIEWS pointing at the output of
+# export_static.py, the base match views are fetched by the browser as JSON
+# files and only passing network zooms and clicked player profiles reach
+# Python.
+# WC_STATIC_VIEWS_URL lets the files be served from another host.
+static_views = os.environ.get('WC_STATIC_VIEWS')
+static_views_url = os.environ.get('WC_STATIC_VIEWS_URL', '/static_views')
+
+def view_callback(*args, **kwargs):
+    """Register a base view callback unless views are served statically."""
+    if static_views:
+        return lambda func: func
+    return app.callback(*args, **kwargs)
+
+# Passing network segments
+
+def segment_options(match_id):
+    """Return the segment dropdown options of a match."""
+    options = [{'label': 'FULL MATCH', 'value': 'match'}]
+    for segment in segments[segments.match_id == match_id].itertuples():
+        end = "END" if pd.isnull(segment.end) else "{:.0f}'".format(segment.end)
+        options.append({'label': "{:.0f}' - {} : {}".format(segment.start, end, segment.label),
+                        'value': segment.segment})
+    return options
+
+# Clientside zoom
+# Zooming on the xG plot filters the shot plot and the team radar in the
+# browser (assets/app_zoom.js) rather than on the server. zoom_data is sent
+# once per match and theme: the unzoomed figures, the time of every shot
+# plot point, and the radar statistics of radar_minutes as columns.
+
+def zoom_data(context, theme):
+    """Return the unzoomed shot plot and radar of a match with their data."""
+    match_id, info, match_shots = context['match_id'], context['info'], context['shots']
+    sides = {side: info[side] for side in ['home','away']}
+
+    counts = (radar_minutes[radar_minutes.index.get_level_values('match_id') == match_id]
+              .droplevel('match_id')
+              .unstack('team', fill_value=0)
+              .reindex(columns=pd.MultiIndex.from_product([radar_minutes.columns, list(sides.values())]),
+                       fill_value=0))
+    teams, shots, shot_times = {}, {}, []
+    for side, team in sides.items():
+        team_shots = match_shots[match_shots.team == team]
+        teams[side] = counts.xs(team, axis=1, level=1).to_dict('list')
+        shots[side] = {
+            'dec_time': team_shots.dec_time.tolist(),
+            'xg': team_shots.xg.tolist(),
+            'goals': (team_shots.outcome == 'Goal').astype(int).tolist(),
+            'sog': team_shots.outcome.isin(['Goal','Post','Saved']).astype(int).tolist(),
+            'headers': (team_shots.body_part == 'Head').astype(int).tolist(),
+        }
+        # the points of the shot plot, as filtered by create_shot_scatter
+        shot_times.append(team_shots[team_shots.location.apply(lambda x: x[0]) > 60].dec_time.tolist())
+
+    return {
+        'match_id': match_id,
+        'shot_plot': create_shot_plot(match_shots, info, theme),
+        'shot_times': shot_times,
+        'spider': create_spider_chart(context['events'], match_shots, context['passes'], info, theme),
+        'radar': {
+            'keys': list(radar_angles),
+            'attributes': [angles[key][2] for key in radar_angles],
+            'minutes': counts.index.tolist(),
+            'teams': teams,
+            'shots': shots,
+        },
+    }
+
+# Match view
+# Choosing a match renders every view of it in one callback, from one slice
+# of the large tables, and resets the interaction props of the previous
+# match in the same response. Clicks, zooms and control changes then update
+# their own views through callbacks sharing those outputs, which ignore
+# being triggered by the resets.
+
+def match_context(match_id):
+    """Return a match's info and its rows of the tables its views use."""
+    return {
+        'match_id': match_id,
+        'info': match_info[match_id],
+        'shots': shots_df[shots_df.match_id == match_id],
+        'events': events[events.match_id == match_id],
+        'passes': passing_df[passing_df.match_id == match_id],
+        'top_xg': top_xg[top_xg.match_id == match_id],
+    }
+
+def match_header_fields(info):
+    """Return the header, date, stadium and referee lines of a match."""
+    return ['{} {}-{} {}'.format(info['home'].upper(), info['home_score'],
+                                 info['away_score'], info['away'].upper()),
+            'Date: {}'.format(info['display_date']),
+            'Stadium: {}'.format(info['stadium_name']),
+            'Referee: {}'.format(info['referee_name'])]
+
+def zoom_range(relayoutData):
+    """Return the minutes shown by a zoomed xG plot, or (None, None)."""
+    if "xaxis.range[0]" in list((relayoutData or {}).keys()):
+        return relayoutData['xaxis.range[0]'], relayoutData['xaxis.range[1]']
+    return None, None
+
+@coalesced
+def match_views(match_id, theme, mode='network', scope='match', clickData=None,
+                relayoutData=None, segment='match'):
+    """Return every view of a match, keyed by component id."""
+    context = match_context(match_id)
+    info = context['info']
+    header, date, stadium, referee = match_header_fields(info)
+    selected_id = clickData['points'][0]['customdata'] if (mode == 'player' and clickData) else None
+    return {
+        'match_header': header,
+        'match_date': date,
+        'match_stadium': stadium,
+        'match_ref': referee,
+        'xg_plot': create_xg_plot(context['shots'], context['events'], context['top_xg'], info, theme),
+        'zoom_data': zoom_data(context, theme),
+        'pass_map': create_pass_map_view(match_id, theme, mode, selected_id,
+                                         *zoom_range(relayoutData), segment),
+        'pass_map_segment': segment_options(match_id),
+        'player_profile': update_player_profile(clickData, match_id, theme, scope),
+        'player_profile2': update_player_profile_2(clickData, match_id, scope),
+        'similar_players': update_similar_players(clickData, match_id, scope),
+    }
+
+match_view_outputs = [Output('match_header', 'children'),
+                      Output('match_date', 'children'),
+                      Output('match_stadium', 'children'),
+                      Output('match_ref', 'children'),
+                      Output('xg_plot', 'figure'),
+                      Output('zoom_data', 'data'),
+                      Output('pass_map', 'figure'),
+                      Output('pass_map_segment', 'options'),
+                      Output('player_profile', 'figure'),
+                      Output('player_profile2', 'children'),
+                      Output('similar_players', 'children')]
+
+# Props reset by a match change and their reset values. view_reset is set
+# along with them, and the interactions.forward clientside callbacks (see
+# assets/app_interactions.js) drop any change that comes with it, so that
+# only a user's click, zoom or choice reaches the player and pass map
+# callbacks, through the interaction stores they take as input.
+match_resets = {'pass_map_segment.value': 'match',
+                'pass_map.clickData': None,
+                'pass_map.hoverData': None,
+                'xg_plot.relayoutData': {'newmatch': ''}}
+
+app.clientside_callback(
+    ClientsideFunction('interactions', 'forward'),
+    Output('player_interaction', 'data'),
+    [Input('pass_map', 'clickData'),
+     Input('profile_scope', 'value'),
+     Input('view_reset', 'data')],
+    prevent_initial_call=True)
+
+app.clientside_callback(
+    ClientsideFunction('interactions', 'forward'),
+    Output('pass_map_interaction', 'data'),
+    [Input('xg_plot', 'relayoutData')]
+    + ([] if static_views else [Input('pass_map_mode', 'value'),
+                                Input('pass_map', 'clickData'),
+                                Input('pass_map_segment', 'value')])
+    + [Input('view_reset', 'data')],
+    prevent_initial_call=True)
+
+# Match search
+# The match dropdowns only hold the selected matches and the results of what
+# is being typed, looked up in search_index on the server. A team or player
+# result stands for the matches they played in.
+
+search_limit = 20
+
+def search_match_options(search_value, selected):
+    """Return dropdown options for the selected matches and a search."""
+    options = [{'label': match_info[match_id]['description'], 'value': match_id}
+               for match_id in selected if match_id in match_info]
+    if search_value:
+        entries = search_entries.iloc[search_index.search(search_value, search_limit)]
+    else:
+        entries = search_entries[search_entries.kind == 'match'].tail(search_limit)
+
+    seen = set(selected)
+    for entry in entries.itertuples():
+        for match_id in reversed(entry.match_ids):
+            if match_id in seen or len(options) >= search_limit + len(selected):
+                continue
+            seen.add(match_id)
+            label = match_info[match_id]['description']
+            if entry.kind == 'player':
+                label = '{} · {}'.format(entry.label, label)
+            # the typed text is kept as the option's search key so that the
+            # dropdown does not filter out accent-insensitive or fuzzy matches
+            options.append({'label': label, 'value': match_id, 'search': search_value or ''})
+    return options
+
+# Leaderboard
+# The table pages, sorts and filters on the server so that only the visible
+# page is ever sent, however many player-match rows are loaded.
+
+leaderboard_labels = {
+    'name': 'PLAYER', 'team': 'TEAM', 'matches': 'MATCHES', 'num_passes': 'PASSES',
+    'pass_completion_rate': 'PASS COMPLETION', 'percent_progressive_passes': '% PROGRESSIVE',
+    'average_pass_length': 'AVG PASS LENGTH', 'xg_contribution': 'XG-CONTRIBUTION',
+    'xg_buildup': 'XG-BUILDUP', 'xg_assist': 'XG-ASSISTS', 'xg_shot': 'EXPECTED GOALS',
+    'xt_added': 'XT ADDED'
+}
+
+leaderboard_formats = {
+    'pass_completion_rate': '.1%', 'percent_progressive_passes': '.1%',
+    'average_pass_length': '.1f', 'xg_contribution': '.2f', 'xg_buildup': '.2f',
+    'xg_assist': '.2f', 'xg_shot': '.2f', 'xt_added': '.2f'
+}
+
+leaderboard_table_columns = [
+    dict({'name': leaderboard_labels[col], 'id': col,
+          'type': 'text' if col in ['name','team'] else 'numeric'},
+         **({'format': {'specifier': leaderboard_formats[col]}} if col in leaderboard_formats else {}))
+    for col in leaderboard_columns]
+
+filter_operators = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+
+filter_comparisons = {'eq': np.equal, 'ne': np.not_equal, 'lt': np.less,
+                      'le': np.less_equal, 'gt': np.greater, 'ge': np.greater_equal}
+
+filter_pattern = re.compile(r'^\{(?P<column>[^}]+)\}\s*(?P<operator>[^\s"\'`]+)\s*(?P<value>.*)$')
+
+def parse_filter_query(filter_query):
+    """Return (column, operator, value) for each clause of a DataTable filter query."""
+    clauses = []
+    for part in (filter_query or '').split(' && '):
+        match = filter_pattern.match(part.strip())
+        if not match:
+            continue
+        column, operator, value = match.group('column', 'operator', 'value')
+        if operator[0] in 'is' and operator[1:] in list(filter_operators) + list(filter_comparisons) + ['contains']:
+            operator = operator[1:]
+        operator = filter_operators.get(operator, operator)
+        if value[:1] in ('"', "'", '`') and value[-1:] == value[:1]:
+            value = value[1:-1]
+        clauses.append((column, operator, value))
+    return clauses
+
+def leaderboard_page(page_current, page_size, sort_by, filter_query):
+    """Return the rows of one leaderboard page and the number of pages."""
+    mask = np.ones(len(leaderboard), dtype=bool)
+    for column, operator, value in parse_filter_query(filter_query):
+        if column not in leaderboard:
+            continue
+        values = leaderboard[column]
+        if operator == 'contains':
+            mask &= values.astype(str).str.contains(value, case=False, regex=False).to_numpy()
+        elif operator in filter_comparisons:
+            if column not in ['name','team']:
+                try:
+                    value = float(value)
+                except ValueError:
+                    continue
+            mask &= filter_comparisons[operator](values.to_numpy(), value)
+
+    if sort_by and sort_by[0]['column_id'] in leaderboard_order:
+        order = leaderboard_order[sort_by[0]['column_id']]
+        if sort_by[0]['direction'] == 'desc':
+            order = order[::-1]
+    else:
+        order = np.arange(len(leaderboard))
+
+    rows = order[mask[order]]
+    page = rows[page_current * page_size:(page_current + 1) * page_size]
+    return leaderboard.iloc[page].round(4).to_dict('records'), max(1, -(-len(rows) // page_size))
+
 # app.css.append_css({"external_url": "https://codepen.io/hkhare42/pen/eQzWNy.css"})
 
 app.layout = html.Div(id='bodydiv', children = [
@@ -1512,9 +2909,8 @@ app.layout = html.Div(id='bodydiv', children = [
 
                             html.Div(id='infopanel', children = [
                                                             html.H2(id='app_title',children='FIFA WORLD CUP 2018 MATCH EXPLORER'),
-                            dcc.Dropdown(id='match_dropdown', options=
-                            [{'label':row['description'], 'value':row['match_id']} 
-                                for idx, row in matches.sort_values('match_date').iterrows()], value=7584,
+                            dcc.Dropdown(id='match_dropdown',
+                                options=search_match_options(None, [default_match_id]), value=default_match_id,
                                 clearable=False),
                             html.H1(id = 'match_header'),
                                     html.P(className='paraheader', id='match_date'),
@@ -1543,6 +2939,60 @@ app.layout = html.Div(id='bodydiv', children = [
                                     ])
                             ])
                                 ),
+                    html.Details(id='details_replay',
+                            children=[
+                            html.Summary('MATCH REPLAY'),
+                            html.Div(id='replay_panel', children=[
+                                html.Button(id='replay_toggle', children='PLAY / PAUSE'),
+                                dcc.RadioItems(id='replay_speed',
+                                               options=[{'label': '{}X'.format(speed), 'value': speed}
+                                                        for speed in [1, 5, 20, 60]],
+                                               value=20,
+                                               inline=True),
+                                dcc.Graph(className='graph', id='replay_pitch', config={'displayModeBar': False}),
+                                dcc.Interval(id='replay_interval', interval=250, disabled=True),
+                                dcc.Store(id='replay_config', data={'chunk_seconds': replay_chunk_seconds,
+                                                                    'trail_seconds': replay_trail_seconds,
+                                                                    'colors': team_colors}),
+                                dcc.Store(id='replay_layout'),
+                                dcc.Store(id='replay_clock'),
+                                dcc.Store(id='replay_request'),
+                                dcc.Store(id='replay_chunk'),
+                                dcc.Store(id='replay_buffer'),
+                                    ])
+                            ]),
+                    html.Details(id='details_compare',
+                            children=[
+                            html.Summary('XG COMPARISON'),
+                            html.Div(id='compare_panel', children=[
+                                dcc.Dropdown(id='compare_matches',
+                                    options=search_match_options(None, []),
+                                    multi=True,
+                                    placeholder='MATCHES'),
+                                dcc.Dropdown(id='compare_team', options=
+                                    [{'label':team, 'value':team}
+                                        for team in sorted(set(matches.home) | set(matches.away))],
+                                    placeholder='ALL MATCHES OF A TEAM'),
+                                dcc.Graph(className='graph', id='xg_compare', config={'modeBarButtons': [['zoom2d','resetViews']],'displaylogo':False}),
+                                    ])
+                            ]),
+                    html.Details(id='details_leaderboard',
+                            children=[
+                            html.Summary('PLAYER LEADERBOARD'),
+                            html.Div(id='leaderboard_panel', children=[
+                                table.DataTable(id='leaderboard',
+                                                columns=leaderboard_table_columns,
+                                                page_current=0,
+                                                page_size=15,
+                                                page_action='custom',
+                                                sort_action='custom',
+                                                sort_mode='single',
+                                                sort_by=[{'column_id': 'xg_contribution', 'direction': 'desc'}],
+                                                filter_action='custom',
+                                                filter_query='',
+                                                style_as_list_view=True)
+                                    ])
+                            ]),
                     html.Div(id='container', children=[
                                         dcc.Graph(className='graph', id='xg_plot', relayoutData={}, config={'modeBarButtons': [['zoom2d','resetViews']],'displaylogo':False}),
                                         dcc.Graph(className='graph', id='player_profile', config={'displayModeBar': False}),
@@ -1552,14 +3002,37 @@ app.layout = html.Div(id='bodydiv', children = [
                                         #                 style_table={},
                                         #                 style_as_list_view=True),
                                         html.Table(id='player_profile2'),
+                                        html.P(id='similar_players'),
                                         dcc.Graph(className='graph', id='pass_map', config={'modeBarButtons': [['zoom2d','pan2d','resetViews']], 'displaylogo':False}),
                                         dcc.Graph(className='graph', id='shot_plot', config={'modeBarButtons': [['zoom2d','resetViews']], 'displaylogo':False}),
                                         dcc.Graph(className='graph', id='spider', config={'displayModeBar': False}),
+                                        dcc.Store(id='zoom_data'),
+                                        dcc.Store(id='view_reset'),
+                                        dcc.Store(id='player_interaction'),
+                                        dcc.Store(id='pass_map_interaction'),
                                         html.H3(id='xg_header', children='EXPECTED GOALS (xG) CHART'),
                                         html.H3(id='shotplot_header', children='SHOT PLOT'),
                                         html.H3(id='spider_header', children='TEAM PERFORMANCE RADAR'),
                                         html.H3(id='player_profile_header', children='PLAYER PROFILE'),
+                                        dcc.RadioItems(id='profile_scope',
+                                                       options=[{'label': 'THIS MATCH', 'value': 'match'},
+                                                                {'label': 'ALL MATCHES', 'value': 'all'}],
+                                                       value='match',
+                                                       inline=True),
                                         html.H3(id='passing_network_header', children='PASSING NETWORK MAPS'),
+                                        html.Div(id='pass_map_controls', children=[
+                                            dcc.RadioItems(id='pass_map_mode',
+                                                           options=[{'label': 'NETWORK', 'value': 'network'},
+                                                                    {'label': 'TEAM TOUCHES', 'value': 'team'},
+                                                                    {'label': 'PLAYER TOUCHES', 'value': 'player'}],
+                                                           value='network',
+                                                           inline=True),
+                                            dcc.Dropdown(id='pass_map_segment',
+                                                         options=segment_options(default_match_id),
+                                                         value='match',
+                                                         clearable=False,
+                                                         searchable=False)
+                                            ] if not static_views else []),
                                         ]),
                     html.Footer(
                             html.Details(id='details_footer', 
@@ -1590,7 +3063,17 @@ app.layout = html.Div(id='bodydiv', children = [
                                 html.Li("All analysis was carried out using Python data stack. Visualization realized with the help of Plotly's Dash framework."),
                                         ])
                                 ])),
-                    html.Div(id='theme_div', style={'display': 'none'})])
+                    html.Div(id='theme_div', style={'display': 'none'}),
+                    html.Div(id='static_view_stores', children=[
+                                        dcc.Store(id='static_views_url', data=static_views_url),
+                                        dcc.Store(id='static_view'),
+                                        dcc.Store(id='zoom_view'),
+                                        dcc.Store(id='profile_view'),
+                                        ] if static_views else []),
+                    html.Div(id='live_stores', children=[
+                                        dcc.Interval(id='live_interval', interval=live_interval),
+                                        dcc.Store(id='live_version'),
+                                        ] if live_feed else [])])
 
 @app.callback(
             Output('theme_switcher', 'children'),
@@ -1632,6 +3115,60 @@ def update_theme_footer(theme):
         color = graph_styles[theme]['bg_color']
     return {'color':color, 'backgroundColor':graph_styles[theme]['color']}
 
+@app.callback(
+            Output('details_leaderboard', 'style'),
+            [Input('theme_div', 'children')])
+def update_theme_leaderboard(theme):
+    if theme == 'light':
+        color = 'rgb(203, 203, 203)'
+    else:
+        color = graph_styles[theme]['bg_color']
+    return {'color':color, 'backgroundColor':graph_styles[theme]['color']}
+
+@app.callback(
+            Output('details_replay', 'style'),
+            [Input('theme_div', 'children')])
+def update_theme_replay(theme):
+    if theme == 'light':
+        color = 'rgb(203, 203, 203)'
+    else:
+        color = graph_styles[theme]['bg_color']
+    return {'color':color, 'backgroundColor':graph_styles[theme]['color']}
+
+@app.callback(
+            Output('replay_panel', 'style'),
+            [Input('theme_div', 'children')])
+def update_theme_replay_panel(theme):
+    return {'backgroundColor':graph_styles[theme]['bg_color']}
+
+@app.callback(
+            Output('details_compare', 'style'),
+            [Input('theme_div', 'children')])
+def update_theme_compare(theme):
+    if theme == 'light':
+        color = 'rgb(203, 203, 203)'
+    else:
+        color = graph_styles[theme]['bg_color']
+    return {'color':color, 'backgroundColor':graph_styles[theme]['color']}
+
+@app.callback(
+            Output('compare_panel', 'style'),
+            [Input('theme_div', 'children')])
+def update_theme_compare_panel(theme):
+    return {'backgroundColor':graph_styles[theme]['bg_color']}
+
+@app.callback(
+            [Output('leaderboard', 'style_cell'),
+             Output('leaderboard', 'style_header'),
+             Output('leaderboard', 'style_filter')],
+            [Input('theme_div', 'children')])
+def update_theme_leaderboard_table(theme):
+    cell = {'color': graph_styles[theme]['profile_color'],
+            'backgroundColor': graph_styles[theme]['bg_color']}
+    header = {'color': graph_styles[theme]['bg_color'],
+              'backgroundColor': graph_styles[theme]['color']}
+    return cell, header, cell
+
 @app.callback(
             Output('app_title', 'style'),
             [Input('theme_div', 'children')])
@@ -1700,87 +3237,116 @@ def update_heading_colors(theme):
     return {'color':graph_styles[theme]['color']}
 
 @app.callback(
-            Output('player_profile2', 'style'),
+            Output('profile_scope', 'style'),
             [Input('theme_div', 'children')])
-def update_table_colors(theme):
+def update_profile_scope_colors(theme):
     return {'color':graph_styles[theme]['profile_color']}
 
 @app.callback(
-            Output('match_header', 'children'),
-            [Input('match_dropdown', 'value')])
-def update_match_header(match_id):
-    new_header = '{} {}-{} {}'.format(match_info[match_id]['home'].upper(),
-                                     match_info[match_id]['home_score'],
-                                     match_info[match_id]['away_score'],
-                                     match_info[match_id]['away'].upper())
-    return new_header
-
-@app.callback(
-            Output('match_date', 'children'),
-            [Input('match_dropdown', 'value')])
-def update_match_date(match_id):
-    return 'Date: {}'.format(match_info[match_id]['display_date'])
+            Output('similar_players', 'style'),
+            [Input('theme_div', 'children')])
+def update_similar_players_colors(theme):
+    return {'color':graph_styles[theme]['profile_color']}
 
 @app.callback(
-            Output('match_stadium', 'children'),
-            [Input('match_dropdown', 'value')])
-def update_match_date(match_id):
-    return 'Stadium: {}'.format(match_info[match_id]['stadium_name'])
+            Output('pass_map_controls', 'style'),
+            [Input('theme_div', 'children')])
+def update_pass_map_controls_colors(theme):
+    return {'color':graph_styles[theme]['profile_color']}
 
 @app.callback(
-            Output('match_ref', 'children'),
-            [Input('match_dropdown', 'value')])
-def update_match_date(match_id):
-    return 'Referee: {}'.format(match_info[match_id]['referee_name'])
+            Output('player_profile2', 'style'),
+            [Input('theme_div', 'children')])
+def update_table_colors(theme):
+    return {'color':graph_styles[theme]['profile_color']}
 
-@app.callback(
-            Output('xg_plot', 'figure'),
+@view_callback(
+            match_view_outputs + [Output(*prop_id.rsplit('.', 1)) for prop_id in match_resets]
+            + [Output('view_reset', 'data')],
             [Input('match_dropdown', 'value'),
-             Input('theme_div', 'children')])
-def update_xg_plot(match_id, theme):
-    filtered_shots_df = shots_df[shots_df.match_id == match_id]
-    filtered_events = events[events.match_id == match_id]
-    filtered_top_xg = top_xg[top_xg.match_id == match_id]
-    return create_xg_plot(filtered_shots_df, filtered_events, 
-                    filtered_top_xg, match_info[match_id], theme)
-
-@app.callback(
-            Output('pass_map', 'clickData'),
-            [Input('match_dropdown', 'value')])
-def update_clickdata(value):
-    return None
-
-@app.callback(
-            Output('pass_map', 'hoverData'),
-            [Input('match_dropdown', 'value')])
-def update_hoverdata(value):
-    return None
-
-@app.callback(
-            Output('xg_plot', 'relayoutData'),
-            [Input('match_dropdown', 'value')])
-def update_relayoutdata(value):
-    return {'newmatch': ''}
-
-@app.callback(
-            Output('player_profile', 'figure'),
-            [Input('pass_map', 'clickData'),
-             Input('match_dropdown', 'value'),
-             Input('theme_div', 'children')])
-def update_player_profile(clickData, match_id, theme):
+             Input('theme_div', 'children')],
+            [State('pass_map_mode', 'value'),
+             State('profile_scope', 'value'),
+             State('pass_map', 'clickData'),
+             State('xg_plot', 'relayoutData'),
+             State('pass_map_segment', 'value')],
+            **figure_callback_options)
+@profiling.profiled
+def update_match_view(match_id, theme, mode, scope, clickData, relayoutData, segment):
+    # A theme change redraws the views as they are, a match change resets them.
+    if dash.ctx.triggered_id == 'theme_div':
+        views = match_views(match_id, theme, mode, scope, clickData, relayoutData, segment)
+        resets = [dash.no_update] * (len(match_resets) + 1)
+    else:
+        views = match_views(match_id, theme, mode, scope)
+        resets = list(match_resets.values()) + [match_id]
+    return [views[output.component_id] for output in match_view_outputs] + resets
+
+@view_callback(
+            [Output('player_profile', 'figure', allow_duplicate=True),
+             Output('player_profile2', 'children', allow_duplicate=True),
+             Output('similar_players', 'children', allow_duplicate=True)],
+            [Input('player_interaction', 'data')],
+            [State('pass_map', 'clickData'),
+             State('profile_scope', 'value'),
+             State('match_dropdown', 'value'),
+             State('theme_div', 'children')],
+            prevent_initial_call=True,
+            **figure_callback_options)
+def update_player_views(interaction, clickData, scope, match_id, theme):
+    return [update_player_profile(clickData, match_id, theme, scope),
+            update_player_profile_2(clickData, match_id, scope),
+            update_similar_players(clickData, match_id, scope)]
+
+def default_player(match_id):
+    """Return the player shown before one is clicked: the top xG, else the most passes."""
+    match_table = disp_table[disp_table.match_id == match_id]
+    match_top_xg = top_xg[(top_xg.match_id == match_id) & top_xg.id.isin(match_table.id)]
+    if len(match_top_xg):
+        return match_top_xg.id.iloc[0]
+    return match_table.id.iloc[match_table.num_passes.argmax()]
+
+def player_match_stats(match_id, player_id):
+    """Return a player's row of disp_table for a match.
+
+    A player on the pitch who made no pass or shot has no row, and gets zero
+    stats, with the team of their events or else of the match segments.
+    """
+    stats = disp_table[(disp_table.match_id == match_id) & (disp_table.id == player_id)]
+    if len(stats):
+        return stats.iloc[0]
+
+    teams = events[(events.match_id == match_id) & (events.player_id == player_id)].team
+    if len(teams):
+        team = teams.iloc[0]
+    else:
+        match_segments = segments[segments.match_id == match_id]
+        side = 'home' if any(player_id in ids for ids in match_segments.home) else 'away'
+        team = match_info[match_id][side]
+    return pd.Series(dict(dict.fromkeys(disp_table.columns, 0),
+                          match_id = match_id, id = player_id, team = team))
+
+@coalesced
+@profiling.profiled
+def update_player_profile(clickData, match_id, theme, scope='match'):
     filtered_pass_angles = pass_angles[pass_angles.match_id == match_id]
-    filtered_top_xg = top_xg[top_xg.match_id == match_id]
-    selected_name = clickData['points'][0]['customdata'] if clickData else filtered_top_xg.name.iloc[0]
-    return create_player_profile(filtered_pass_angles, selected_name, match_info[match_id], theme)
-
-@app.callback(
-            Output('player_profile2', 'children'),
-            [Input('pass_map', 'clickData'),
-             Input('match_dropdown', 'value'),])
-def update_player_profile_2(clickData, match_id):
-    filtered_top_xg = top_xg[top_xg.match_id == match_id]
-    selected_name = clickData['points'][0]['customdata'] if clickData else filtered_top_xg.name.iloc[0]
-    fstats = disp_table[(disp_table.match_id == match_id) & (disp_table.name == selected_name)].iloc[0].to_dict()
+    selected_id = clickData['points'][0]['customdata'] if clickData else default_player(match_id)
+    # A player the aggregates do not hold gets their match profile.
+    profile = player_aggregate_profile(player_sectors, player_totals, selected_id) if scope == 'all' else None
+    if profile is not None:
+        sectors, _ = profile
+        filtered_pass_angles = sectors.assign(id = selected_id,
+                                              team = player_match_stats(match_id, selected_id)['team'])
+    return create_player_profile(filtered_pass_angles, selected_id, match_info[match_id], theme)
+
+@coalesced
+@profiling.profiled
+def update_player_profile_2(clickData, match_id, scope='match'):
+    selected_id = clickData['points'][0]['customdata'] if clickData else default_player(match_id)
+    fstats = player_match_stats(match_id, selected_id).to_dict()
+    profile = player_aggregate_profile(player_sectors, player_totals, selected_id) if scope == 'all' else None
+    if profile is not None:
+        fstats = profile[1].to_dict()
     tdata = [['NUMBER OF PASSES:',f"{fstats['num_passes']:.0f}", 
               'XG-CONTRIBUTION:', f"{fstats['xg_contribution']:.2f}"],
             ['PASS COMPLETION RATE:',f"{fstats['pass_completion_rate']:.1%}", 
@@ -1788,36 +3354,88 @@ def update_player_profile_2(clickData, match_id):
             ['% PROGRESSIVE PASSES:',f"{fstats['percent_progressive_passes']:.1%}", 
              'XG-ASSISTS:', f"{fstats['xg_assist']:.2f}"],
             ['AVERAGE PASS LENGTH:',f"{fstats['average_pass_length']:.1f}", 
-             'EXPECTED GOALS:', f"{fstats['xg_shot']:.2f}"]]
+             'EXPECTED GOALS:', f"{fstats['xg_shot']:.2f}"],
+            ['XT FROM PASSES:',f"{fstats['xt_pass']:.2f}", 
+             'XT ADDED:', f"{fstats['xt_added']:.2f}"]]
 
     # return top_xg.iloc[:,:4].to_dict('rows')
     return ([html.Tr([html.Td(val) for val in row]) for row in tdata])
 
-@app.callback(
-            Output('pass_map', 'figure'),
-            [Input('match_dropdown', 'value'),
-             Input('theme_div', 'children')])
-def update_pass_map(match_id, theme):
-    filtered_passing_df = passing_df[passing_df.match_id == match_id]
-    filtered_location_df = location_df[location_df.match_id == match_id]
-    
-    return create_passing_network_map(filtered_passing_df, filtered_location_df, 
-                                        lineups.loc[match_id].to_dict(), 
-                                        match_info[match_id], theme)
-
-@app.callback(
-            Output('shot_plot', 'figure'),
-            [Input('xg_plot', 'relayoutData'),
-             Input('match_dropdown', 'value'),
-             Input('theme_div', 'children')])
-def update_shot_plot(relayoutData, match_id, theme):
-    if "xaxis.range[0]" in list(relayoutData.keys()):
-        filtered_shots_df = shots_df[(shots_df.match_id == match_id)
-                                & (shots_df.dec_time > relayoutData['xaxis.range[0]']) 
-                                & (shots_df.dec_time < relayoutData['xaxis.range[1]'])]
+def update_similar_players(clickData, match_id, scope='match'):
+    selected_id = clickData['points'][0]['customdata'] if clickData else default_player(match_id)
+    team = player_match_stats(match_id, selected_id)['team']
+    if scope == 'all':
+        similar = find_similar_players(all_similarity, (selected_id, team))
+        titles = similar.team
     else:
-        filtered_shots_df = shots_df[(shots_df.match_id == match_id)]
-    return create_shot_plot(filtered_shots_df, match_info[match_id], theme)
+        similar = find_similar_players(match_similarity, (match_id, selected_id, team))
+        titles = ['{} v {}'.format(row['team'], (match_info[row['match_id']]['away']
+                                                  if row['team'] == match_info[row['match_id']]['home']
+                                                  else match_info[row['match_id']]['home']))
+                  for _, row in similar.iterrows()]
+    if not len(similar):
+        return []
+    return ([html.Span('SIMILAR PLAYERS: ')]
+            + [html.Span(name, title=title, className='similar_player')
+               for name, title in zip(similar.id.map(players.name), titles)])
+
+@view_callback(
+            Output('pass_map', 'figure', allow_duplicate=True),
+            [Input('pass_map_interaction', 'data')],
+            [State('pass_map_mode', 'value'),
+             State('pass_map', 'clickData'),
+             State('xg_plot', 'relayoutData'),
+             State('pass_map_segment', 'value'),
+             State('match_dropdown', 'value'),
+             State('theme_div', 'children')],
+            prevent_initial_call=True,
+            **figure_callback_options)
+@profiling.profiled
+def update_pass_map(interaction, mode, clickData, relayoutData, segment, match_id, theme):
+    # Clicking a player only changes the map when it shows that player.
+    if mode != 'player' and clickData and interaction['prop_ids'] == ['pass_map.clickData']:
+        raise PreventUpdate
+    # A segment already fixes the time window, so zooming does not change it.
+    if segment != 'match' and interaction['prop_ids'] == ['xg_plot.relayoutData']:
+        raise PreventUpdate
+    selected_id = clickData['points'][0]['customdata'] if (mode == 'player' and clickData) else None
+    return create_pass_map_view(match_id, theme, mode, selected_id, *zoom_range(relayoutData), segment)
+
+@coalesced
+def create_pass_map_view(match_id, theme, mode, selected_id, start=None, end=None, segment='match'):
+    if segment == 'match' or (match_id, segment) not in segment_positions.index:
+        positions, pass_combinations = network_window(network_edges, network_counts, touch_index,
+                                                      match_id, start, end)
+        on_pitch = match_lineup(lineups, match_id)
+    else:
+        positions = segment_positions.loc[[(match_id, segment)]].reset_index(drop=True)
+        pass_combinations = (segment_edges.loc[[(match_id, segment)]].reset_index(drop=True)
+                             if (match_id, segment) in segment_edges.index
+                             else segment_edges.iloc[:0].reset_index(drop=True))
+        on_pitch = (segments[(segments.match_id == match_id) & (segments.segment == segment)]
+                    .iloc[0][['home','away']].to_dict())
+
+    heatmaps = None
+    if mode in ['team', 'player']:
+        heatmaps = {team: touch_map(touch_index, touch_counts, match_id, match_info[match_id][team])
+                    for team in ['home', 'away']}
+    if mode == 'player':
+        selected_id = selected_id or default_player(match_id)
+        player = touch_index[(touch_index.match_id == match_id) & (touch_index.id == selected_id)]
+        if len(player):
+            team = 'home' if player.team.iloc[0] == match_info[match_id]['home'] else 'away'
+            heatmaps[team] = touch_map(touch_index, touch_counts, match_id, player_id=selected_id)
+
+    return create_passing_network_map(positions, pass_combinations,
+                                        on_pitch, 
+                                        match_info[match_id], theme, heatmaps)
+
+app.clientside_callback(
+    ClientsideFunction('zoom', 'zoom_views'),
+    [Output('shot_plot', 'figure'),
+     Output('spider', 'figure')],
+    [Input('xg_plot', 'relayoutData'),
+     Input('zoom_data', 'data')])
 
 # @app.callback(
 #             Output('shot_plot', 'figure'),
@@ -1838,30 +3456,6 @@ def update_shot_plot(relayoutData, match_id, theme):
 #         filtered_shots_df = shots_df[(shots_df.match_id == match_id)]
 #     return create_shot_plot(filtered_shots_df, match_info[match_id], theme)
 
-@app.callback(
-            Output('spider', 'figure'),
-            [Input('xg_plot', 'relayoutData'),
-             Input('match_dropdown', 'value'),
-             Input('theme_div', 'children')])
-def update_spider(relayoutData, match_id, theme):
-    if "xaxis.range[0]" in list(relayoutData.keys()):
-        filtered_shots_df = shots_df[(shots_df.match_id == match_id)
-                                & (shots_df.dec_time > relayoutData['xaxis.range[0]']) 
-                                & (shots_df.dec_time < relayoutData['xaxis.range[1]'])]
-        filtered_events = events[(events.match_id == match_id)
-                                & (events.minute >= relayoutData['xaxis.range[0]']) 
-                                & (events.minute <= relayoutData['xaxis.range[1]'])]
-        filtered_passing_df = passing_df[(passing_df.match_id == match_id)
-                                & (passing_df.minute >= relayoutData['xaxis.range[0]']) 
-                                & (passing_df.minute <= relayoutData['xaxis.range[1]'])]
-    else:
-        filtered_shots_df = shots_df[(shots_df.match_id == match_id)]
-        filtered_events = events[(events.match_id == match_id)]
-        filtered_passing_df = passing_df[(passing_df.match_id == match_id)]
-
-    return create_spider_chart(filtered_events, filtered_shots_df, filtered_passing_df, 
-                                match_info[match_id], theme)
-
 # @app.callback(
 #             Output('spider', 'figure'),
 #             [Input('xg_plot', 'selectedData'),
@@ -1886,8 +3480,276 @@ def update_spider(relayoutData, match_id, theme):
 #     return create_spider_chart(filtered_events, filtered_shots_df, filtered_passing_df, 
 #                                 match_info[match_id], theme)
 
+@app.callback(
+            Output('match_dropdown', 'options'),
+            [Input('match_dropdown', 'search_value')],
+            [State('match_dropdown', 'value')])
+def update_match_options(search_value, match_id):
+    return search_match_options(search_value, [match_id])
+
+@app.callback(
+            Output('compare_matches', 'options'),
+            [Input('compare_matches', 'search_value')],
+            [State('compare_matches', 'value')])
+def update_compare_options(search_value, match_ids):
+    return search_match_options(search_value, match_ids or [])
+
+@app.callback(
+            Output('replay_layout', 'data'),
+            [Input('theme_div', 'children')])
+def update_replay_layout(theme):
+    return create_replay_layout(theme)
+
+@app.callback(
+            Output('replay_chunk', 'data'),
+            [Input('replay_request', 'data')])
+def update_replay_chunk(request):
+    if not request or request['match_id'] not in replay_index.index:
+        raise PreventUpdate
+    return replay_chunk(replay_index, replay_frames, request['match_id'], request['chunk'])
+
+app.clientside_callback(
+    ClientsideFunction('replay', 'toggle'),
+    Output('replay_interval', 'disabled'),
+    [Input('replay_toggle', 'n_clicks')])
+
+app.clientside_callback(
+    ClientsideFunction('replay', 'tick'),
+    [Output('replay_clock', 'data'),
+     Output('replay_pitch', 'figure'),
+     Output('replay_request', 'data')],
+    [Input('replay_interval', 'n_intervals'),
+     Input('match_dropdown', 'value'),
+     Input('replay_layout', 'data'),
+     Input('replay_buffer', 'data')],
+    [State('replay_clock', 'data'),
+     State('replay_request', 'data'),
+     State('replay_speed', 'value'),
+     State('replay_interval', 'interval'),
+     State('replay_config', 'data')])
+
+app.clientside_callback(
+    ClientsideFunction('replay', 'merge'),
+    Output('replay_buffer', 'data'),
+    [Input('replay_chunk', 'data')],
+    [State('replay_buffer', 'data'),
+     State('replay_clock', 'data'),
+     State('replay_config', 'data')])
+
+@app.callback(
+            Output('xg_compare', 'figure'),
+            [Input('compare_matches', 'value'),
+             Input('compare_team', 'value'),
+             Input('theme_div', 'children')])
+def update_xg_compare(match_ids, team, theme):
+    series = xg_timelines
+    if team:
+        series = series[series.team == team]
+    if match_ids:
+        series = series[series.match_id.isin(match_ids)]
+    elif not team:
+        series = series.iloc[[]]
+    return create_xg_comparison(series, timeline_minutes, timeline_xg, theme)
+
+@app.callback(
+            [Output('leaderboard', 'data'),
+             Output('leaderboard', 'page_count')],
+            [Input('leaderboard', 'page_current'),
+             Input('leaderboard', 'page_size'),
+             Input('leaderboard', 'sort_by'),
+             Input('leaderboard', 'filter_query')])
+def update_leaderboard(page_current, page_size, sort_by, filter_query):
+    return leaderboard_page(page_current or 0, page_size, sort_by, filter_query)
+
+# Live matches. Every interval polls the feed, and a live match that changed
+# since the browser last heard of it gets its header and the data of its
+# figures patched in; figure layouts are not sent again.
+
+if live_feed:
+    @app.callback(
+                [Output('match_header', 'children', allow_duplicate=True),
+                 Output('xg_plot', 'figure', allow_duplicate=True),
+                 Output('zoom_data', 'data', allow_duplicate=True),
+                 Output('pass_map', 'figure', allow_duplicate=True),
+                 Output('live_version', 'data')],
+                [Input('live_interval', 'n_intervals')],
+                [State('match_dropdown', 'value'),
+                 State('theme_div', 'children'),
+                 State('pass_map_mode', 'value'),
+                 State('pass_map', 'clickData'),
+                 State('xg_plot', 'relayoutData'),
+                 State('pass_map_segment', 'value'),
+                 State('live_version', 'data')],
+                prevent_initial_call=True)
+    def update_live_views(n_intervals, match_id, theme, mode, clickData, relayoutData, segment, version):
+        poll_live_feed()
+        with tables_lock.read():
+            if match_id not in live_versions or theme is None or version == [match_id, live_versions[match_id]]:
+                raise PreventUpdate
+            context = match_context(match_id)
+
+            xg_plot = create_xg_plot(context['shots'], context['events'], context['top_xg'], context['info'], theme)
+            xg_patch = dash.Patch()
+            xg_patch['data'] = xg_plot['data']
+            xg_patch['layout']['annotations'] = xg_plot['layout']['annotations']
+
+            zoom = zoom_data(context, theme)
+            zoom_patch = dash.Patch()
+            zoom_patch['shot_plot']['data'] = zoom['shot_plot']['data']
+            zoom_patch['shot_times'] = zoom['shot_times']
+            zoom_patch['spider']['data'] = zoom['spider']['data']
+            for key in ['minutes', 'teams', 'shots']:
+                zoom_patch['radar'][key] = zoom['radar'][key]
+
+            selected_id = clickData['points'][0]['customdata'] if (mode == 'player' and clickData) else None
+            pass_map_patch = dash.Patch()
+            pass_map_patch['data'] = create_pass_map_view(match_id, theme, mode, selected_id,
+                                                          *zoom_range(relayoutData), segment)['data']
+
+            return [match_header_fields(context['info'])[0], xg_patch, zoom_patch, pass_map_patch,
+                    [match_id, live_versions[match_id]]]
+
+if static_views:
+    @server.route('{}/<path:filename>'.format(static_views_url))
+    def serve_static_view(filename):
+        return flask.send_from_directory(os.path.abspath(static_views), filename)
+
+    app.clientside_callback(
+        ClientsideFunction('static_views', 'load_view'),
+        Output('static_view', 'data'),
+        [Input('match_dropdown', 'value'),
+         Input('theme_div', 'children')],
+        [State('static_views_url', 'data')])
+
+    app.clientside_callback(
+        ClientsideFunction('static_views', 'reset_interactions'),
+        [Output('pass_map', 'clickData'),
+         Output('pass_map', 'hoverData'),
+         Output('xg_plot', 'relayoutData'),
+         Output('view_reset', 'data'),
+         Output('zoom_view', 'data', allow_duplicate=True),
+         Output('profile_view', 'data', allow_duplicate=True)],
+        [Input('match_dropdown', 'value')],
+        prevent_initial_call=True)
+
+    app.clientside_callback(
+        ClientsideFunction('static_views', 'base_views'),
+        [Output('xg_plot', 'figure'),
+         Output('match_header', 'children'),
+         Output('match_date', 'children'),
+         Output('match_stadium', 'children'),
+         Output('match_ref', 'children')],
+        [Input('static_view', 'data')])
+
+    app.clientside_callback(
+        ClientsideFunction('static_views', 'zoom_data'),
+        Output('zoom_data', 'data'),
+        [Input('static_view', 'data')])
+
+    app.clientside_callback(
+        ClientsideFunction('static_views', 'zoom_views'),
+        Output('pass_map', 'figure'),
+        [Input('static_view', 'data'),
+         Input('zoom_view', 'data')])
+
+    app.clientside_callback(
+        ClientsideFunction('static_views', 'profile_views'),
+        [Output('player_profile', 'figure'),
+         Output('player_profile2', 'children'),
+         Output('similar_players', 'children')],
+        [Input('static_view', 'data'),
+         Input('profile_view', 'data')])
+
+    @app.callback(
+                Output('zoom_view', 'data'),
+                [Input('pass_map_interaction', 'data'),
+                 Input('theme_div', 'children')],
+                [State('xg_plot', 'relayoutData'),
+                 State('match_dropdown', 'value')])
+    def update_zoom_view(interaction, theme, relayoutData, match_id):
+        if "xaxis.range[0]" not in list((relayoutData or {}).keys()):
+            return None
+        return {'match_id': match_id,
+                'theme': theme,
+                'pass_map': create_pass_map_view(match_id, theme, 'network', None,
+                                                 *zoom_range(relayoutData))}
+
+    @app.callback(
+                Output('profile_view', 'data'),
+                [Input('player_interaction', 'data'),
+                 Input('theme_div', 'children')],
+                [State('pass_map', 'clickData'),
+                 State('profile_scope', 'value'),
+                 State('match_dropdown', 'value')])
+    def update_profile_view(interaction, theme, clickData, scope, match_id):
+        if not clickData and scope == 'match':
+            return None
+        return {'match_id': match_id,
+                'theme': theme,
+                'player_profile': update_player_profile(clickData, match_id, theme, scope),
+                'player_profile2': update_player_profile_2(clickData, match_id, scope),
+                'similar_players': update_similar_players(clickData, match_id, scope)}
+
+# Every server callback holds the read side of tables_lock while it runs, so
+# a live update is published between callbacks, never during one.
+# update_live_views publishes updates itself and takes the lock after.
+
+for entry in app.callback_map.values():
+    if 'callback' in entry and not (live_feed and inspect.unwrap(entry['callback']) is update_live_views):
+        entry['callback'] = tables_lock.reading(entry['callback'])
+
+# Callback metrics, scraped from /metrics. Every callback registered above is
+# instrumented, so new callbacks must be added before this point.
+
+callback_metrics = CallbackMetrics()
+callback_metrics.add_collector(
+    'wc_singleflight_calls_total',
+    'Figure requests computed by a leader or shared with a waiting caller.',
+    'counter',
+    lambda: [({'result': result}, count) for result, count in figure_flight.counts().items()])
+callback_metrics.instrument(app)
+
+@server.route('/metrics')
+def serve_metrics():
+    return flask.Response(callback_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Memory diagnostics on /debug, only served when WC_DEBUG_TOKEN is set.
+
+diagnostics.register_debug_routes(server, lambda: {
+    'events': events,
+    'shots_df': shots_df,
+    'passing_df': passing_df,
+    'carries_df': carries_df,
+    'location_df': location_df,
+    'touch_index': touch_index,
+    'network_edges': network_edges,
+    'pass_angles': pass_angles,
+    'disp_table': disp_table,
+    'lineups': lineups,
+    'squads': squads,
+    'players': players,
+    'segments': segments,
+    'segment_positions': segment_positions,
+    'segment_edges': segment_edges,
+    'top_xg': top_xg,
+    'possessions': possessions,
+    'possession_players': possession_players,
+    'player_sectors': player_sectors,
+    'player_totals': player_totals,
+    'leaderboard': leaderboard,
+    'replay_index': replay_index,
+    'radar_minutes': radar_minutes,
+    'search_entries': search_entries,
+})
+profiling.register_debug_routes(server)
+
 if __name__ == '__main__':
     app.run_server(
             # debug=True, 
-            port = 8080
+            port = 8080,
+            # Background jobs are forked from the server process, and a fork
+            # taken while another request thread holds a lock can hang, so
+            # with background jobs this server handles one request at a
+            # time, polls included. Serve wsgi.py for more than one user.
+            threaded = background_callback_manager is None
         )
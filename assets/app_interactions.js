@@ -0,0 +1,20 @@
+// Interactions with the views of a match: a player clicked on the passing
+// network, a zoom of the xG plot, a new pass map mode, segment or profile
+// scope. A match change resets these props and sets view_reset along with
+// them, so a change that comes with view_reset is the reset and is dropped
+// here; any other is forwarded to a store, which the server callbacks take
+// as their input.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    interactions: {
+        forward: function() {
+            var prop_ids = window.dash_clientside.callback_context.triggered.map(function(trigger) {
+                return trigger.prop_id;
+            });
+            if (prop_ids.indexOf('view_reset.data') >= 0) {
+                return window.dash_clientside.no_update;
+            }
+            return {prop_ids: prop_ids, time: Date.now()};
+        }
+    }
+});
@@ -0,0 +1,106 @@
+// Clientside match replay. The server sends a match in chunks of
+// chunk_seconds of replay time; the browser advances its own clock, asks for
+// the chunk it needs next and keeps at most the previous, current and next
+// chunk of the match being replayed.
+
+function replayChunkOf(config, t) {
+    return Math.floor(t / config.chunk_seconds);
+}
+
+function replayFigure(layout, chunks, clock, config) {
+    var trace = {
+        type: 'scatter',
+        mode: 'markers',
+        x: [], y: [], text: [],
+        marker: {color: [], opacity: [], size: 12},
+        hoverinfo: 'text'
+    };
+    var latest = null;
+    var current = replayChunkOf(config, clock.t);
+    [current - 1, current].forEach(function(k) {
+        var chunk = chunks[k];
+        if (!chunk) {
+            return;
+        }
+        for (var i = 0; i < chunk.t.length; i++) {
+            var age = clock.t - chunk.t[i];
+            if (age < 0 || age > config.trail_seconds) {
+                continue;
+            }
+            var text = chunk.minute[i] + "' " + chunk.events[chunk.e[i]] + ' ' + chunk.players[chunk.p[i]];
+            // the pitch is drawn upright: width across, length up
+            trace.x.push(chunk.y[i]);
+            trace.y.push(chunk.x[i]);
+            trace.text.push(text);
+            trace.marker.color.push(chunk.away[i] ? config.colors.away : config.colors.home);
+            trace.marker.opacity.push(1 - 0.8 * age / config.trail_seconds);
+            latest = text;
+        }
+    });
+    var title = latest || (Math.floor(clock.t / 60) + "'");
+    return {data: [trace], layout: Object.assign({}, layout, {title: {text: title}})};
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    replay: {
+        toggle: function(n_clicks) {
+            return !(n_clicks % 2 === 1);
+        },
+
+        tick: function(n_intervals, match_id, layout, buffer, clock, request, speed, interval, config) {
+            var no_update = window.dash_clientside.no_update;
+            if (!match_id || !layout) {
+                return [no_update, no_update, no_update];
+            }
+            var triggered = window.dash_clientside.callback_context.triggered.map(function(t) {
+                return t.prop_id;
+            });
+            if (!clock || clock.match_id !== match_id) {
+                clock = {match_id: match_id, t: 0};
+            } else if (triggered.indexOf('replay_interval.n_intervals') >= 0) {
+                clock = {match_id: match_id, t: clock.t + speed * interval / 1000};
+            }
+
+            var chunks = buffer && buffer.match_id === match_id ? buffer.chunks : {};
+            var end = null;
+            Object.keys(chunks).forEach(function(k) {
+                end = chunks[k].end;
+            });
+            if (end !== null && clock.t > end) {
+                clock = {match_id: match_id, t: end};
+            }
+
+            // ask for the current chunk first, then buffer the next one ahead
+            var current = replayChunkOf(config, clock.t);
+            var wanted = no_update;
+            for (var k = current; k <= current + 1; k++) {
+                if (end !== null && k > replayChunkOf(config, end)) {
+                    break;
+                }
+                if (!(k in chunks)) {
+                    if (!request || request.match_id !== match_id || request.chunk !== k) {
+                        wanted = {match_id: match_id, chunk: k};
+                    }
+                    break;
+                }
+            }
+            return [clock, replayFigure(layout, chunks, clock, config), wanted];
+        },
+
+        merge: function(chunk, buffer, clock, config) {
+            if (!chunk) {
+                return window.dash_clientside.no_update;
+            }
+            var chunks = buffer && buffer.match_id === chunk.match_id ? buffer.chunks : {};
+            var current = clock && clock.match_id === chunk.match_id ? replayChunkOf(config, clock.t) : 0;
+            var kept = {};
+            Object.keys(chunks).forEach(function(k) {
+                if (Math.abs(k - current) <= 1) {
+                    kept[k] = chunks[k];
+                }
+            });
+            kept[chunk.chunk] = chunk;
+            return {match_id: chunk.match_id, chunks: kept};
+        }
+    }
+});
@@ -0,0 +1,75 @@
+// Clientside navigation for the static pre-render mode (see export_static.py).
+// Each match view is a JSON file holding every base figure for one theme.
+
+// Views are fetched asynchronously and the most recently used ones are kept,
+// so that switching back to a match or theme does not fetch it again.
+var staticViewCacheSize = 8;
+var staticViewCache = new Map();
+
+function fetchStaticView(url) {
+    var view = staticViewCache.get(url);
+    if (!view) {
+        view = fetch(url).then(function(response) {
+            return response.ok ? response.json() : null;
+        }).catch(function() {
+            return null;
+        });
+    }
+    staticViewCache.delete(url);
+    staticViewCache.set(url, view);
+    if (staticViewCache.size > staticViewCacheSize) {
+        staticViewCache.delete(staticViewCache.keys().next().value);
+    }
+    return view;
+}
+
+function currentOverlay(view, overlay) {
+    return overlay && view && overlay.match_id === view.match_id && overlay.theme === view.theme;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    static_views: {
+        load_view: function(match_id, theme, base_url) {
+            if (!match_id || !theme) {
+                return window.dash_clientside.no_update;
+            }
+            return fetchStaticView(base_url + '/' + match_id + '-' + theme + '.json');
+        },
+
+        reset_interactions: function(match_id) {
+            // The overlays of the match left are dropped with its interactions.
+            return [null, null, {'newmatch': ''}, match_id, null, null];
+        },
+
+        base_views: function(view) {
+            if (!view) {
+                return Array(5).fill(window.dash_clientside.no_update);
+            }
+            return [view.xg_plot, view.match_header,
+                    view.match_date, view.match_stadium, view.match_ref];
+        },
+
+        zoom_data: function(view) {
+            if (!view) {
+                return window.dash_clientside.no_update;
+            }
+            return view.zoom_data;
+        },
+
+        zoom_views: function(view, zoom) {
+            if (!view) {
+                return window.dash_clientside.no_update;
+            }
+            var source = currentOverlay(view, zoom) ? zoom : view;
+            return source.pass_map;
+        },
+
+        profile_views: function(view, profile) {
+            if (!view) {
+                return Array(3).fill(window.dash_clientside.no_update);
+            }
+            var source = currentOverlay(view, profile) ? profile : view;
+            return [source.player_profile, source.player_profile2, source.similar_players];
+        }
+    }
+});
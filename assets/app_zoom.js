@@ -0,0 +1,94 @@
+// Clientside zoom for the shot plot and the team radar. The server sends the
+// unzoomed figures of a match once (see zoom_data in app.py) together with
+// the time of every shot plot point and the radar statistics per minute, so
+// that a zoom window on the xG plot is applied here without a server call.
+// Windows follow the server's filters: shots strictly inside the window by
+// decimal time, passes and other events by whole minute, bounds included.
+
+function zoomWindow(relayout) {
+    if (!relayout || !('xaxis.range[0]' in relayout)) {
+        return null;
+    }
+    return [relayout['xaxis.range[0]'], relayout['xaxis.range[1]']];
+}
+
+function zoomShotPlot(figure, shot_times, start, end) {
+    var data = figure.data.map(function(trace, i) {
+        var keep = shot_times[i].map(function(t) {
+            return t > start && t < end;
+        });
+        var pick = function(values) {
+            return Array.isArray(values) ? values.filter(function(_, j) { return keep[j]; }) : values;
+        };
+        return Object.assign({}, trace, {
+            x: pick(trace.x),
+            y: pick(trace.y),
+            text: pick(trace.text),
+            marker: Object.assign({}, trace.marker, {
+                size: pick(trace.marker.size),
+                color: pick(trace.marker.color)
+            })
+        });
+    });
+    return Object.assign({}, figure, {data: data});
+}
+
+function radarTotals(radar, side, start, end) {
+    var columns = radar.teams[side];
+    var totals = {};
+    Object.keys(columns).forEach(function(key) {
+        totals[key] = 0;
+        radar.minutes.forEach(function(minute, i) {
+            if (minute >= start && minute <= end) {
+                totals[key] += columns[key][i];
+            }
+        });
+    });
+    var shots = radar.shots[side];
+    ['xg', 'goals', 'sog', 'headers'].forEach(function(key) {
+        totals[key] = 0;
+        shots.dec_time.forEach(function(t, i) {
+            if (t > start && t < end) {
+                totals[key] += shots[key][i];
+            }
+        });
+    });
+    totals.pass_length = totals.passes ? totals.pass_length_sum / totals.passes : 0;
+    return totals;
+}
+
+function zoomSpider(figure, radar, start, end) {
+    var totals = {
+        home: radarTotals(radar, 'home', start, end),
+        away: radarTotals(radar, 'away', start, end)
+    };
+    // each statistic is drawn as the team's share of the match total
+    var data = figure.data.slice();
+    ['home', 'away'].forEach(function(side, i) {
+        var r = radar.keys.map(function(key) {
+            var total = totals.home[key] + totals.away[key];
+            return total ? totals[side][key] / total : 0;
+        });
+        var text = radar.keys.map(function(key, k) {
+            return radar.attributes[k] + ' : ' + totals[side][key].toFixed(1);
+        });
+        data[i] = Object.assign({}, data[i], {r: r.concat([r[0]]), text: text});
+    });
+    return Object.assign({}, figure, {data: data});
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    zoom: {
+        zoom_views: function(relayout, zoom_data) {
+            if (!zoom_data) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+            var range = zoomWindow(relayout);
+            if (!range) {
+                return [zoom_data.shot_plot, zoom_data.spider];
+            }
+            return [zoomShotPlot(zoom_data.shot_plot, zoom_data.shot_times, range[0], range[1]),
+                    zoomSpider(zoom_data.spider, zoom_data.radar, range[0], range[1])];
+        }
+    }
+});
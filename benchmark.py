@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Benchmark the data pipeline stages and figure builders.
+
+Each ingestion stage is timed over the whole tournament and each figure
+builder over every match. For every entry the median and p95 time, the peak
+traced allocation and the output size (deep memory for tables, JSON bytes
+for figures) are reported.
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json --threshold 0.2
+
+With --compare the run exits non-zero when any median time, allocation peak
+or output size grows by more than the threshold over the baseline, and by
+more than a minimum absolute amount (--min-delta-ms for times), so that the
+jitter of millisecond timings does not fail the run. Times are only compared
+when each was measured over at least three runs.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import plotly
+
+import app
+
+
+def measure(fn, repeat):
+    """Return fn's result, wall times over repeat runs and peak allocation."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, times, peak
+
+
+def summarise(times, peak, size):
+    return {'median_ms': float(np.median(times) * 1000),
+            'p95_ms': float(np.percentile(times, 95) * 1000),
+            'peak_alloc_bytes': int(peak),
+            'output_bytes': int(size)}
+
+
+def table_size(result):
+    if hasattr(result, 'points'):
+        return result.points.nbytes + result.order.nbytes
+    if isinstance(result, tuple):
+        return sum(table_size(part) for part in result)
+    if isinstance(result, dict):
+        return sum(table_size(part) for part in result.values())
+    if hasattr(result, 'nbytes'):
+        return result.nbytes
+    if hasattr(result, 'memory_usage'):
+        return result.memory_usage(deep=True).sum()
+    return sys.getsizeof(result)
+
+
+def payload_size(figure):
+    return len(json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def bench_stages(match_ids, repeat):
+    """Time every ingestion stage, feeding each the previous stage's output."""
+    matches = app.matches[app.matches.match_id.isin(match_ids)]
+    stages = [
+        ('events', lambda t: app.parse_events(match_ids).query('minute < 120')),
+        ('squads', lambda t: app.read_squads(matches.match_id)),
+        ('players', lambda t: app.build_players(t['squads'], t['events'])),
+        ('shots_df', lambda t: app.build_shots_df(t['events'], app.match_info)),
+        ('passing_df', lambda t: app.build_passing_df(t['events'])),
+        ('carries_df', lambda t: app.build_carries_df(t['events'])),
+        ('xt_grid', lambda t: app.build_xt_grid(t['passing_df'], t['carries_df'], t['shots_df'])),
+        ('xt_stats', lambda t: app.build_xt_stats(t['passing_df'], t['carries_df'], t['xt_grid'])),
+        ('possessions', lambda t: app.build_possessions(t['events'], t['passing_df'], t['shots_df'])),
+        ('xg_stats', lambda t: app.build_xg_stats(t['possessions'][1])),
+        ('pass_stats', lambda t: app.build_pass_stats(t['passing_df'])),
+        ('disp_table', lambda t: app.build_disp_table(t['pass_stats'], t['xg_stats'], t['xt_stats'])),
+        ('location_df', lambda t: app.build_location_df(t['events'])),
+        ('touch_maps', lambda t: app.build_touch_maps(t['location_df'])),
+        ('network_counts', lambda t: app.build_network_counts(
+            t['passing_df'], t['location_df'], t['touch_maps'][0])),
+        ('lineups', lambda t: app.build_lineups(t['events'], matches)),
+        ('segments', lambda t: app.build_segments(t['events'], matches, t['lineups'], t['players'])),
+        ('segment_networks', lambda t: app.build_segment_networks(
+            t['passing_df'], t['location_df'], t['segments'])),
+        ('top_xg', lambda t: app.build_top_xg(t['shots_df'])),
+        ('xg_timelines', lambda t: app.build_xg_timelines(t['shots_df'], t['events'], matches)),
+        ('radar_minutes', lambda t: app.build_radar_minutes(t['events'], t['passing_df'])),
+        ('replay_frames', lambda t: app.build_replay_frames(t['events'], matches)),
+        ('pass_angles', lambda t: app.build_pass_angles(t['passing_df'])),
+        ('player_aggregates', lambda t: app.update_player_aggregates(
+            None, None, t['pass_angles'], t['disp_table'])),
+        ('leaderboard', lambda t: app.build_leaderboard(t['player_aggregates'][1], t['players'])),
+        ('similarity', lambda t: app.build_similarity_index(
+            t['pass_angles'], t['disp_table'], ['match_id','id','team'])),
+    ]
+
+    tables, results = {}, {}
+    for name, stage in stages:
+        tables[name], times, peak = measure(lambda: stage(tables), repeat)
+        results[name] = summarise(times, peak, table_size(tables[name]))
+    return results
+
+
+def by_match(df):
+    return dict(tuple(df.groupby('match_id')))
+
+
+def bench_builders(match_ids, repeat, theme='light'):
+    """Time every figure builder on every match, as the callbacks call them."""
+    shots, events, passes = by_match(app.shots_df), by_match(app.events), by_match(app.passing_df)
+    top_xg, angles = by_match(app.top_xg), by_match(app.pass_angles)
+
+    builders = {
+        'create_xg_plot': lambda m: app.create_xg_plot(
+            shots[m], events[m], top_xg[m], app.match_info[m], theme),
+        'create_shot_plot': lambda m: app.create_shot_plot(
+            shots[m], app.match_info[m], theme),
+        'create_spider_chart': lambda m: app.create_spider_chart(
+            events[m], shots[m], passes[m], app.match_info[m], theme),
+        'zoom_data': lambda m: app.zoom_data(app.match_context(m), theme),
+        'match_views': lambda m: app.match_views(m, theme),
+        'create_passing_network_map': lambda m: app.create_passing_network_map(
+            *app.network_window(app.network_edges, app.network_counts, app.touch_index, m),
+            app.lineups.loc[m].to_dict(), app.match_info[m], theme),
+        'create_player_profile': lambda m: app.create_player_profile(
+            angles[m], top_xg[m].id.iloc[0], app.match_info[m], theme),
+    }
+
+    results = {}
+    for name, builder in builders.items():
+        times, peaks, sizes = [], [], []
+        for match_id in match_ids:
+            figure, match_times, peak = measure(lambda: builder(match_id), repeat)
+            times += match_times
+            peaks.append(peak)
+            sizes.append(payload_size(figure))
+        results[name] = summarise(times, max(peaks), np.mean(sizes))
+    return results
+
+
+# Smallest absolute growth counted as a regression, per metric.
+MIN_DELTA = {'median_ms': 5.0, 'peak_alloc_bytes': 64 * 1024, 'output_bytes': 1024}
+MIN_TIMED_RUNS = 3
+
+
+def regressions(results, baseline, threshold, min_delta=MIN_DELTA, timed=True):
+    """Return a message for every metric that regressed beyond threshold."""
+    failures = []
+    metrics_compared = (['median_ms'] if timed else []) + ['peak_alloc_bytes', 'output_bytes']
+    for group, entries in results.items():
+        for name, metrics in entries.items():
+            base = baseline.get(group, {}).get(name)
+            if not base:
+                continue
+            for metric in metrics_compared:
+                if (base[metric] and metrics[metric] > base[metric] * (1 + threshold)
+                        and metrics[metric] - base[metric] > min_delta[metric]):
+                    failures.append('{} {}: {:.1f} -> {:.1f}'.format(
+                        name, metric, base[metric], metrics[metric]))
+    return failures
+
+
+def report(results):
+    print('{:<28}{:>12}{:>12}{:>16}{:>16}'.format(
+        'name', 'median ms', 'p95 ms', 'peak alloc', 'output bytes'))
+    for entries in results.values():
+        for name, m in entries.items():
+            print('{:<28}{:>12.1f}{:>12.1f}{:>16,}{:>16,}'.format(
+                name, m['median_ms'], m['p95_ms'], m['peak_alloc_bytes'], m['output_bytes']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--matches', type=int, default=None,
+                        help='only benchmark the first N matches')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs per stage and per builder call')
+    parser.add_argument('--save', help='write results to this JSON baseline')
+    parser.add_argument('--compare', help='compare against this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative regression over the baseline')
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA['median_ms'],
+                        help='smallest growth of a median time counted as a regression')
+    args = parser.parse_args()
+
+    match_ids = [int(m) for m in app.matches.match_id][:args.matches]
+    results = {'stages': bench_stages(match_ids, args.repeat),
+               'builders': bench_builders(match_ids, args.repeat)}
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(dict(results, repeat=args.repeat), f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        timed = args.repeat >= MIN_TIMED_RUNS and baseline.get('repeat', MIN_TIMED_RUNS) >= MIN_TIMED_RUNS
+        if not timed:
+            print('times not compared: measure them over at least {} runs'.format(MIN_TIMED_RUNS))
+        failures = regressions(results, baseline, args.threshold,
+                               dict(MIN_DELTA, median_ms=args.min_delta_ms), timed)
+        for failure in failures:
+            print('REGRESSION', failure)
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,118 @@
+"""Memory accounting for the in-process data tables.
+
+Reports the deep memory footprint of every global table and keeps named
+tracemalloc snapshots that can be diffed, so that RSS growth can be traced
+back to the pipeline stage that allocated it. Everything is exposed on
+/debug routes that only answer when WC_DEBUG_TOKEN is set and the request
+carries the same token.
+
+Set WC_TRACEMALLOC=<frames> before starting the app to trace allocations
+from import time, which covers the whole data pipeline.
+"""
+
+import functools
+import hmac
+import os
+import sys
+import tracemalloc
+
+import flask
+import pandas as pd
+
+if os.environ.get('WC_TRACEMALLOC'):
+    tracemalloc.start(int(os.environ['WC_TRACEMALLOC']))
+
+snapshots = {}
+
+
+def deep_sizeof(obj, seen=None):
+    """Return the size of obj including nested dicts and lists."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def column_footprint(column):
+    """Return the bytes held by a column, following nested objects."""
+    if column.dtype == object:
+        values = column.dropna()
+        if len(values) and isinstance(values.iloc[0], (dict, list)):
+            seen = set()
+            return int(column.memory_usage(index=False, deep=False)
+                       + sum(deep_sizeof(v, seen) for v in values))
+    return int(column.memory_usage(index=False, deep=True))
+
+
+def table_footprint(table):
+    """Return rows, total bytes and bytes per column of a table."""
+    if isinstance(table, pd.Series):
+        table = table.to_frame()
+    columns = {str(name): column_footprint(table[name]) for name in table.columns}
+    index = int(table.index.memory_usage(deep=True))
+    return {'rows': len(table),
+            'bytes': index + sum(columns.values()),
+            'index_bytes': index,
+            'columns': dict(sorted(columns.items(), key=lambda item: -item[1]))}
+
+
+def take_snapshot(label):
+    """Store a tracemalloc snapshot under label, starting tracing if needed."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    snapshots[label] = tracemalloc.take_snapshot()
+    return {'label': label, 'traced_bytes': tracemalloc.get_traced_memory()[0]}
+
+
+def diff_snapshots(old, new, top=25, key_type='lineno'):
+    """Return the top allocation differences between two snapshots."""
+    stats = snapshots[new].compare_to(snapshots[old], key_type)
+    return [{'where': str(stat.traceback),
+             'size_diff': stat.size_diff,
+             'size': stat.size,
+             'count_diff': stat.count_diff}
+            for stat in stats[:top]]
+
+
+def debug_token_required(view):
+    """Only serve view to requests that present WC_DEBUG_TOKEN."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get('WC_DEBUG_TOKEN')
+        given = flask.request.headers.get('X-Debug-Token') or flask.request.args.get('token', '')
+        if not token or not hmac.compare_digest(token, given):
+            flask.abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def register_debug_routes(server, tables):
+    """Add the memory routes to server; tables() returns name -> table."""
+
+    @server.route('/debug/memory')
+    @debug_token_required
+    def debug_memory():
+        footprint = {name: table_footprint(table) for name, table in tables().items()}
+        return flask.jsonify({'total_bytes': sum(t['bytes'] for t in footprint.values()),
+                              'tables': footprint})
+
+    @server.route('/debug/tracemalloc/snapshot', methods=['POST'])
+    @debug_token_required
+    def debug_snapshot():
+        return flask.jsonify(take_snapshot(flask.request.args.get('label', str(len(snapshots)))))
+
+    @server.route('/debug/tracemalloc/diff')
+    @debug_token_required
+    def debug_diff():
+        old, new = flask.request.args.get('old'), flask.request.args.get('new')
+        if old not in snapshots or new not in snapshots:
+            return flask.jsonify({'error': 'unknown snapshot', 'snapshots': list(snapshots)}), 400
+        return flask.jsonify(diff_snapshots(old, new,
+                                            top=int(flask.request.args.get('top', 25)),
+                                            key_type=flask.request.args.get('key', 'lineno')))
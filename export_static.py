@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Pre-render every match view into static JSON files.
+
+The base views of the explorer are pure functions of (match_id, theme), so
+they can be rendered once and served from any static file server. Each file
+``<match_id>-<theme>.json`` holds the header fields and every base figure
+for one match. Run the app with ``WC_STATIC_VIEWS=<out dir>`` to have the
+browser fetch these files instead of calling back into Python.
+
+    python export_static.py --out static_views
+"""
+
+import argparse
+import json
+import os
+
+import plotly
+
+import app
+
+themes = ['light', 'dark']
+
+
+def render_view(match_id, theme):
+    """Return every base view of a match for one theme."""
+    return dict(app.match_views(match_id, theme), match_id=match_id, theme=theme)
+
+
+def export_views(out_dir):
+    """Write one JSON file per (match, theme) into out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    for match_id in app.matches.match_id:
+        for theme in themes:
+            path = os.path.join(out_dir, '{}-{}.json'.format(match_id, theme))
+            with open(path, 'w') as f:
+                json.dump(render_view(int(match_id), theme), f,
+                          cls=plotly.utils.PlotlyJSONEncoder)
+        print('Exported match {}'.format(match_id))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default='static_views',
+                        help='directory to write the match views into')
+    args = parser.parse_args()
+    export_views(args.out)
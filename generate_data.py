@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Generate synthetic StatsBomb-format competitions for scaling tests.
+
+Writes data/matches/<competition_id>.json, data/events/<match_id>.json and
+data/lineups/<match_id>.json in the same schema the app reads, with
+possessions built from passes, carries and ball receipts, shots carrying
+statsbomb_xg, defensive actions, fouls, substitutions and a Starting XI per
+team. Every match is generated from its own seed, so a given --seed always
+produces the same archive however many matches are asked for.
+
+    python generate_data.py --out synthetic --competitions 2 --matches 500
+    WC_DATA_DIR=synthetic WC_COMPETITIONS=9001,9002 python app.py
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import uuid
+
+event_types = {
+    'Pass': 30, 'Ball Receipt*': 42, 'Carry': 43, 'Shot': 16, 'Pressure': 17,
+    'Dribble': 14, 'Block': 6, 'Foul Committed': 22, 'Foul Won': 21,
+    'Clearance': 9, 'Interception': 10, 'Dispossessed': 3, 'Starting XI': 35,
+    'Substitution': 19, 'Half Start': 18, 'Half End': 34,
+}
+
+play_patterns = [(1, 'Regular Play', 0.7), (4, 'From Throw In', 0.12),
+                 (3, 'From Free Kick', 0.1), (2, 'From Corner', 0.08)]
+
+# (position id, position name, mean x, mean y) for a 4-4-2
+formation = [
+    (1, 'Goalkeeper', 5, 40), (2, 'Right Back', 30, 8), (3, 'Right Center Back', 22, 28),
+    (5, 'Left Center Back', 22, 52), (6, 'Left Back', 30, 72), (12, 'Right Midfield', 60, 10),
+    (13, 'Right Center Midfield', 50, 30), (15, 'Left Center Midfield', 50, 50),
+    (16, 'Left Midfield', 60, 70), (22, 'Right Center Forward', 85, 32),
+    (24, 'Left Center Forward', 85, 48),
+]
+
+first_names = ['Luka', 'Ivan', 'Mateo', 'Jonas', 'Hugo', 'Kai', 'Emil', 'Theo', 'Noah',
+               'Leon', 'Aaron', 'Milan', 'Oscar', 'Rafael', 'Samuel', 'Tomás', 'Yusuf']
+last_names = ['Novak', 'Silva', 'Jensen', 'Moreau', 'Kovač', 'Santos', 'Berg', 'Ito',
+              'Okafor', 'Müller', 'Rossi', 'Fischer', 'Álvarez', 'Kim', 'Haddad', 'Nilsson']
+
+
+def build_teams(count, rng, first=0):
+    """Return teams first to first + count - 1, with a squad of 23 players each.
+
+    Team and player ids and names follow from the team's number, so teams
+    numbered apart never share them.
+    """
+    teams = []
+    for t in range(first, first + count):
+        team_id = 10000 + t
+        players = [{'id': team_id * 100 + p,
+                    'name': '{} {}'.format(rng.choice(first_names), rng.choice(last_names)),
+                    'jersey_number': p + 1}
+                   for p in range(23)]
+        teams.append({'id': team_id, 'name': 'Team {:04d}'.format(t),
+                      'country': {'id': t + 1, 'name': 'Country {:04d}'.format(t)},
+                      'players': players})
+    return teams
+
+
+def ref(name_id, name):
+    return {'id': name_id, 'name': name}
+
+
+class MatchGenerator:
+    """Simulates one match as a stream of StatsBomb events."""
+
+    def __init__(self, match_id, home, away, seed):
+        self.rng = random.Random(seed)
+        self.match_id = match_id
+        self.teams = [home, away]
+        self.events = []
+        self.goals = {home['id']: 0, away['id']: 0}
+        self.possession = 0
+        # players on the pitch per team, as (player, position) pairs
+        self.on_pitch = {team['id']: list(zip(team['players'][:11], formation))
+                         for team in self.teams}
+        self.bench = {team['id']: team['players'][11:] for team in self.teams}
+
+    def uid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128)))
+
+    def add(self, event_type, team, player=None, position=None, location=None, **extra):
+        period, clock = self.period, self.clock
+        offset = 0 if period == 1 else 45 * 60
+        event = {
+            'id': self.uid(),
+            'index': len(self.events) + 1,
+            'period': period,
+            'timestamp': '00:{:02d}:{:06.3f}'.format(int(clock // 60), clock % 60),
+            'minute': int((clock + offset) // 60),
+            'second': int((clock + offset) % 60),
+            'type': ref(event_types[event_type], event_type),
+            'possession': self.possession,
+            'possession_team': ref(self.in_possession['id'], self.in_possession['name']),
+            'play_pattern': ref(*self.play_pattern),
+            'team': ref(team['id'], team['name']),
+            'duration': 0.0,
+        }
+        if player is not None:
+            event['player'] = ref(player['id'], player['name'])
+            event['position'] = ref(position[0], position[1])
+        if location is not None:
+            event['location'] = [round(location[0], 1), round(location[1], 1)]
+        event.update(extra)
+        self.events.append(event)
+        return event
+
+    def tick(self, low, high):
+        self.clock += self.rng.uniform(low, high)
+
+    def spot(self, position, attacking_x=0):
+        """Return a location around a player's formation spot."""
+        x = min(max(self.rng.gauss(position[2] + attacking_x, 10), 0.5), 119.5)
+        y = min(max(self.rng.gauss(position[3], 8), 0.5), 79.5)
+        return x, y
+
+    def shot_xg(self, location):
+        distance = math.hypot(120 - location[0], 40 - location[1])
+        angle = abs(math.atan2(8 * (120 - location[0]),
+                               (120 - location[0]) ** 2 + (40 - location[1]) ** 2 - 16))
+        return round(1 / (1 + math.exp(0.11 * distance - 1.1 * angle + 0.4)), 6)
+
+    def run_possession(self, team, opponent):
+        rng = self.rng
+        self.possession += 1
+        self.in_possession = team
+        self.play_pattern = rng.choices([p[:2] for p in play_patterns],
+                                        [p[2] for p in play_patterns])[0]
+        players = self.on_pitch[team['id']]
+        holder, position = rng.choice(players[1:] if rng.random() < 0.8 else players)
+        location = self.spot(position)
+        last_pass = None
+
+        for _ in range(rng.randint(1, 12)):
+            self.tick(1, 4)
+            if rng.random() < 0.5:
+                end = (min(location[0] + rng.uniform(-3, 10), 119.5),
+                       min(max(location[1] + rng.uniform(-8, 8), 0.5), 79.5))
+                self.add('Carry', team, holder, position, location,
+                         carry={'end_location': [round(end[0], 1), round(end[1], 1)]})
+                location = end
+
+            if rng.random() < 0.15:
+                defender, defender_position = rng.choice(self.on_pitch[opponent['id']][1:])
+                self.add('Pressure', opponent, defender, defender_position,
+                         (120 - location[0], 80 - location[1]))
+
+            if location[0] > 90 and rng.random() < 0.22:
+                return self.shoot(team, opponent, holder, position, location, last_pass)
+
+            receiver, receiver_position = rng.choice([p for p in players if p[0] is not holder])
+            end = self.spot(receiver_position, attacking_x=min(location[0] / 4, 25))
+            length = math.hypot(end[0] - location[0], end[1] - location[1])
+            angle = math.atan2(end[1] - location[1], end[0] - location[0])
+            completed = rng.random() < 0.82
+            details = {
+                'recipient': ref(receiver['id'], receiver['name']),
+                'length': round(length, 6),
+                'angle': round(angle, 6),
+                'height': rng.choices([ref(1, 'Ground Pass'), ref(2, 'Low Pass'), ref(3, 'High Pass')],
+                                      [0.7, 0.15, 0.15])[0],
+                'end_location': [round(end[0], 1), round(end[1], 1)],
+            }
+            if end[0] > 100 and (end[1] < 18 or end[1] > 62):
+                details['cross'] = True
+            if not completed:
+                details['outcome'] = ref(9, 'Incomplete')
+            last_pass = self.add('Pass', team, holder, position, location, **{'pass': details})
+
+            if not completed:
+                self.turnover(team, opponent, end)
+                return
+            self.tick(0.5, 2)
+            self.add('Ball Receipt*', team, receiver, receiver_position, end)
+            holder, position, location = receiver, receiver_position, end
+
+            if rng.random() < 0.04:
+                self.foul(team, opponent, holder, position, location)
+                return
+            if rng.random() < 0.03:
+                self.add('Dribble', team, holder, position, location,
+                         dribble={'outcome': ref(8, 'Complete')})
+
+        self.turnover(team, opponent, location)
+
+    def turnover(self, team, opponent, location):
+        defender, position = self.rng.choice(self.on_pitch[opponent['id']][1:])
+        action = self.rng.choice(['Interception', 'Clearance', 'Block', 'Dispossessed'])
+        flipped = (120 - location[0], 80 - location[1])
+        if action == 'Dispossessed':
+            holder, holder_position = self.rng.choice(self.on_pitch[team['id']][1:])
+            self.add('Dispossessed', team, holder, holder_position, location)
+        else:
+            self.add(action, opponent, defender, position, flipped)
+
+    def foul(self, team, opponent, holder, position, location):
+        defender, defender_position = self.rng.choice(self.on_pitch[opponent['id']][1:])
+        self.add('Foul Committed', opponent, defender, defender_position,
+                 (120 - location[0], 80 - location[1]))
+        self.add('Foul Won', team, holder, position, location)
+
+    def shoot(self, team, opponent, holder, position, location, last_pass):
+        rng = self.rng
+        xg = self.shot_xg(location)
+        outcome = 'Goal' if rng.random() < xg else rng.choice(
+            ['Saved', 'Off T', 'Blocked', 'Wayward', 'Post'])
+        shot_id = self.uid()
+        if last_pass is not None:
+            last_pass['pass']['assisted_shot_id'] = shot_id
+            last_pass['pass']['shot_assist'] = True
+            if outcome == 'Goal':
+                last_pass['pass']['goal_assist'] = True
+        shot = self.add('Shot', team, holder, position, location, shot={
+            'statsbomb_xg': xg,
+            'end_location': [120.0, round(rng.uniform(34, 46), 1)],
+            'outcome': ref(97 if outcome == 'Goal' else 100, outcome),
+            'body_part': rng.choices([ref(40, 'Right Foot'), ref(38, 'Left Foot'), ref(37, 'Head')],
+                                     [0.55, 0.3, 0.15])[0],
+            'technique': rng.choices([ref(93, 'Normal'), ref(95, 'Volley'), ref(91, 'Half Volley')],
+                                     [0.8, 0.1, 0.1])[0],
+            'type': ref(87, 'Open Play'),
+        })
+        shot['id'] = shot_id
+        if outcome == 'Goal':
+            self.goals[team['id']] += 1
+        elif outcome == 'Blocked':
+            defender, defender_position = rng.choice(self.on_pitch[opponent['id']][1:])
+            self.add('Block', opponent, defender, defender_position,
+                     (120 - location[0], 80 - location[1]))
+
+    def substitute(self, team):
+        rng = self.rng
+        if not self.bench[team['id']]:
+            return
+        slot = rng.randrange(1, 11)
+        player, position = self.on_pitch[team['id']][slot]
+        replacement = self.bench[team['id']].pop(rng.randrange(len(self.bench[team['id']])))
+        self.in_possession = team
+        self.play_pattern = (1, 'Regular Play')
+        self.add('Substitution', team, player, position,
+                 substitution={'outcome': ref(103, 'Tactical'),
+                               'replacement': ref(replacement['id'], replacement['name'])})
+        self.on_pitch[team['id']][slot] = (replacement, position)
+
+    def generate(self):
+        self.period, self.clock = 1, 0.0
+        self.in_possession, self.play_pattern = self.teams[0], (1, 'Regular Play')
+        for team in self.teams:
+            self.add('Starting XI', team, tactics={
+                'formation': 442,
+                'lineup': [{'player': ref(p['id'], p['name']),
+                            'position': ref(pos[0], pos[1]),
+                            'jersey_number': p['jersey_number']}
+                           for p, pos in self.on_pitch[team['id']]]})
+
+        substitution_times = {team['id']: sorted(self.rng.uniform(55, 85) * 60 - 45 * 60
+                                                 for _ in range(3))
+                              for team in self.teams}
+
+        for period in [1, 2]:
+            self.period, self.clock = period, 0.0
+            for team in self.teams:
+                self.add('Half Start', team)
+            end = 45 * 60 + self.rng.uniform(60, 300)
+            attacking = self.rng.randrange(2)
+            while self.clock < end:
+                if period == 2:
+                    for team in self.teams:
+                        while substitution_times[team['id']] and substitution_times[team['id']][0] < self.clock:
+                            substitution_times[team['id']].pop(0)
+                            self.substitute(team)
+                team, opponent = self.teams[attacking], self.teams[1 - attacking]
+                self.run_possession(team, opponent)
+                self.tick(2, 8)
+                attacking = 1 - attacking if self.rng.random() < 0.9 else attacking
+            for team in self.teams:
+                self.add('Half End', team)
+        return self.events
+
+
+def generate(out_dir, competitions, matches_per_competition, team_count, seed):
+    for folder in ['matches', 'events', 'lineups']:
+        os.makedirs(os.path.join(out_dir, folder), exist_ok=True)
+
+    competition_list = []
+    next_match_id = 1000000
+    for c in range(competitions):
+        competition_id = 9001 + c
+        competition_rng = random.Random(seed * 7919 + competition_id)
+        teams = build_teams(team_count, competition_rng, first=c * team_count)
+        start = datetime.date(2018, 8, 1)
+        match_list = []
+
+        for m in range(matches_per_competition):
+            match_id = next_match_id
+            next_match_id += 1
+            home, away = competition_rng.sample(teams, 2)
+            generator = MatchGenerator(match_id, home, away, seed * 1000003 + match_id)
+            events = generator.generate()
+
+            with open(os.path.join(out_dir, 'events', '{}.json'.format(match_id)), 'w') as f:
+                json.dump(events, f)
+            with open(os.path.join(out_dir, 'lineups', '{}.json'.format(match_id)), 'w') as f:
+                json.dump([{'team_id': team['id'],
+                            'team_name': team['name'],
+                            'lineup': [{'player_id': p['id'],
+                                        'player_name': p['name'],
+                                        'player_nickname': None,
+                                        'jersey_number': p['jersey_number'],
+                                        'country': team['country']}
+                                       for p in team['players']]}
+                           for team in [home, away]], f)
+
+            match_list.append({
+                'match_id': match_id,
+                'match_date': str(start + datetime.timedelta(days=m // 8)),
+                'kick_off': '16:00:00.000',
+                'competition': {'competition_id': competition_id,
+                                'country_name': 'Synthetic',
+                                'competition_name': 'Synthetic League {}'.format(c + 1)},
+                'season': {'season_id': 1, 'season_name': '2018/2019'},
+                'home_team': {'home_team_id': home['id'], 'home_team_name': home['name']},
+                'away_team': {'away_team_id': away['id'], 'away_team_name': away['name']},
+                'home_score': generator.goals[home['id']],
+                'away_score': generator.goals[away['id']],
+                'competition_stage': ref(1, 'Matchday {}'.format(m // (team_count // 2) + 1)),
+                'stadium_name': '{} Stadium'.format(home['name']),
+                'referee_name': 'Referee {}'.format(competition_rng.randrange(40)),
+                'match_status': 'available',
+                'data_version': '1.0.2',
+            })
+
+        with open(os.path.join(out_dir, 'matches', '{}.json'.format(competition_id)), 'w') as f:
+            json.dump(match_list, f)
+        competition_list.append({'competition_id': competition_id,
+                                 'season_id': 1,
+                                 'country_name': 'Synthetic',
+                                 'competition_name': 'Synthetic League {}'.format(c + 1),
+                                 'season_name': '2018/2019'})
+        print('Generated competition {} with {} matches'.format(competition_id, len(match_list)))
+
+    with open(os.path.join(out_dir, 'competitions.json'), 'w') as f:
+        json.dump(competition_list, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default='synthetic_data')
+    parser.add_argument('--competitions', type=int, default=1)
+    parser.add_argument('--matches', type=int, default=64,
+                        help='matches per competition')
+    parser.add_argument('--teams', type=int, default=32,
+                        help='teams per competition')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out, args.competitions, args.matches, args.teams, args.seed)
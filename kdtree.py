@@ -0,0 +1,71 @@
+"""Exact nearest-neighbour search over the rows of a NumPy array.
+
+The tree splits on the widest dimension at the median until leaves hold at
+most leaf_size points, and is stored as flat node tuples rather than node
+objects. Queries walk it depth first, skipping subtrees that cannot hold a
+point closer than the current k-th nearest, and compare leaf points in one
+vectorised step.
+"""
+
+import heapq
+
+import numpy as np
+
+
+class KDTree:
+    def __init__(self, points, leaf_size=16):
+        self.points = np.asarray(points, dtype=float)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(self.points))
+        # (start, stop, split dimension or -1 for a leaf, split value, left, right)
+        self.nodes = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def _build(self, start, stop):
+        node = len(self.nodes)
+        self.nodes.append(None)
+        rows = self.order[start:stop]
+        values = self.points[rows]
+        spread = values.max(axis=0) - values.min(axis=0)
+        if stop - start <= self.leaf_size or not spread.any():
+            self.nodes[node] = (start, stop, -1, 0.0, -1, -1)
+            return node
+
+        dim = int(np.argmax(spread))
+        mid = (start + stop) // 2
+        self.order[start:stop] = rows[np.argpartition(values[:, dim], mid - start)]
+        split = self.points[self.order[mid], dim]
+        left = self._build(start, mid)
+        right = self._build(mid, stop)
+        self.nodes[node] = (start, stop, dim, split, left, right)
+        return node
+
+    def query(self, point, k=5):
+        """Return distances and row indices of the k points nearest to point."""
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self.points))
+        heap = []  # (-squared distance, row) of the best k so far
+        stack = [(0, 0.0)] if self.nodes else []
+        while stack:
+            node, bound = stack.pop()
+            if len(heap) == k and bound >= -heap[0][0]:
+                continue
+            start, stop, dim, split, left, right = self.nodes[node]
+            if dim < 0:
+                rows = self.order[start:stop]
+                distances = ((self.points[rows] - point) ** 2).sum(axis=1)
+                for distance, row in zip(distances, rows):
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-distance, row))
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, (-distance, row))
+                continue
+            gap = point[dim] - split
+            near, far = (left, right) if gap < 0 else (right, left)
+            stack.append((far, max(bound, gap * gap)))
+            stack.append((near, bound))
+
+        best = sorted((-distance, row) for distance, row in heap)
+        return (np.sqrt([distance for distance, _ in best]),
+                np.array([row for _, row in best], dtype=int))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Tail a live event feed, and write one from a stored match.
+
+A feed is a file, or a directory of files, named <match_id>.jsonl and
+appended to with one StatsBomb event per line, in the schema of the files in
+data/events. EventFeed remembers how far it has read each file and returns
+only the events appended since, leaving a partly written last line for the
+next read. Run the app with WC_LIVE=<feed> to follow it.
+
+This module also stands in for a live provider: it replays a match from
+data/events into a feed file at a chosen speed.
+
+    python live.py 7584 --out live --speed 60
+    WC_LIVE=live python app.py
+"""
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+
+
+class EventFeed:
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        self.lock = threading.Lock()
+
+    def files(self):
+        """Return match_id -> path of every file of the feed."""
+        if os.path.isdir(self.path):
+            paths = sorted(glob.glob(os.path.join(self.path, '*.jsonl')))
+        else:
+            paths = [self.path]
+        return {int(os.path.splitext(os.path.basename(path))[0]): path for path in paths}
+
+    def match_ids(self):
+        return sorted(self.files())
+
+    def read(self):
+        """Return match_id -> events appended since the last read."""
+        new = {}
+        with self.lock:
+            for match_id, path in self.files().items():
+                offset = self.offsets.get(path, 0)
+                if not os.path.exists(path) or os.path.getsize(path) <= offset:
+                    continue
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read()
+                end = chunk.rfind(b'\n') + 1
+                if not end:
+                    continue
+                self.offsets[path] = offset + end
+                new[match_id] = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+        return new
+
+
+def write_feed(match_id, out, data_dir='./data', speed=60.0, start=0, stop=None):
+    """Append a stored match's events[start:stop] to a feed, speed game seconds per second."""
+    with open('{}/events/{}.json'.format(data_dir, match_id), encoding='utf-8') as f:
+        events = json.load(f)[start:stop]
+    if os.path.isdir(out):
+        out = os.path.join(out, '{}.jsonl'.format(match_id))
+
+    clock = events[0]['minute'] * 60 + events[0]['second'] if events else 0
+    with open(out, 'a', encoding='utf-8') as f:
+        for event in events:
+            event_clock = event['minute'] * 60 + event['second']
+            if speed and event_clock > clock:
+                time.sleep((event_clock - clock) / speed)
+            clock = max(clock, event_clock)
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            f.flush()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('match_id', type=int)
+    parser.add_argument('--out', default='live',
+                        help='feed file, or directory to write <match_id>.jsonl into')
+    parser.add_argument('--data', default='./data')
+    parser.add_argument('--speed', type=float, default=60,
+                        help='game seconds per second, 0 to write at once')
+    parser.add_argument('--start', type=int, default=0, help='index of the first event to write')
+    parser.add_argument('--stop', type=int, help='index past the last event to write')
+    args = parser.parse_args()
+    write_feed(args.match_id, args.out, args.data, args.speed, args.start, args.stop)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Replay realistic user sessions against a running explorer.
+
+Each simulated session loads the page, then loops over a script: search for
+and pick a match, zoom the xG plot, click players on the passing network,
+toggle the theme and switch match again. Callbacks are driven through Dash's own
+/_dash-update-component endpoint and chained the way the renderer chains
+them, so every action costs what it costs a browser. Clientside callbacks
+that decide which server callbacks run are replayed here (see CLIENTSIDE);
+the others only draw, and are left out.
+
+Concurrency is ramped through the given session counts. For every step the
+throughput, latency percentiles and error rate are reported. Every reply that
+brings no outputs is an error, except the 204 of a callback that prevented
+its update, which is reported apart; a background job whose result key was
+also handed to another session counts as an error even then, since either
+session may have taken the other's result.
+
+    python app.py &
+    python loadtest.py --url http://127.0.0.1:8080 --sessions 1,2,4,8,16 --duration 30
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+
+def walk_layout(component, props):
+    """Collect (id, prop) -> value for every component with an id."""
+    if isinstance(component, list):
+        for child in component:
+            walk_layout(child, props)
+        return
+    if not isinstance(component, dict) or 'props' not in component:
+        return
+    component_props = component['props']
+    if 'id' in component_props:
+        for prop, value in component_props.items():
+            props[(component_props['id'], prop)] = value
+    walk_layout(component_props.get('children'), props)
+
+
+def parse_outputs(output):
+    """Split a dependency output string into (id, prop) pairs."""
+    if output.startswith('..'):
+        specs = output[2:-2].split('...')
+    else:
+        specs = [output]
+    # allow_duplicate outputs carry an @<hash> suffix after the prop
+    return [tuple(spec.split('@')[0].rsplit('.', 1)) for spec in specs]
+
+
+def clientside_function(dependency):
+    """Return (namespace, function name) of a clientside callback, else None."""
+    function = dependency.get('clientside_function')
+    return function and (function['namespace'], function['function_name'])
+
+
+def forward_interaction(callback, changed):
+    """Replay interactions.forward in assets/app_interactions.js."""
+    prop_ids = ['{}.{}'.format(i, p) for i, p in changed]
+    if 'view_reset.data' in prop_ids:
+        return {}
+    return {callback.outputs[0]: {'prop_ids': prop_ids, 'time': time.time() * 1000}}
+
+
+CLIENTSIDE = {('interactions', 'forward'): forward_interaction}
+
+
+class Callback:
+    def __init__(self, dependency):
+        self.output = dependency['output']
+        self.outputs = parse_outputs(self.output)
+        self.multi = self.output.startswith('..')
+        self.inputs = [(d['id'], d['property']) for d in dependency['inputs']]
+        self.state = [(d['id'], d['property']) for d in dependency['state']]
+        self.initial = not dependency.get('prevent_initial_call')
+        self.clientside = CLIENTSIDE.get(clientside_function(dependency))
+
+
+class Session:
+    """One simulated browser session."""
+
+    timeout = 60
+
+    def __init__(self, url, callbacks, layout, stats, rng):
+        self.url = url
+        self.callbacks = callbacks
+        self.props = dict(layout)
+        self.stats = stats
+        self.rng = rng
+
+    def post(self, callback, changed):
+        outputs = [{'id': i, 'property': p} for i, p in callback.outputs]
+        body = {
+            'output': callback.output,
+            'outputs': outputs if callback.multi else outputs[0],
+            'inputs': [{'id': i, 'property': p, 'value': self.props.get((i, p))}
+                       for i, p in callback.inputs],
+            'state': [{'id': i, 'property': p, 'value': self.props.get((i, p))}
+                      for i, p in callback.state],
+            'changedPropIds': ['{}.{}'.format(i, p) for i, p in changed],
+        }
+        data = json.dumps(body).encode()
+        query = ''
+        cache_key = None
+        start = time.perf_counter()
+        try:
+            while time.perf_counter() - start < self.timeout:
+                request = urllib.request.Request(
+                    self.url + '/_dash-update-component' + query, data=data,
+                    headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    payload = response.read()
+                    status = response.status
+                    result = json.loads(payload) if status == 200 else {}
+                # Background callbacks answer with a job to poll.
+                if 'cacheKey' in result:
+                    cache_key = result['cacheKey']
+                    shared = self.stats.start_job(cache_key)
+                    query = '?cacheKey={}&job={}'.format(cache_key, result['job'])
+                    continue
+                if query and status == 200 and 'response' not in result:
+                    time.sleep(0.05)
+                    continue
+                break
+            else:
+                raise TimeoutError(callback.output)
+        except (urllib.error.URLError, TimeoutError, ValueError):
+            self.stats.record(callback.output, time.perf_counter() - start, 0, error=True)
+            return {}
+        finally:
+            if cache_key:
+                self.stats.end_job(cache_key)
+
+        # A 204 is a PreventUpdate, unless this job's result key was also
+        # handed to another session, which then may have taken the result.
+        no_update = status == 204 and not (cache_key and shared)
+        self.stats.record(callback.output, time.perf_counter() - start, len(payload),
+                          error=not no_update and (status != 200 or 'response' not in result),
+                          no_update=no_update)
+
+        changes = {}
+        for component_id, props in result.get('response', {}).items():
+            for prop, value in props.items():
+                changes[(component_id, prop)] = value
+        return changes
+
+    def trigger(self, due, changes):
+        for callback in self.callbacks:
+            changed = set(changes) & set(callback.inputs)
+            if changed:
+                due.setdefault(callback, set()).update(changed)
+
+    def set(self, changes):
+        """Apply user changes and run every callback they trigger."""
+        self.props.update(changes)
+        due = {}
+        self.trigger(due, changes)
+        self.run(due)
+
+    def run(self, due):
+        while due:
+            produced = set(o for callback in due for o in callback.outputs)
+            # Like the renderer, hold back callbacks waiting on upstream outputs.
+            ready = [cb for cb in due if not produced & set(cb.inputs)] or list(due)
+
+            updates = {}
+            for callback in ready:
+                changed = due.pop(callback)
+                if callback.clientside:
+                    updates.update(callback.clientside(callback, changed))
+                else:
+                    updates.update(self.post(callback, changed))
+            self.props.update(updates)
+            self.trigger(due, updates)
+
+    def load(self):
+        self.run({cb: set(cb.inputs) for cb in self.callbacks if cb.initial})
+
+    def run_script(self):
+        teams = [option['value'] for option in self.props[('compare_team', 'options')]]
+        self.set({('match_dropdown', 'search_value'): self.rng.choice(teams)[:4]})
+        matches = [option['value'] for option in self.props[('match_dropdown', 'options')]]
+        self.set({('match_dropdown', 'value'): self.rng.choice(matches)})
+
+        start = self.rng.uniform(0, 70)
+        self.set({('xg_plot', 'relayoutData'): {'xaxis.range[0]': start,
+                                                'xaxis.range[1]': start + self.rng.uniform(10, 40)}})
+
+        players = [point for trace in self.props.get(('pass_map', 'figure'), {}).get('data', [])
+                   for point in (trace.get('customdata') or [])]
+        for player in self.rng.sample(players, min(2, len(players))):
+            self.set({('pass_map', 'clickData'): {'points': [{'customdata': player}]}})
+
+        clicks = self.props.get(('theme_switcher', 'n_clicks')) or 0
+        self.set({('theme_switcher', 'n_clicks'): clicks + 1})
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.no_updates = 0
+        self.failed = {}
+        self.jobs = {}
+        self.bytes = 0
+        self.scripts = 0
+
+    def record(self, output, seconds, size, error=False, no_update=False):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.bytes += size
+            self.errors += error
+            self.no_updates += no_update
+            if error:
+                self.failed[output] = self.failed.get(output, 0) + 1
+
+    def start_job(self, cache_key):
+        """Count a background job in flight; return whether its key already was."""
+        with self._lock:
+            self.jobs[cache_key] = self.jobs.get(cache_key, 0) + 1
+            return self.jobs[cache_key] > 1
+
+    def end_job(self, cache_key):
+        with self._lock:
+            self.jobs[cache_key] -= 1
+            if not self.jobs[cache_key]:
+                del self.jobs[cache_key]
+
+
+def fetch_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def run_step(url, callbacks, layout, sessions, duration, seed):
+    stats = Stats()
+    deadline = time.time() + duration
+
+    def worker(n):
+        session = Session(url, callbacks, layout, stats, random.Random(seed + n))
+        session.load()
+        while time.time() < deadline:
+            session.run_script()
+            with stats._lock:
+                stats.scripts += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(sessions)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    latencies = np.array(stats.latencies or [0]) * 1000
+    return {
+        'sessions': sessions,
+        'requests': len(stats.latencies),
+        'requests_per_s': len(stats.latencies) / elapsed,
+        'scripts_per_s': stats.scripts / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'error_rate': stats.errors / max(len(stats.latencies), 1),
+        'errors_by_output': stats.failed,
+        'no_update_rate': stats.no_updates / max(len(stats.latencies), 1),
+        'mb_per_s': stats.bytes / elapsed / 1e6,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--sessions', default='1,2,4,8',
+                        help='comma separated concurrent session counts to ramp through')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='seconds to run each step')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    callbacks = [Callback(d) for d in fetch_json(url + '/_dash-dependencies')
+                 if clientside_function(d) in [None, *CLIENTSIDE]]
+    layout = {}
+    walk_layout(fetch_json(url + '/_dash-layout'), layout)
+
+    results = []
+    print('{:>9}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}{:>9}{:>11}'.format(
+        'sessions', 'req/s', 'script/s', 'p50 ms', 'p95 ms', 'p99 ms', 'MB/s', 'errors', 'no update'))
+    for sessions in [int(n) for n in args.sessions.split(',')]:
+        result = run_step(url, callbacks, layout, sessions, args.duration, args.seed)
+        results.append(result)
+        print('{sessions:>9}{requests_per_s:>10.1f}{scripts_per_s:>10.2f}{p50_ms:>10.1f}'
+              '{p95_ms:>10.1f}{p99_ms:>10.1f}{mb_per_s:>10.2f}{error_rate:>9.1%}'
+              '{no_update_rate:>11.1%}'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
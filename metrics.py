@@ -0,0 +1,154 @@
+"""Per-callback latency and payload metrics in Prometheus text format.
+
+CallbackMetrics wraps every server-side callback registered on a Dash app and
+records a latency histogram, a response size histogram and an error count
+labelled by the callback's output id. Other counters, such as cache hit
+ratios, can be exported alongside with add_collector.
+
+A background callback is answered with a job to poll. Its latency runs from
+the request that submitted the job to the poll that brings its result, and
+is recorded once, with the size of that result; the submission and the polls
+still waiting are not counted. The start of a job is kept by the process
+that submitted it, so a poll served by another worker process is not timed.
+"""
+
+import functools
+import json
+import threading
+import time
+
+import flask
+from dash.exceptions import PreventUpdate
+
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+size_buckets = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus layout."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield '{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count)
+        yield '{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, self.count)
+        yield '{}_sum{{{}}} {}'.format(name, labels, self.sum)
+        yield '{}_count{{{}}} {}'.format(name, labels, self.count)
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class CallbackMetrics:
+    """Collects callback metrics and renders them for scraping."""
+
+    def __init__(self, job_ttl=600):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.size = {}
+        self.errors = {}
+        self.collectors = []
+        # cacheKey -> start of the background jobs submitted and not yet done.
+        # A job whose poller went away is forgotten after job_ttl seconds.
+        self.jobs = {}
+        self.job_ttl = job_ttl
+
+    def instrument(self, app):
+        """Wrap every server-side callback currently registered on app."""
+        for output, entry in app.callback_map.items():
+            if 'callback' in entry:
+                entry['callback'] = self.wrap(output, entry['callback'], background=bool(entry.get('long')))
+
+    def wrap(self, output, func, background=False):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            cache_key = flask.request.args.get('cacheKey') if background else None
+            if cache_key:
+                with self._lock:
+                    start = self.jobs.get(cache_key)
+            try:
+                response = func(*args, **kwargs)
+            except PreventUpdate:
+                self.finish(output, cache_key, start, 0)
+                raise
+            except Exception:
+                with self._lock:
+                    self.jobs.pop(cache_key, None)
+                    self.errors[output] = self.errors.get(output, 0) + 1
+                raise
+            if background and not cache_key:
+                self.submit(json.loads(response)['cacheKey'], start)
+            elif not background or '"response"' in response:
+                self.finish(output, cache_key, start, len(response.encode('utf-8')))
+            return response
+        return wrapper
+
+    def submit(self, cache_key, start):
+        with self._lock:
+            self.jobs = {key: job_start for key, job_start in self.jobs.items()
+                         if start - job_start < self.job_ttl}
+            self.jobs[cache_key] = start
+
+    def finish(self, output, cache_key, start, size):
+        """Record a call that is done, unless it is a job this process did not submit."""
+        if cache_key:
+            with self._lock:
+                self.jobs.pop(cache_key, None)
+        if start is not None:
+            self.observe(output, time.perf_counter() - start, size)
+
+    def observe(self, output, seconds, size):
+        with self._lock:
+            if output not in self.latency:
+                self.latency[output] = Histogram(latency_buckets)
+                self.size[output] = Histogram(size_buckets)
+            self.latency[output].observe(seconds)
+            self.size[output].observe(size)
+
+    def add_collector(self, name, help_text, kind, fn):
+        """Export fn() -> [(labels dict, value)] as metric name on every scrape."""
+        self.collectors.append((name, help_text, kind, fn))
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        out = []
+        with self._lock:
+            out.append('# HELP dash_callback_latency_seconds Callback latency by output.')
+            out.append('# TYPE dash_callback_latency_seconds histogram')
+            for output, histogram in sorted(self.latency.items()):
+                out.extend(histogram.lines('dash_callback_latency_seconds',
+                                           'output="{}"'.format(label(output))))
+
+            out.append('# HELP dash_callback_response_bytes Callback response size by output.')
+            out.append('# TYPE dash_callback_response_bytes histogram')
+            for output, histogram in sorted(self.size.items()):
+                out.extend(histogram.lines('dash_callback_response_bytes',
+                                           'output="{}"'.format(label(output))))
+
+            out.append('# HELP dash_callback_errors_total Callback exceptions by output.')
+            out.append('# TYPE dash_callback_errors_total counter')
+            for output, count in sorted(self.errors.items()):
+                out.append('dash_callback_errors_total{{output="{}"}} {}'.format(label(output), count))
+
+        for name, help_text, kind, fn in self.collectors:
+            out.append('# HELP {} {}'.format(name, help_text))
+            out.append('# TYPE {} {}'.format(name, kind))
+            for labels, value in fn():
+                labels = ','.join('{}="{}"'.format(k, label(v)) for k, v in labels.items())
+                out.append('{}{{{}}} {}'.format(name, labels, value))
+
+        return '\n'.join(out) + '\n'
@@ -0,0 +1,101 @@
+"""Derived tables rebuilt match by match.
+
+A Pipeline runs a list of stages, each building one or more tables from
+others. The tables of a per-match stage hold the rows of many matches, keyed
+by a match_id column or index level, and the stage builds the rows of any
+set of matches from those matches' input rows alone. When some matches of a
+table change, mark_dirty and update rerun only the stages downstream of it,
+only on those matches, and splice the rebuilt rows in place of the old ones,
+so that an update costs time in the changed matches, not the tournament.
+
+Per-match tables are kept in match order, by their index when it has a
+match_id level, and otherwise by match_id with a fresh RangeIndex. build
+and splice both leave them so, so a table updated in place equals one built
+from scratch, row labels included; those labels are positions, not ids
+that last across updates.
+
+Stages with per_match=False, such as a model fitted on every match, run in
+build only. Per-match stages reading them get the whole table, as built.
+"""
+
+import collections
+
+import pandas as pd
+
+
+Stage = collections.namedtuple('Stage', ['outputs', 'inputs', 'build', 'per_match'],
+                               defaults=[True])
+
+
+def match_mask(table, match_ids):
+    """Return which rows of table belong to the given matches."""
+    if 'match_id' in table.columns:
+        return table.match_id.isin(match_ids).to_numpy()
+    return table.index.get_level_values('match_id').isin(match_ids)
+
+
+def in_match_order(table):
+    """Return table sorted by match, keeping the order of rows within one."""
+    if 'match_id' in table.index.names:
+        return table.sort_index(kind='stable')
+    return table.sort_values('match_id', kind='stable', ignore_index=True)
+
+
+def splice(table, match_ids, rows):
+    """Return table with the rows of match_ids replaced by rows, in match order."""
+    kept = table[~match_mask(table, match_ids)]
+    return in_match_order(pd.concat([kept, rows], sort=False) if len(rows) else kept)
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.whole = {name for stage in self.stages if not stage.per_match for name in stage.outputs}
+        self.tables = {}
+        self.dirty = collections.defaultdict(set)
+
+    def run(self, stage, tables):
+        results = stage.build(*tables)
+        return dict(zip(stage.outputs, results if len(stage.outputs) > 1 else [results]))
+
+    def build(self, sources):
+        """Build every table from the source tables and return them by name."""
+        self.tables = {name: table if name in self.whole else in_match_order(table)
+                       for name, table in sources.items()}
+        self.dirty.clear()
+        for stage in self.stages:
+            tables = self.run(stage, [self.tables[name] for name in stage.inputs])
+            self.tables.update(tables if not stage.per_match
+                               else {name: in_match_order(table) for name, table in tables.items()})
+        return self.tables
+
+    def mark_dirty(self, name, match_ids):
+        """Record that the rows of match_ids in table name have changed."""
+        self.dirty[name].update(match_ids)
+
+    def append(self, name, rows):
+        """Add rows after those of their matches in a source table and mark them dirty."""
+        table = self.tables[name]
+        match_ids = set(rows.match_id)
+        old = table[match_mask(table, match_ids)]
+        self.tables[name] = splice(table, match_ids, pd.concat([old, rows], sort=False))
+        self.mark_dirty(name, match_ids)
+
+    def update(self):
+        """Rebuild the dirty matches' rows downstream of the dirty tables.
+
+        Returns the changed matches of every table that changed, the
+        tables marked dirty included.
+        """
+        dirty, self.dirty = self.dirty, collections.defaultdict(set)
+        for stage in self.stages:
+            match_ids = set().union(*(dirty.get(name, ()) for name in stage.inputs))
+            if not stage.per_match or not match_ids:
+                continue
+            tables = [self.tables[name] if name in self.whole
+                      else self.tables[name][match_mask(self.tables[name], match_ids)]
+                      for name in stage.inputs]
+            for name, rows in self.run(stage, tables).items():
+                self.tables[name] = splice(self.tables[name], match_ids, rows)
+                dirty[name].update(match_ids)
+        return dict(dirty)
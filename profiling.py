@@ -0,0 +1,108 @@
+"""Opt-in cProfile capture for callbacks and the import-time pipeline.
+
+Profiling is off unless switched on through the environment or the
+/debug/profiling route:
+
+    WC_PROFILE_CALLBACKS  comma separated callback names, or * for all
+    WC_PROFILE_RATE       fraction of calls to profile (default 1)
+    WC_PROFILE_PIPELINE   profile the data pipeline at import when set
+    WC_PROFILE_DIR        output directory (default ./profiles)
+    WC_PROFILE_KEEP       number of profiles kept before rotating (default 200)
+
+Every profile is written as <time>-<name>-<pid>.prof together with a .json
+file holding the call's inputs and duration, so a slow call can be replayed
+and the profile opened offline with pstats or snakeviz.
+"""
+
+import cProfile
+import functools
+import glob
+import json
+import os
+import random
+import time
+
+import flask
+
+from diagnostics import debug_token_required
+
+config = {
+    'callbacks': set(filter(None, os.environ.get('WC_PROFILE_CALLBACKS', '').split(','))),
+    'rate': float(os.environ.get('WC_PROFILE_RATE', 1)),
+    'directory': os.environ.get('WC_PROFILE_DIR', './profiles'),
+    'keep': int(os.environ.get('WC_PROFILE_KEEP', 200)),
+}
+
+
+def selected(name):
+    callbacks = config['callbacks']
+    return ('*' in callbacks or name in callbacks) and random.random() < config['rate']
+
+
+def write_profile(profile, name, details):
+    """Write a profile and its details, dropping the oldest beyond keep."""
+    os.makedirs(config['directory'], exist_ok=True)
+    path = os.path.join(config['directory'], '{}-{}-{}'.format(
+        time.strftime('%Y%m%dT%H%M%S'), name, os.getpid()))
+    profile.dump_stats(path + '.prof')
+    with open(path + '.json', 'w') as f:
+        json.dump(dict(details, callback=name), f, default=str, indent=2)
+
+    profiles = sorted(glob.glob(os.path.join(config['directory'], '*.prof')), key=os.path.getmtime)
+    for old in profiles[:-config['keep']]:
+        for extension in ['.prof', '.json']:
+            if os.path.exists(old[:-5] + extension):
+                os.remove(old[:-5] + extension)
+
+
+def profiled(func):
+    """Profile calls to func when it is selected for profiling."""
+    @functools.wraps(func)
+    def wrapper(*args):
+        if not selected(func.__name__):
+            return func(*args)
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            write_profile(profile, func.__name__, {
+                'inputs': args,
+                'duration_s': time.perf_counter() - start,
+            })
+    return wrapper
+
+
+def start_pipeline_profile():
+    """Start profiling the import-time pipeline if requested."""
+    if not os.environ.get('WC_PROFILE_PIPELINE'):
+        return None
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile, time.perf_counter()
+
+
+def finish_pipeline_profile(started, details):
+    if started is None:
+        return
+    profile, start = started
+    profile.disable()
+    write_profile(profile, 'pipeline', dict(details, duration_s=time.perf_counter() - start))
+
+
+def register_debug_routes(server):
+    """Add /debug/profiling to inspect and change the profiling config."""
+
+    @server.route('/debug/profiling', methods=['GET', 'POST'])
+    @debug_token_required
+    def debug_profiling():
+        if flask.request.method == 'POST':
+            args = flask.request.args
+            if 'callbacks' in args:
+                config['callbacks'] = set(filter(None, args['callbacks'].split(',')))
+            if 'rate' in args:
+                config['rate'] = float(args['rate'])
+        profiles = sorted(glob.glob(os.path.join(config['directory'], '*.prof')))
+        return flask.jsonify(dict(config,
+                                  callbacks=sorted(config['callbacks']),
+                                  profiles=[os.path.basename(p) for p in profiles[-20:]]))
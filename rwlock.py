@@ -0,0 +1,54 @@
+"""A lock held by many readers at once, or by one writer alone.
+
+Readers run side by side and a writer waits for those in progress to
+finish. While a writer waits, new readers wait behind it, so a steady
+stream of readers cannot hold it off. Neither side is reentrant: a thread
+holding the lock must not take it again.
+"""
+
+import contextlib
+import functools
+import threading
+
+
+class ReadWriteLock:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writers = 0
+        self._writing = False
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self._cond:
+            self._writers += 1
+            self._cond.wait_for(lambda: not self._readers and not self._writing)
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writers -= 1
+                self._writing = False
+                self._cond.notify_all()
+
+    def reading(self, func):
+        """Return func wrapped to run with the lock held for reading."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.read():
+                return func(*args, **kwargs)
+        return wrapper
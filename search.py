@@ -0,0 +1,73 @@
+"""Accent-insensitive prefix and trigram search over short labels.
+
+Labels are normalised by stripping accents, case folding and splitting on
+anything that is not a letter or digit, so that "kostic" finds "Kostić" and
+"alex rod" finds "Álex Rodríguez". An entry matches a query when every query
+word is a prefix of one of its words, found by bisecting one sorted word
+list. When that gives too few results, entries sharing enough trigrams with
+the query are added, which catches typos and words typed out of order.
+"""
+
+import bisect
+import collections
+import re
+import unicodedata
+
+
+def normalise(text):
+    """Return text without accents, case folded and with single spaces."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def trigrams(text):
+    padded = '  {} '.format(text)
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, labels, min_similarity=0.5):
+        self.labels = list(labels)
+        self.min_similarity = min_similarity
+        self.normalised = [normalise(label) for label in self.labels]
+        # (word, entry) pairs sorted by word, for prefix lookups
+        self.words = sorted((word, entry) for entry, text in enumerate(self.normalised)
+                            for word in set(text.split()))
+        self.keys = [word for word, _ in self.words]
+        self.trigram_entries = collections.defaultdict(list)
+        for entry, text in enumerate(self.normalised):
+            for trigram in trigrams(text):
+                self.trigram_entries[trigram].append(entry)
+
+    def prefix_entries(self, word):
+        start = bisect.bisect_left(self.keys, word)
+        stop = bisect.bisect_left(self.keys, word + '\uffff', start)
+        return {entry for _, entry in self.words[start:stop]}
+
+    def similar_entries(self, text):
+        """Return entry -> share of the trigrams of text found in the entry."""
+        query = trigrams(text)
+        shared = collections.Counter(entry for trigram in query
+                                     for entry in self.trigram_entries.get(trigram, ()))
+        similarity = {entry: count / len(query) for entry, count in shared.items()}
+        return {entry: value for entry, value in similarity.items() if value >= self.min_similarity}
+
+    def search(self, query, limit=10):
+        """Return the indices of the labels that best match query."""
+        text = normalise(query)
+        if not text:
+            return []
+        words = text.split()
+        found = set.intersection(*[self.prefix_entries(word) for word in words])
+        # whole-word and label-start matches rank first, then shorter labels
+        ranked = sorted(found, key=lambda entry: (
+            -sum(word in self.normalised[entry].split() for word in words),
+            not self.normalised[entry].startswith(text),
+            len(self.normalised[entry]),
+            entry))
+        if len(ranked) < limit:
+            similar = self.similar_entries(text)
+            ranked += sorted((entry for entry in similar if entry not in found),
+                             key=lambda entry: (-similar[entry], len(self.normalised[entry]), entry))
+        return ranked[:limit]
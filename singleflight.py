@@ -0,0 +1,166 @@
+"""Single-flight coalescing of identical concurrent computations.
+
+Callers that ask for the same key while a computation for it is already
+running wait for that computation and share its result instead of starting
+their own. Within a worker this is coordinated with threads; when a lock
+directory is given, workers on the same host also coordinate through file
+locks and hand the result over as JSON. A key's result and lock files are
+removed once the key has not been computed for result_ttl seconds.
+
+stats counts the computed and shared results of this process. Processes
+that share a counters store, such as a diskcache.Cache, also add to the
+counts there, so that counts() covers work done in forked processes.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import plotly
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _Call:
+    """An in-flight computation that followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time."""
+
+    def __init__(self, lock_dir=None, result_ttl=60, counters=None):
+        self.lock_dir = lock_dir if fcntl else None
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self.result_ttl = result_ttl
+        self.counters = counters
+        self._swept = time.time()
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'computed': 0, 'shared': 0}
+
+    def counts(self):
+        """Return the computed and shared counts, of every process when counters are shared."""
+        if self.counters is None:
+            with self._lock:
+                return dict(self.stats)
+        return {name: self.counters.get(('singleflight', name), 0) for name in self.stats}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        if self.counters is not None:
+            self.counters.incr(('singleflight', name))
+
+    def do(self, key, fn):
+        """Return fn(), sharing the result with concurrent callers of key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            self._count('shared')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run(self, key, fn):
+        """Compute key, coordinating with other workers when configured."""
+        if not self.lock_dir:
+            return self._compute(fn)
+
+        path = os.path.join(self.lock_dir, hashlib.sha1(repr(key).encode()).hexdigest())
+        arrived = time.time()
+        with self._open_lock(path) as lock_file:
+            try:
+                # Another worker finished this key while we were waiting.
+                if os.path.exists(path + '.json') and os.path.getmtime(path + '.json') >= arrived:
+                    with open(path + '.json') as f:
+                        result = json.load(f)
+                    self._count('shared')
+                    return result
+
+                result = self._compute(fn)
+                with open(path + '.tmp', 'w') as f:
+                    json.dump(result, f, cls=plotly.utils.PlotlyJSONEncoder)
+                os.replace(path + '.tmp', path + '.json')
+                os.utime(path + '.lock')
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._sweep()
+        return result
+
+    def _open_lock(self, path):
+        """Open and lock the lock file of path, marking the key as in use."""
+        while True:
+            lock_file = open(path + '.lock', 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # A sweep may have removed the file while we waited for it.
+            try:
+                current = os.path.samestat(os.fstat(lock_file.fileno()), os.stat(path + '.lock'))
+            except FileNotFoundError:
+                current = False
+            if current:
+                os.utime(path + '.lock')
+                return lock_file
+            lock_file.close()
+
+    def _sweep(self):
+        """Remove the files of keys not computed for result_ttl seconds."""
+        now = time.time()
+        if now - self._swept < self.result_ttl:
+            return
+        self._swept = now
+        for name in os.listdir(self.lock_dir):
+            if not name.endswith('.lock'):
+                continue
+            path = os.path.join(self.lock_dir, name[:-len('.lock')])
+            try:
+                lock_file = open(path + '.lock', 'r')
+            except FileNotFoundError:
+                continue
+            with lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                try:
+                    if os.path.getmtime(path + '.lock') < now - self.result_ttl:
+                        for suffix in ['.json', '.lock']:
+                            try:
+                                os.remove(path + suffix)
+                            except FileNotFoundError:
+                                pass
+                except FileNotFoundError:
+                    pass
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _compute(self, fn):
+        result = fn()
+        self._count('computed')
+        return result
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from live import write_feed
+
+# The app follows a feed of this match, holding its first LIVE_EVENTS events
+# when it loads.
+LIVE_MATCH = 7584
+LIVE_EVENTS = 2000
+
+
+@pytest.fixture(scope='session')
+def live_feed(tmp_path_factory):
+    """The directory of the live feed the app follows."""
+    feed = tmp_path_factory.mktemp('live')
+    write_feed(LIVE_MATCH, str(feed), os.path.join(ROOT, 'data'), speed=0, stop=LIVE_EVENTS)
+    return feed
+
+
+@pytest.fixture(scope='session')
+def app(live_feed):
+    """The app module, loaded from the repository's data and following live_feed."""
+    os.environ['WC_LIVE'] = str(live_feed)
+    os.chdir(ROOT)
+    import app
+    return app
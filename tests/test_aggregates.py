@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+def assert_aggregates_equal(result, expected):
+    for table, expected_table in zip(result, expected):
+        pd.testing.assert_frame_equal(table, expected_table, check_exact=False, rtol=1e-9)
+
+
+def match_rows(table, match_ids):
+    return table[table.match_id.isin(match_ids)]
+
+
+def test_matches_added_in_batches_sum_to_one_build(app):
+    match_ids = sorted(app.disp_table.match_id.unique())
+    first, rest = match_ids[:20], match_ids[20:]
+    aggregates = app.update_player_aggregates(None, None, match_rows(app.pass_angles, first),
+                                              match_rows(app.disp_table, first))
+    aggregates = app.update_player_aggregates(*aggregates, match_rows(app.pass_angles, rest),
+                                              match_rows(app.disp_table, rest))
+    assert_aggregates_equal(aggregates, app.update_player_aggregates(
+        None, None, app.pass_angles, app.disp_table))
+
+
+def test_readded_match_replaces_its_rows(app):
+    full = app.update_player_aggregates(None, None, app.pass_angles, app.disp_table)
+    match_id = app.disp_table.match_id.iloc[0]
+    pass_angles, disp_table = match_rows(app.pass_angles, [match_id]), match_rows(app.disp_table, [match_id])
+    readded = app.update_player_aggregates(*full, pass_angles, disp_table, pass_angles, disp_table)
+    assert_aggregates_equal(readded, full)
+
+
+def test_changed_match_matches_a_build_from_its_new_rows(app):
+    match_id = app.disp_table.match_id.iloc[0]
+    pass_angles, disp_table = match_rows(app.pass_angles, [match_id]), match_rows(app.disp_table, [match_id])
+    # The match now has only its first half of players, with doubled passes.
+    dropped = disp_table.id.iloc[len(disp_table) // 2:]
+    new_disp_table = disp_table[~disp_table.id.isin(dropped)].assign(num_passes = lambda x: x.num_passes * 2)
+    new_pass_angles = pass_angles[~pass_angles.id.isin(dropped)].assign(count = lambda x: x['count'] * 2)
+
+    full = app.update_player_aggregates(None, None, app.pass_angles, app.disp_table)
+    changed = app.update_player_aggregates(*full, new_pass_angles, new_disp_table, pass_angles, disp_table)
+
+    others = app.disp_table.match_id != match_id
+    expected = app.update_player_aggregates(
+        None, None,
+        pd.concat([app.pass_angles[app.pass_angles.match_id != match_id], new_pass_angles]),
+        pd.concat([app.disp_table[others], new_disp_table]))
+    assert_aggregates_equal(changed, expected)
+
+    only_here = set(dropped) - set(app.disp_table[others].id)
+    assert only_here
+    assert not only_here & set(changed[1].index.get_level_values('id'))
+    assert not only_here & set(changed[0].index.get_level_values('id'))
+
+
+def test_aggregate_profile_sums_a_players_matches(app):
+    player_id = app.player_totals.matches.idxmax()[0]
+    sectors, stats = app.player_aggregate_profile(app.player_sectors, app.player_totals, player_id)
+    rows = app.pass_angles[app.pass_angles.id == player_id]
+    assert sectors['count'].sum() == rows['count'].sum()
+    assert stats.num_passes == app.disp_table[app.disp_table.id == player_id].num_passes.sum()
+    assert np.isclose(stats.xg_buildup, app.disp_table[app.disp_table.id == player_id].xg_buildup.sum())
@@ -0,0 +1,17 @@
+import os
+
+import pandas as pd
+
+
+def test_events_file_is_replaced_whole(app, tmp_path):
+    path = tmp_path / 'events_disk.json'
+    path.write_text('old')
+    events = pd.DataFrame({'match_id': [1, 2], 'minute': [3, 4], 'location': [[60, 40], None]})
+    app.write_events_file(events, str(path))
+    pd.testing.assert_frame_equal(pd.read_json(str(path), encoding='utf-8'), events)
+    assert os.listdir(tmp_path) == ['events_disk.json']
+
+
+def test_failed_write_leaves_no_partial_file(app, tmp_path):
+    app.write_events_file(pd.DataFrame({'match_id': [1]}), str(tmp_path / 'missing' / 'events_disk.json'))
+    assert os.listdir(tmp_path) == []
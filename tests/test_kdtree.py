@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from kdtree import KDTree
+
+
+@pytest.mark.parametrize('shape, leaf_size', [((500, 3), 16), ((300, 10), 4), ((10, 2), 16)])
+def test_query_matches_brute_force(shape, leaf_size):
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=shape)
+    tree = KDTree(points, leaf_size)
+    for point in rng.normal(size=(20, shape[1])):
+        distances, rows = tree.query(point, k=7)
+        expected = np.sort(np.sqrt(((points - point) ** 2).sum(axis=1)))[:7]
+        np.testing.assert_allclose(distances, expected)
+        np.testing.assert_allclose(np.sqrt(((points[rows] - point) ** 2).sum(axis=1)), distances)
+
+
+def test_duplicate_points_and_small_trees():
+    tree = KDTree(np.ones((40, 2)))
+    distances, rows = tree.query([1, 1], k=50)
+    assert len(rows) == 40 and not distances.any()
+    assert len(KDTree(np.empty((0, 2))).query([0, 0])[1]) == 0
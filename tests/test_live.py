@@ -0,0 +1,103 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+from dash.exceptions import PreventUpdate
+
+from conftest import LIVE_EVENTS, LIVE_MATCH, ROOT
+from live import EventFeed, write_feed
+
+
+def test_feed_returns_only_complete_lines(tmp_path):
+    path = tmp_path / '1.jsonl'
+    path.write_text('{"a": 1}\n{"a": 2}\n{"a"')
+    feed = EventFeed(str(tmp_path))
+    assert feed.match_ids() == [1]
+    assert feed.read() == {1: [{'a': 1}, {'a': 2}]}
+    assert feed.read() == {}
+
+    with open(path, 'a') as f:
+        f.write(': 3}\n')
+    (tmp_path / '2.jsonl').write_text('{"b": 1}\n')
+    assert feed.read() == {1: [{'a': 3}], 2: [{'b': 1}]}
+    assert feed.read() == {}
+
+
+def test_feed_of_one_file(tmp_path):
+    path = tmp_path / '5.jsonl'
+    path.write_text('{"a": 1}\n')
+    assert EventFeed(str(path)).read() == {5: [{'a': 1}]}
+
+
+def player_matches(app, player_ids):
+    return app.player_totals.matches.groupby(level=0).sum().reindex(player_ids, fill_value=0)
+
+
+def stored_events():
+    with open(os.path.join(ROOT, 'data', 'events', '{}.json'.format(LIVE_MATCH)), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def caught_up(app, live_feed):
+    """The live match before and after the rest of its events reach the feed."""
+    late_ids = {event['player']['id'] for event in stored_events()[LIVE_EVENTS:] if 'player' in event}
+    late_ids -= {event['player']['id'] for event in stored_events()[:LIVE_EVENTS] if 'player' in event}
+    before = {'version': app.live_versions[LIVE_MATCH],
+              'matches': player_matches(app, sorted(late_ids))}
+
+    write_feed(LIVE_MATCH, str(live_feed), os.path.join(ROOT, 'data'), speed=0, start=LIVE_EVENTS)
+    with open(os.path.join(str(live_feed), '{}.jsonl'.format(LIVE_MATCH)), 'a') as f:
+        f.write('{"minute": 1')
+    views = app.update_live_views(1, LIVE_MATCH, 'dark', 'network', None, None, 'match',
+                                  [LIVE_MATCH, before['version']])
+    return before, views
+
+
+def test_live_match_tables_equal_a_batch_build(app, caught_up):
+    events = app.parse_events([LIVE_MATCH]).query('minute < 120')
+    assert app.live_versions[LIVE_MATCH] == len(events)
+
+    shots_df = app.build_shots_df(events, app.match_info)
+    passing_df = app.build_passing_df(events)
+    _, possession_players = app.build_possessions(events, passing_df, shots_df)
+    disp_table = (app.build_pass_stats(passing_df)
+                  .join(app.build_xg_stats(possession_players))
+                  .join(app.build_xt_stats(passing_df, app.build_carries_df(events), app.xt_grid))
+                  .fillna(0).reset_index())
+    for table, expected in [(app.shots_df, shots_df), (app.top_xg, app.build_top_xg(shots_df)),
+                            (app.disp_table, disp_table), (app.pass_angles, app.build_pass_angles(passing_df))]:
+        pd.testing.assert_frame_equal(table[table.match_id == LIVE_MATCH].reset_index(drop=True),
+                                      expected.reset_index(drop=True))
+
+    goals = shots_df[shots_df.outcome == 'Goal'].team.value_counts()
+    info = app.match_info[LIVE_MATCH]
+    assert (info['home_score'], info['away_score']) == (goals.get(info['home'], 0), goals.get(info['away'], 0))
+
+
+def test_live_match_updates_the_player_aggregates(app, caught_up):
+    before, _ = caught_up
+    assert len(before['matches'])
+    pd.testing.assert_series_equal(player_matches(app, before['matches'].index),
+                                   before['matches'] + 1)
+    for table, expected in zip([app.player_sectors, app.player_totals],
+                               app.update_player_aggregates(None, None, app.pass_angles, app.disp_table)):
+        pd.testing.assert_frame_equal(table, expected, check_exact=False, rtol=1e-9)
+
+    for player_id in before['matches'].index:
+        click = {'points': [{'customdata': player_id}]}
+        assert app.players.name[player_id] in str(app.update_player_profile(click, LIVE_MATCH, 'dark', 'all'))
+        app.update_similar_players(click, LIVE_MATCH, 'all')
+
+
+def test_live_views_patch_the_changed_match(app, caught_up):
+    _, views = caught_up
+    header, xg_plot, zoom, pass_map, version = views
+    assert version == [LIVE_MATCH, app.live_versions[LIVE_MATCH]]
+    assert header == app.match_header_fields(app.match_info[LIVE_MATCH])[0]
+    for patch in [xg_plot, zoom, pass_map]:
+        assert patch.to_plotly_json()['operations']
+
+    with pytest.raises(PreventUpdate):
+        app.update_live_views(2, LIVE_MATCH, 'dark', 'network', None, None, 'match', version)
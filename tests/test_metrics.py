@@ -0,0 +1,81 @@
+import json
+
+import flask
+import pytest
+from dash.exceptions import PreventUpdate
+
+from metrics import CallbackMetrics
+
+server = flask.Flask(__name__)
+
+
+def request(cache_key=None):
+    query = '?cacheKey={}&job=1'.format(cache_key) if cache_key else ''
+    return server.test_request_context('/_dash-update-component' + query, method='POST')
+
+
+def replies(*responses):
+    """A callback answering each call with the next of responses."""
+    responses = iter(responses)
+
+    def callback():
+        response = next(responses)
+        if response is PreventUpdate:
+            raise PreventUpdate
+        return response
+    return callback
+
+
+def test_callback_is_timed_on_every_call():
+    metrics = CallbackMetrics()
+    wrapped = metrics.wrap('out.children', replies('{"response": {}}', PreventUpdate))
+    with request():
+        wrapped()
+        with pytest.raises(PreventUpdate):
+            wrapped()
+    assert metrics.latency['out.children'].count == 2
+    assert metrics.size['out.children'].sum == len('{"response": {}}')
+
+
+def test_background_job_is_timed_once_from_submission_to_result():
+    metrics = CallbackMetrics()
+    result = json.dumps({'multi': True, 'response': {'out': {'children': 'x' * 100}}})
+    wrapped = metrics.wrap('out.children', replies(
+        json.dumps({'cacheKey': 'k1', 'job': 1}), '{"multi": true}', '{"multi": true}', result),
+        background=True)
+
+    with request():
+        wrapped()
+    for _ in range(3):
+        with request('k1'):
+            wrapped()
+
+    assert metrics.latency['out.children'].count == 1
+    assert metrics.size['out.children'].sum == len(result)
+    assert metrics.jobs == {}
+
+
+def test_background_job_without_update_or_submission_here():
+    metrics = CallbackMetrics()
+    wrapped = metrics.wrap('out.children', replies(
+        json.dumps({'cacheKey': 'k1', 'job': 1}), PreventUpdate, '{"multi": true, "response": {}}'),
+        background=True)
+    with request():
+        wrapped()
+    with request('k1'), pytest.raises(PreventUpdate):
+        wrapped()
+    # A job submitted through another worker process has no start here.
+    with request('k2'):
+        wrapped()
+    assert metrics.latency['out.children'].count == 1
+    assert metrics.size['out.children'].sum == 0
+
+
+def test_abandoned_jobs_are_forgotten():
+    metrics = CallbackMetrics(job_ttl=0)
+    wrapped = metrics.wrap('out.children', replies(*[json.dumps({'cacheKey': key, 'job': 1})
+                                                     for key in ['k1', 'k2']]), background=True)
+    for _ in range(2):
+        with request():
+            wrapped()
+    assert list(metrics.jobs) == ['k2']
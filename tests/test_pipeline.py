@@ -0,0 +1,85 @@
+import pandas as pd
+
+from pipeline import Pipeline, Stage
+
+
+def make_pipeline(calls):
+    """A pipeline of per-match stages keyed by column and by index, and a whole one."""
+    def doubled(events):
+        calls.append(('doubled', sorted(set(events.match_id))))
+        return events.assign(value = events.value * 2)
+
+    def totals(doubled):
+        return doubled.groupby('match_id').value.sum().to_frame()
+
+    def mean(doubled):
+        calls.append(('mean', sorted(set(doubled.match_id))))
+        return doubled.value.mean()
+
+    def scaled(doubled, mean):
+        return doubled.assign(scaled = doubled.value / mean)
+
+    return Pipeline([
+        Stage(['doubled'], ['events'], doubled),
+        Stage(['totals'], ['doubled'], totals),
+        Stage(['mean'], ['doubled'], mean, per_match=False),
+        Stage(['scaled'], ['doubled','mean'], scaled),
+    ])
+
+
+def make_events(match_ids, values, labels=None):
+    return pd.DataFrame({'match_id': match_ids, 'value': values}, index=labels)
+
+
+EVENTS = make_events([3, 1, 3, 2, 1], [1, 2, 3, 4, 5], labels=[10, 11, 12, 13, 14])
+
+
+def test_build_leaves_tables_in_match_order():
+    tables = make_pipeline([]).build({'events': EVENTS})
+    pd.testing.assert_frame_equal(tables['events'], make_events([1, 1, 2, 3, 3], [2, 5, 4, 1, 3]))
+    assert tables['doubled'].value.tolist() == [4, 10, 8, 2, 6]
+    assert tables['totals'].index.tolist() == [1, 2, 3]
+
+
+def test_append_rebuilds_only_the_changed_matches():
+    calls = []
+    pipeline = make_pipeline(calls)
+    pipeline.build({'events': EVENTS})
+    mean = pipeline.tables['mean']
+    del calls[:]
+
+    pipeline.append('events', make_events([2, 4], [6, 7]))
+    changed = pipeline.update()
+
+    assert changed == {name: {2, 4} for name in ['events', 'doubled', 'totals', 'scaled']}
+    assert calls == [('doubled', [2, 4])]
+    assert pipeline.tables['events'].value.tolist() == [2, 5, 4, 6, 1, 3, 7]
+    assert pipeline.tables['mean'] == mean
+    assert pipeline.update() == {}
+
+
+def test_update_equals_a_build_from_scratch():
+    new_events = make_events([1, 3], [8, 9])
+    pipeline = make_pipeline([])
+    pipeline.build({'events': EVENTS})
+    mean = pipeline.tables['mean']
+    pipeline.append('events', new_events)
+    pipeline.update()
+
+    expected = make_pipeline([]).build({'events': pd.concat([EVENTS, new_events.set_axis([15, 16])])})
+    # The whole stage is not rerun, so the scaled values keep the built mean.
+    expected['scaled'] = expected['doubled'].assign(scaled = expected['doubled'].value / mean)
+    for name in ['events', 'doubled', 'totals', 'scaled']:
+        pd.testing.assert_frame_equal(pipeline.tables[name], expected[name])
+
+
+def test_marked_matches_are_rebuilt_from_their_rows():
+    pipeline = make_pipeline([])
+    tables = dict(pipeline.build({'events': EVENTS}))
+    pipeline.tables['events'] = pipeline.tables['events'].assign(value = lambda x: x.value.where(x.match_id != 3, 0))
+    pipeline.mark_dirty('events', [3])
+    pipeline.update()
+
+    assert pipeline.tables['doubled'].value.tolist() == [4, 10, 8, 0, 0]
+    assert pipeline.tables['totals'].value.tolist() == [14, 8, 0]
+    pd.testing.assert_frame_equal(pipeline.tables['doubled'].iloc[:3], tables['doubled'].iloc[:3])
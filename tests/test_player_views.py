@@ -0,0 +1,25 @@
+import pytest
+
+
+# Substitutes on the pitch in a segment network who made no pass: 5464 made
+# none in this match only, 5652 none in the tournament.
+@pytest.mark.parametrize('match_id, player_id', [(7529, 5464), (7537, 5652)])
+@pytest.mark.parametrize('scope', ['match', 'all'])
+def test_player_without_passes_can_be_clicked(app, match_id, player_id, scope):
+    match_segments = app.segments[app.segments.match_id == match_id]
+    assert any(player_id in ids for ids in match_segments.home.tolist() + match_segments.away.tolist())
+    click = {'points': [{'customdata': player_id}]}
+
+    profile = app.update_player_profile(click, match_id, 'dark', scope)
+    rows = app.update_player_profile_2(click, match_id, scope)
+    app.update_similar_players(click, match_id, scope)
+
+    assert app.players.name[player_id] in str(profile)
+    if scope == 'match':
+        assert rows[0].children[1].children == '0'
+
+
+def test_match_stats_of_a_player_without_passes(app):
+    stats = app.player_match_stats(7529, 5464)
+    assert stats.team == 'Nigeria'
+    assert stats.num_passes == 0 and stats.xg_contribution == 0
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from rwlock import ReadWriteLock
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            inside.wait()
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    for thread in readers:
+        thread.join(5)
+    assert not inside.broken
+
+
+def test_writer_waits_for_readers_and_holds_off_new_ones():
+    lock = ReadWriteLock()
+    log = []
+    reading, release = threading.Event(), threading.Event()
+
+    def first_reader():
+        with lock.read():
+            reading.set()
+            release.wait(5)
+            log.append('first read')
+
+    def writer():
+        with lock.write():
+            log.append('write')
+
+    def late_reader():
+        with lock.read():
+            log.append('late read')
+
+    threads = [threading.Thread(target=first_reader), threading.Thread(target=writer),
+               threading.Thread(target=late_reader)]
+    threads[0].start()
+    reading.wait(5)
+    threads[1].start()
+    time.sleep(0.1)
+    threads[2].start()
+    time.sleep(0.1)
+    assert log == []
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert log == ['first read', 'write', 'late read']
+
+
+def test_reading_wraps_a_function():
+    lock = ReadWriteLock()
+    read = lock.reading(lambda value: value * 2)
+    assert read(4) == 8
+    with lock.write():
+        pass
@@ -0,0 +1,29 @@
+from search import SearchIndex, normalise
+
+LABELS = ['Álex Rodríguez', 'Aleksandar Kolarov', 'Duško Tošić', 'Luka Modrić',
+          'Croatia - Denmark', 'Denmark', 'Alexander Sørloth']
+
+
+def search(query, **kwargs):
+    return [LABELS[entry] for entry in SearchIndex(LABELS).search(query, **kwargs)]
+
+
+def test_normalise_strips_accents_case_and_punctuation():
+    assert normalise('  Álex  Rodríguez-Ruiz! ') == 'alex rodriguez ruiz'
+
+
+def test_every_query_word_is_a_word_prefix():
+    assert search('alex rod') == ['Álex Rodríguez']
+    assert search('MODRIC') == ['Luka Modrić']
+    assert search('') == []
+
+
+def test_whole_words_and_label_starts_rank_first():
+    assert search('denmark', limit=2) == ['Denmark', 'Croatia - Denmark']
+    assert search('ale', limit=3) == ['Álex Rodríguez', 'Alexander Sørloth', 'Aleksandar Kolarov']
+
+
+def test_typos_fall_back_to_shared_trigrams():
+    assert search('modirc luka', limit=1) == ['Luka Modrić']
+    assert search('kolarv') == ['Aleksandar Kolarov']
+    assert search('zzzz') == []
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def test_similar_players_are_the_nearest_other_players(app):
+    players, tree, _, _ = app.match_similarity
+    row = 100
+    key = tuple(players.iloc[row])
+    similar = app.find_similar_players(app.match_similarity, key, k=5)
+
+    others = np.flatnonzero(players.id != players.id.iat[row])
+    distances = ((tree.points[others] - tree.points[row]) ** 2).sum(axis=1)
+    expected = players.iloc[others[np.argsort(distances, kind='stable')[:5]]]
+    assert similar.index.tolist() == expected.index.tolist()
+
+
+def test_unknown_player_has_no_similar_players(app):
+    assert app.find_similar_players(app.all_similarity, (-1, 'Nowhere')).empty
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+import diskcache
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'value': len(calls)}
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+                 for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [{'value': 1}] * 4
+    assert flight.stats == {'computed': 1, 'shared': 3}
+
+
+def test_sequential_calls_compute_again():
+    flight = SingleFlight()
+    assert [flight.do('key', lambda: i) for i in range(2)] == [0, 1]
+    assert flight.stats == {'computed': 2, 'shared': 0}
+
+
+def test_error_is_raised_and_the_call_cleared():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight._calls == {}
+
+
+def test_worker_reads_result_written_while_it_waited(tmp_path):
+    leader, follower = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    started, results = threading.Event(), []
+
+    def compute():
+        started.set()
+        time.sleep(0.3)
+        return {'x': [1, 2]}
+
+    thread = threading.Thread(target=lambda: results.append(leader.do('key', compute)))
+    thread.start()
+    started.wait(5)
+    assert follower.do('key', lambda: {'x': 'recomputed'}) == {'x': [1, 2]}
+    thread.join(5)
+    assert results == [{'x': [1, 2]}]
+    assert follower.stats == {'computed': 0, 'shared': 1}
+
+
+def test_files_of_idle_keys_are_removed(tmp_path):
+    flight = SingleFlight(str(tmp_path), result_ttl=0.2)
+    flight.do('old', lambda: 1)
+    assert sorted(name.rsplit('.', 1)[1] for name in os.listdir(tmp_path)) == ['json', 'lock']
+    old_files = set(os.listdir(tmp_path))
+    time.sleep(0.3)
+    flight.do('new', lambda: 2)
+    assert len(os.listdir(tmp_path)) == 2
+    assert not old_files & set(os.listdir(tmp_path))
+
+
+def test_counts_include_other_processes(tmp_path):
+    flight = SingleFlight(str(tmp_path / 'locks'), counters=diskcache.Cache(str(tmp_path / 'counts')))
+    flight.do('key', lambda: 1)
+    pid = os.fork()
+    if not pid:
+        flight.do('key', lambda: 2)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert flight.stats == {'computed': 1, 'shared': 0}
+    assert flight.counts() == {'computed': 2, 'shared': 0}
@@ -0,0 +1,20 @@
+import numpy as np
+
+
+def histogram(app, touches):
+    counts, _, _ = np.histogram2d(touches.x_pos.clip(0, 119.999), touches.y_pos.clip(0, 79.999),
+                                  bins=app.touch_bins, range=[[0, 120], [0, 80]])
+    return counts
+
+
+def test_touch_maps_equal_a_histogram_of_the_touches(app):
+    match_id = app.matches.match_id.iloc[0]
+    touches = app.location_df[app.location_df.match_id == match_id]
+    team = touches.team.iloc[0]
+    player_id = touches.id.iloc[0]
+
+    for expected, kwargs in [(touches, {}), (touches[touches.team == team], {'team': team}),
+                             (touches[touches.id == player_id], {'player_id': player_id})]:
+        counts = app.touch_map(app.touch_index, app.touch_counts, match_id, **kwargs)
+        np.testing.assert_array_equal(counts, histogram(app, expected))
+    assert app.touch_map(app.touch_index, app.touch_counts, match_id).sum() == len(touches)
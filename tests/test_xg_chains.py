@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from conftest import LIVE_MATCH
+
+
+@pytest.fixture
+def chains(app):
+    """Possession 1: A's players 1 and 2 pass, the second an assist, and 3
+    shoots twice. Possession 2: B's player 4 misplaces a pass and 5 shoots.
+    Possession 3: A passes without a shot."""
+    events = pd.DataFrame({'match_id': 1, 'possession': [1, 1, 1, 2, 2, 3],
+                           'possession_team': ['A', 'A', 'A', 'B', 'B', 'A'],
+                           'play_pattern': 'Regular Play', 'period': 1,
+                           'minute': [1, 1, 2, 3, 3, 4], 'second': [0, 30, 0, 0, 10, 0]})
+    passing_df = pd.DataFrame({'match_id': 1, 'possession': [1, 1, 2, 3], 'team': ['A', 'A', 'B', 'A'],
+                               'id': [1, 2, 4, 1], 'outcome': [None, None, 'Incomplete', None],
+                               'is_shot_assist': [0, 1, 0, 0]})
+    shots_df = pd.DataFrame({'match_id': 1, 'possession': [1, 1, 2], 'team': ['A', 'A', 'B'],
+                             'id': [3, 3, 5], 'shot_id': ['s1', 's2', 's3'], 'xg': [0.3, 0.1, 0.2],
+                             'outcome': ['Saved', 'Goal', 'Off T'], 'period': 1,
+                             'dec_time': [2.0, 2.1, 3.2]})
+    return app.build_possessions(events, passing_df, shots_df)
+
+
+def test_possessions_sum_their_shots(chains):
+    possessions, _ = chains
+    assert possessions.team.tolist() == ['A', 'B', 'A']
+    assert possessions.shots.tolist() == [2, 1, 0]
+    assert possessions.xg.tolist() == pytest.approx([0.4, 0.2, 0])
+    assert possessions.outcome.tolist()[:2] == ['Goal', 'Off T']
+
+
+def test_chain_xg_is_credited_to_passers_and_shooters(app, chains):
+    _, possession_players = chains
+    xg_stats = app.build_xg_stats(possession_players)
+    expected = pd.DataFrame(
+        [[1, 1, 'A', 0.4, 0.4, 0.0, 0.0],
+         [1, 2, 'A', 0.4, 0.0, 0.4, 0.0],
+         [1, 3, 'A', 0.4, 0.0, 0.0, 0.4],
+         [1, 5, 'B', 0.2, 0.0, 0.0, 0.2]],
+        columns=['match_id','id','team','xg_contribution','xg_buildup','xg_assist','xg_shot'])
+    pd.testing.assert_frame_equal(xg_stats.reset_index(), expected, check_dtype=False)
+
+
+# A stored match, and the live one, whose rows the pipeline splices in.
+@pytest.mark.parametrize('match_id', [7529, LIVE_MATCH])
+def test_possession_events_are_the_chain_events(app, match_id):
+    match_events = app.events[app.events.match_id == match_id]
+    for possession in match_events.possession.unique()[::10]:
+        pd.testing.assert_frame_equal(app.possession_events(app.events, app.possessions, match_id, possession),
+                                      match_events[match_events.possession == possession])
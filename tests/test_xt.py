@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+MOVE_COLUMNS = ['match_id','id','team','x_pos','y_pos','end_x_pos','end_y_pos']
+
+
+def moves(rows, columns=MOVE_COLUMNS):
+    return pd.DataFrame(rows, columns=columns)
+
+
+@pytest.fixture
+def tables(app):
+    # Two passes from (100, 40) towards the box, one completed, and four shots
+    # from (115, 40) scoring once.
+    passing_df = moves([[1, 10, 'A', 100, 40, 115, 40, None],
+                        [1, 10, 'A', 100, 40, 115, 40, 'Incomplete']], MOVE_COLUMNS + ['outcome'])
+    carries_df = moves([])
+    shots_df = pd.DataFrame({'shot_id': ['s1', 's2', 's3', 's4'], 'location': [[115, 40]] * 4,
+                             'outcome': ['Goal', 'Saved', 'Off T', 'Blocked']})
+    return passing_df, carries_df, shots_df
+
+
+def zone_xt(app, xt_grid, x_pos, y_pos):
+    return xt_grid.ravel()[app.pitch_zone(x_pos, y_pos)]
+
+
+def test_xt_grid_solves_the_threat_equation(app, tables):
+    xt_grid = app.build_xt_grid(*tables)
+    assert xt_grid.shape == app.xt_zones
+    # Shooting from the box scores a quarter of the time; from (100, 40) the
+    # ball reaches it by half the moves.
+    assert zone_xt(app, xt_grid, 115, 40) == pytest.approx(0.25)
+    assert zone_xt(app, xt_grid, 100, 40) == pytest.approx(0.125)
+    assert np.count_nonzero(xt_grid) == 2
+
+
+def test_xt_stats_credit_completed_moves(app, tables):
+    passing_df, _, shots_df = tables
+    carries_df = moves([[1, 11, 'A', 100, 40, 115, 40], [1, 11, 'A', 115, 40, 100, 40]])
+    xt_grid = app.build_xt_grid(passing_df, moves([]), shots_df)
+
+    xt_stats = app.build_xt_stats(passing_df, carries_df, xt_grid)
+    assert xt_stats.loc[(1, 10, 'A')].tolist() == pytest.approx([0.125, 0, 0.125])
+    assert xt_stats.loc[(1, 11, 'A')].tolist() == pytest.approx([0, 0, 0])